@@ -1,143 +1,2727 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS    
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta, datetime
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity
+from datetime import date, timedelta, datetime
 from flask_migrate import Migrate
 from flasgger import Swagger
+from dotenv import load_dotenv
+from sqlalchemy import and_, bindparam, event, or_
+from sqlalchemy.engine import Engine, Row, make_url
+from sqlalchemy.sql.expression import UpdateBase
+from sqlalchemy.exc import OperationalError
+import base64
+import bcrypt as _bcrypt
+import click
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from itertools import chain, groupby
+from operator import attrgetter, itemgetter
+
+try:
+    import brotli
+except ImportError:  # compressão brotli é opcional
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # JSON rápido é opcional; sem orjson usa-se o módulo json
+    orjson = None
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # a matriz de co-ocorrência usa NumPy/SciPy se estiverem instalados
+    np = sparse = None
+
+# Variáveis de ambiente do ficheiro .env (ver .env.example); as já definidas prevalecem
+load_dotenv()
 
 app = Flask(__name__)
 
-# CORS: autoriza seu frontend a enviar o header Authorization
-CORS(
-    app,
-    resources={r"/*": {"origins": "http://localhost:4200"}},  # ajuste a origem do seu Angular
-    expose_headers=["Authorization"],
-    allow_headers=["Authorization", "Content-Type"]
-)
+# CORS: autoriza seu frontend a enviar o header Authorization
+CORS(
+    app,
+    resources={r"/*": {"origins": "http://localhost:4200"}},  # ajuste a origem do seu Angular
+    expose_headers=["Authorization", "X-Total-Count", "X-Next-Cursor"],
+    allow_headers=["Authorization", "Content-Type", "Idempotency-Key"]
+)
+
+# Configurações
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ECHO'] = os.environ.get('SQLALCHEMY_ECHO', 'False').lower() == 'true'
+
+# SQLite: pragmas aplicados a cada nova ligação (valor vazio = não aplicar).
+# WAL deixa as leituras correr durante as escritas e busy_timeout faz os
+# escritores esperar pelo lock em vez de falharem com "database is locked".
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'),
+    'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.environ.get('SQLITE_CACHE_SIZE', '-64000'),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+
+def engine_options(url):
+    """Opções do create_engine (pool de ligações) para o DATABASE_URL, a partir do ambiente"""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # Base de dados em memória: o Flask-SQLAlchemy usa uma única ligação partilhada
+            return {}
+        options = {}
+    else:
+        options = {
+            'pool_pre_ping': True,
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        }
+    options.update(
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    )
+    return options
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# Réplicas de leitura (URLs separados por vírgula) usadas pelas rotas só de
+# leitura, e intervalo (segundos) entre verificações de saúde de cada réplica
+app.config['DATABASE_REPLICA_URLS'] = [
+    url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+]
+app.config['REPLICA_HEALTH_INTERVAL'] = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 10))
+# Instrumentação: registar pedidos com mais queries SQL do que o limite (0 = desligado)
+app.config['QUERY_COUNT_WARN_THRESHOLD'] = int(os.environ.get('QUERY_COUNT_WARN_THRESHOLD', 20))
+
+app.config['SQLALCHEMY_BINDS'] = {
+    f'replica_{i}': dict(url=url, **engine_options(url))
+    for i, url in enumerate(app.config['DATABASE_REPLICA_URLS'])
+}
+app.config['JWT_SECRET_KEY'] = 'your_secret_key_here'  # Mude para um valor seguro
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+
+# bcrypt: custo (work factor), processos do pool (0 = no próprio thread do
+# pedido) e número máximo de operações em curso ou em espera
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['BCRYPT_POOL_SIZE'] = int(os.environ.get('BCRYPT_POOL_SIZE', os.cpu_count() or 1))
+app.config['BCRYPT_QUEUE_DEPTH'] = int(os.environ.get('BCRYPT_QUEUE_DEPTH', 4 * app.config['BCRYPT_POOL_SIZE'] or 1))
+
+# Idempotency-Key: backend (sqlite ou memory), ficheiro SQLite, validade em
+# segundos e tempo máximo de um pedido em curso (depois a chave pode ser retomada)
+app.config['IDEMPOTENCY_BACKEND'] = os.environ.get('IDEMPOTENCY_BACKEND', 'sqlite')
+app.config['IDEMPOTENCY_DB_PATH'] = os.environ.get('IDEMPOTENCY_DB_PATH', os.path.join(app.instance_path, 'idempotency.db'))
+app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Reservas de stock: validade (segundos) e intervalo mínimo entre limpezas automáticas
+app.config['STOCK_RESERVATION_TTL'] = int(os.environ.get('STOCK_RESERVATION_TTL', 15 * 60))
+app.config['STOCK_SWEEP_INTERVAL'] = int(os.environ.get('STOCK_SWEEP_INTERVAL', 30))
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """Sessão que envia as leituras das rotas @read_only para uma réplica
+
+    Tudo o resto (escritas, rotas sem @read_only, comandos CLI) usa o
+    primário. A primeira escrita de um pedido fixa-o no primário, para que
+    as leituras seguintes vejam o que acabou de ser escrito.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_router.enabled:
+            if isinstance(clause, UpdateBase):
+                replica_router.pin_primary()
+            else:
+                engine = replica_router.engine_for_read()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Extensões
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+bcrypt = Bcrypt(app)
+jwt = JWTManager(app)
+migrate = Migrate(app, db)  # <-- Corrigido: migrate fica aqui, não dentro da função
+
+# Swagger configuration
+swagger_config = {
+    "headers": [],
+    "specs": [
+        {
+            "endpoint": 'apispec',
+            "route": '/apispec.json',
+            "rule_filter": lambda rule: True,
+            "model_filter": lambda tag: True,
+        }
+    ],
+    "static_url_path": "/flasgger_static",
+    "swagger_ui": True,
+    "specs_route": "/api/docs/"
+}
+
+template = {
+    "swagger": "2.0",
+    "info": {
+        "title": "E-Commerce API",
+        "description": "API para sistema e-commerce com Angular + Flask",
+        "contact": {
+            "responsibleOrganization": "PW-2-PL Team",
+            "responsibleDeveloper": "PW-2-PL Team",
+            "email": "dev@pw2pl.com",
+        },
+        "version": "1.0.0"
+    },
+    "host": "localhost:5000",
+    "basePath": "/api",
+    "schemes": [
+        "http",
+        "https"
+    ],
+    "operationId": "getmyData",
+    "securityDefinitions": {
+        "Bearer": {
+            "type": "apiKey",
+            "name": "Authorization",
+            "in": "header",
+            "description": "JWT Authorization header using the Bearer scheme. Example: \"Authorization: Bearer {token}\""
+        }
+    },
+}
+
+swagger = Swagger(app, config=swagger_config, template=template)
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Aplicar SQLITE_PRAGMAS a cada nova ligação SQLite do pool"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    set_sqlite_pragmas(dbapi_connection)
+
+
+def set_sqlite_pragmas(dbapi_connection):
+    """Executar os SQLITE_PRAGMAS numa ligação DBAPI (sqlite3 ou aiosqlite via asgi.py)"""
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        if value not in (None, ''):
+            cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+# Réplicas de leitura
+class ReplicaRouter:
+    """Escolhe, por pedido, uma réplica saudável para as rotas só de leitura
+
+    As réplicas são os binds replica_N do Flask-SQLAlchemy. Cada réplica é
+    verificada (uma query simples) no máximo a cada REPLICA_HEALTH_INTERVAL
+    segundos; uma réplica que falhe a verificação ou uma query fica fora de
+    serviço até à verificação seguinte. Sem réplicas saudáveis as leituras
+    vão para o primário.
+    """
+    
+    def __init__(self, bind_keys, health_interval):
+        self.bind_keys = list(bind_keys)
+        self.health_interval = health_interval
+        self._state = {key: {'healthy': True, 'checked_at': 0.0, 'error': None} for key in self.bind_keys}
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return bool(self.bind_keys)
+    
+    def pin_primary(self):
+        """Usar o primário até ao fim do pedido atual (houve uma escrita)"""
+        if has_request_context():
+            g.db_primary_pinned = True
+    
+    def engine_for_read(self):
+        """Engine da réplica para o pedido atual, ou None para usar o primário"""
+        if not has_request_context() or not g.get('db_read_only') or g.get('db_primary_pinned'):
+            return None
+        if 'db_replica' not in g:
+            # A mesma réplica durante todo o pedido (leituras coerentes entre si)
+            g.db_replica = self.pick()
+        if g.db_replica is None:
+            return None
+        return db.engines[g.db_replica]
+    
+    def pick(self):
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.bind_keys)
+        for offset in range(len(self.bind_keys)):
+            key = self.bind_keys[(start + offset) % len(self.bind_keys)]
+            if self.is_healthy(key):
+                return key
+        return None
+    
+    def is_healthy(self, key):
+        state = self._state[key]
+        if time.time() - state['checked_at'] >= self.health_interval:
+            self.check(key)
+        return state['healthy']
+    
+    def check(self, key):
+        """Verificar a réplica com uma leitura real (confirma ligação e schema)"""
+        state = self._state[key]
+        try:
+            with db.engines[key].connect() as connection:
+                connection.execute(db.select(StatCounter.key).limit(1))
+            state.update(healthy=True, error=None)
+        except Exception as e:
+            if state['healthy']:
+                app.logger.warning('Réplica %s fora de serviço: %s', key, e)
+            state.update(healthy=False, error=str(e))
+        state['checked_at'] = time.time()
+        return state['healthy']
+    
+    def mark_down(self, engine, error):
+        """Chamado quando uma query falha numa réplica"""
+        for key in self.bind_keys:
+            if db.engines.get(key) is engine:
+                state = self._state[key]
+                if state['healthy']:
+                    app.logger.warning('Réplica %s fora de serviço: %s', key, error)
+                state.update(healthy=False, error=str(error), checked_at=time.time())
+                if has_request_context():
+                    g.db_replica_failed = True
+    
+    def status(self):
+        return [
+            {'bind': key, 'url': db.engines[key].url.render_as_string(hide_password=True), **self._state[key]}
+            for key in self.bind_keys
+        ]
+
+
+replica_router = ReplicaRouter(app.config['SQLALCHEMY_BINDS'], app.config['REPLICA_HEALTH_INTERVAL'])
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def pin_primary_on_flush(session, flush_context, instances):
+    replica_router.pin_primary()
+
+
+@event.listens_for(Engine, 'handle_error')
+def mark_replica_down(context):
+    # Erros operacionais (ligação perdida, base de dados indisponível, schema em falta)
+    if replica_router.enabled and (context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError)):
+        replica_router.mark_down(context.engine, context.original_exception)
+
+
+def read_only(f):
+    """Marcar uma rota como só de leitura: as suas queries podem ir para uma réplica
+
+    Se uma réplica falhar durante o pedido, a rota é repetida no primário.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_read_only = True
+        try:
+            response = f(*args, **kwargs)
+            replica_failed = g.pop('db_replica_failed', False)
+        except Exception:
+            replica_failed = g.pop('db_replica_failed', False)
+            if not replica_failed:
+                raise
+        if replica_failed:
+            db.session.rollback()
+            g.db_primary_pinned = True
+            response = f(*args, **kwargs)
+        return response
+    return decorated_function
+
+
+# Instrumentação (queries SQL e latência por rota)
+class RequestMetrics:
+    """Contadores por rota para /metrics (formato de texto do Prometheus)
+
+    Os valores são do processo atual; com vários workers cada um expõe os
+    seus (use o label de instância do Prometheus para os agregar).
+    """
+    
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}     # (route, method, status) -> pedidos
+        self._routes = {}       # (route, method) -> contadores e histograma
+    
+    def observe(self, route, method, status, duration, queries, db_time, over_threshold):
+        with self._lock:
+            key = (route, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = {
+                    'buckets': [0] * len(self.BUCKETS), 'count': 0, 'sum': 0.0,
+                    'queries': 0, 'db_time': 0.0, 'over_threshold': 0,
+                }
+            # Buckets cumulativos (le = "menor ou igual a")
+            for i, bound in enumerate(self.BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][i] += 1
+            stats['count'] += 1
+            stats['sum'] += duration
+            stats['queries'] += queries
+            stats['db_time'] += db_time
+            stats['over_threshold'] += int(over_threshold)
+    
+    def render(self):
+        def labels(**values):
+            return ','.join(f'{name}="{value}"' for name, value in values.items())
+        
+        with self._lock:
+            lines = [
+                '# HELP http_requests_total Pedidos HTTP por rota, método e status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{labels(route=route, method=method, status=status)}}} {count}')
+            
+            lines += [
+                '# HELP http_request_duration_seconds Latência dos pedidos HTTP por rota.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (route, method), stats in sorted(self._routes.items()):
+                base = labels(route=route, method=method)
+                for bound, count in zip(self.BUCKETS, stats['buckets']):
+                    lines.append(f'http_request_duration_seconds_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{base},le="+Inf"}} {stats["count"]}')
+                lines.append(f'http_request_duration_seconds_sum{{{base}}} {stats["sum"]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{base}}} {stats["count"]}')
+            
+            for name, field, kind, help_text in (
+                ('db_queries_total', 'queries', 'counter', 'Queries SQL executadas por rota.'),
+                ('db_query_duration_seconds_total', 'db_time', 'counter', 'Tempo total em queries SQL por rota.'),
+                ('http_requests_over_query_threshold_total', 'over_threshold', 'counter',
+                 'Pedidos com mais queries do que QUERY_COUNT_WARN_THRESHOLD.'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for (route, method), stats in sorted(self._routes.items()):
+                    value = stats[field]
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{{labels(route=route, method=method)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or 'request_started' not in g:
+        return
+    started = getattr(context, '_query_started', None)
+    g.db_queries += 1
+    if started is not None:
+        g.db_time += time.perf_counter() - started
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Header Server-Timing, contadores de /metrics e aviso de pedidos com queries a mais
+
+    Em respostas em streaming só contam as queries feitas antes de começar a
+    enviar o corpo.
+    """
+    if 'request_started' not in g:
+        return response
+    duration = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    threshold = app.config['QUERY_COUNT_WARN_THRESHOLD']
+    over_threshold = bool(threshold) and g.db_queries > threshold
+    
+    if over_threshold:
+        app.logger.warning(
+            '%s %s executou %d queries SQL (limite %d, %.1f ms na base de dados)',
+            request.method, route, g.db_queries, threshold, g.db_time * 1000
+        )
+    request_metrics.observe(route, request.method, response.status_code, duration, g.db_queries, g.db_time, over_threshold)
+    response.headers.add(
+        'Server-Timing',
+        f'db;desc="{g.db_queries} queries";dur={g.db_time * 1000:.2f}, app;dur={duration * 1000:.2f}'
+    )
+    return response
+
+
+# Hashing de passwords
+def _bcrypt_hash(password, rounds):
+    return _bcrypt.hashpw(password.encode('utf-8'), _bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _bcrypt_check(password_hash, password):
+    return _bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+class PasswordQueueFull(Exception):
+    """Demasiadas operações bcrypt em curso; o pedido deve ser repetido mais tarde"""
+
+
+class PasswordHasher:
+    """Executa o bcrypt num pool de processos limitado
+
+    Cada hash custa centenas de milissegundos de CPU; num pool de processos
+    os logins escalam com o número de cores e não competem pelo GIL com os
+    restantes pedidos do worker. No máximo `queue_depth` operações ficam em
+    curso ou em espera: acima disso é lançada PasswordQueueFull (HTTP 503).
+    Com `workers=0` o bcrypt corre no thread do pedido.
+    """
+    
+    def __init__(self, workers, queue_depth, rounds):
+        self.workers = workers
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(max(1, queue_depth))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+    
+    def _get_executor(self):
+        # O pool é criado no próprio processo (ex.: depois do fork dos workers gunicorn)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+    
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordQueueFull()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+    
+    def hash(self, password):
+        return self._run(_bcrypt_hash, password, self.rounds)
+    
+    def check(self, password_hash, password):
+        return self._run(_bcrypt_check, password_hash, password)
+    
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    app.config['BCRYPT_POOL_SIZE'],
+    app.config['BCRYPT_QUEUE_DEPTH'],
+    app.config['BCRYPT_LOG_ROUNDS']
+)
+
+
+@app.errorhandler(PasswordQueueFull)
+def handle_password_queue_full(e):
+    response = jsonify({'error': 'Server is busy, please try again.'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+# Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)          
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    phone = db.Column(db.String(20), nullable=False)          
+    password_hash = db.Column(db.String(128), nullable=False)
+    role = db.Column(db.String(20), nullable=False, default='user')  # user, admin
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+
+    def set_password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        return password_hasher.check(self.password_hash, password)
+
+
+class Article(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+    image_url = db.Column(db.String(255), nullable=True)  # Novo campo para imagem
+    price = db.Column(db.Float, nullable=False, default=0.0, index=True)  # Novo campo para preço
+    
+    # Contadores de vendas mantidos por create_order (ver `flask rebuild-article-counters`)
+    total_sold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    order_item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Unidades disponíveis (já descontadas as reservas); NULL = stock não controlado
+    stock = db.Column(db.Integer, nullable=True)
+
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    order_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    status = db.Column(db.String(50), nullable=False, default='processando')
+    
+    # Shipping Information
+    first_name = db.Column(db.String(100), nullable=False)
+    last_name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    address = db.Column(db.String(255), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    postal_code = db.Column(db.String(10), nullable=False)
+    country = db.Column(db.String(100), nullable=False)
+    
+    # Totals
+    subtotal = db.Column(db.Float, nullable=False)
+    shipping = db.Column(db.Float, nullable=False)
+    tax = db.Column(db.Float, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    
+    # Relationship
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    user = db.relationship('User', backref='orders')
+    
+    __table_args__ = (
+        # Histórico do cliente: WHERE user_id = ? ORDER BY order_date DESC
+        db.Index('ix_order_user_id_order_date', 'user_id', 'order_date'),
+        # Listagem/exportação admin: keyset sobre (order_date, id) e filtros de data
+        db.Index('ix_order_order_date_id', 'order_date', 'id'),
+        # Filtro por estado com o mesmo keyset; também cobre o GROUP BY status
+        db.Index('ix_order_status_order_date_id', 'status', 'order_date', 'id'),
+    )
+
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False)  # Preço no momento da compra
+    
+    # Relationship
+    article = db.relationship('Article', backref='order_items')
+    
+    __table_args__ = (
+        # Carregar os itens de um conjunto de encomendas (selectin / export)
+        db.Index('ix_order_item_order_id', 'order_id'),
+        # Somas de vendas por artigo sem ler a tabela (índice de cobertura)
+        db.Index('ix_order_item_article_id_quantity', 'article_id', 'quantity'),
+    )
+
+
+class StockReservation(db.Model):
+    """Unidades retiradas ao stock durante um checkout ainda não concluído
+
+    Todas as linhas de um checkout partilham o mesmo token. Ao criar a
+    encomenda as linhas são consumidas; se expirarem antes disso as unidades
+    voltam ao stock (release_expired_reservations).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(36), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ArticleCooccurrence(db.Model):
+    """Matriz esparsa de co-ocorrência: encomendas em que os dois artigos foram comprados juntos
+
+    Guarda os dois sentidos de cada par, para que os vizinhos de um artigo
+    sejam lidos por chave primária.
+    """
+    article_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ArticleRecommendation(db.Model):
+    """Top-k de artigos comprados juntos com cada artigo, pré-calculado
+
+    neighbors é JSON compacto [[other_id, count], ...], por ordem decrescente
+    de count; o endpoint de recomendações lê uma única linha.
+    """
+    article_id = db.Column(db.Integer, primary_key=True)
+    neighbors = db.Column(db.Text, nullable=False)
+
+
+class RecommendationIndexState(db.Model):
+    """Última encomenda incluída no índice de recomendações (uma única linha)"""
+    id = db.Column(db.Integer, primary_key=True)
+    last_order_id = db.Column(db.Integer, nullable=False, default=0)
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AuthzInvalidation(db.Model):
+    """Utilizadores cujo role ou estado mudou (ou que foram eliminados)
+
+    Tokens emitidos antes de changed_at (epoch, como a claim iat) não são
+    confiáveis e obrigam admin_required a consultar o utilizador.
+    """
+    user_id = db.Column(db.Integer, primary_key=True)
+    changed_at = db.Column(db.Float, nullable=False)
+
+
+class OrderHistoryVersion(db.Model):
+    """Versão do histórico de encomendas de cada utilizador
+
+    Incrementada na mesma transação que cria encomendas ou muda o seu estado
+    (ver bump_order_history); a cache de histórico compara-a para saber se
+    a página guardada ainda é atual, em qualquer worker.
+    """
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StatCounter(db.Model):
+    """Snapshot das estatísticas do dashboard admin, uma linha por contador
+
+    Mantido incrementalmente pelos endpoints que escrevem (ver bump_stats) e
+    recalculado de raiz por `flask rebuild-stats`.
+    """
+    key = db.Column(db.String(80), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class SalesRollup(db.Model):
+    """Agregados diários de vendas, uma linha por (dimensão, dia, chave)
+
+    Dimensões: 'all' (chave vazia), 'article' (id do artigo; revenue é
+    quantidade x preço das linhas), 'country' e 'status' (estado atual das
+    encomendas feitas nesse dia). Mantidos por apply_sales_rollup na
+    transação que cria, altera ou elimina encomendas e recalculados por
+    `flask backfill-sales-rollups`.
+    """
+    dimension = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# Serialização
+#
+# Serializers declarativos por modelo: o mesmo mapeamento serve objetos ORM e
+# linhas Core (selecionando só serializer.columns(), sem hidratar objetos), e
+# os bytes JSON são produzidos pelo orjson quando está instalado.
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps_json(payload):
+    """Serializar para JSON compacto em bytes UTF-8 (datas em ISO 8601)"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Resposta JSON serializada com dumps_json"""
+    return Response(dumps_json(payload), status=status, mimetype='application/json')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON do Flask (jsonify) com orjson quando está instalado
+
+    Mantém o comportamento do provider por omissão: chaves ordenadas,
+    indentação em debug e os mesmos formatos para datas, UUID e Decimal.
+    """
+    
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+app.json = FastJSONProvider(app)
+
+
+class Field:
+    """Campo de um serializer
+
+    column é a coluna ou expressão SQL lida nas queries Core; attr é o
+    caminho do atributo (ex.: 'article.name') ou uma função aplicada a
+    objetos ORM; convert, se indicado, é aplicado ao valor lido.
+    """
+    
+    def __init__(self, column, attr=None, convert=None):
+        self.column = column
+        self.attr = attr if attr is not None else column.key
+        self.convert = convert
+
+
+class Serializer:
+    """Mapeamento declarativo nome -> campo de um modelo para JSON
+
+    Os valores de fields são colunas do modelo, Field (colunas de outros
+    modelos, expressões, conversões) ou dicts de campos, serializados como
+    um objeto aninhado. dump aceita objetos ORM e linhas de queries que
+    incluam columns(); nas linhas os campos são localizados pelas labels uma
+    vez por resultado e lidos por posição, sem hidratar objetos.
+    """
+    
+    def __init__(self, fields):
+        self.fields = fields
+        self._entries = []  # (label, Field) de todos os campos, já achatados
+        self._layout = []   # (nome, None) para campos simples, (nome, [chaves]) para objetos aninhados
+        for name, field in fields.items():
+            if isinstance(field, dict):
+                self._layout.append((name, list(field)))
+                self._entries.extend((f'{name}__{key}', value) for key, value in field.items())
+            else:
+                self._layout.append((name, None))
+                self._entries.append((name, field))
+        self._entries = [
+            (label, field if isinstance(field, Field) else Field(field)) for label, field in self._entries
+        ]
+        self._labels = [label for label, _ in self._entries]
+        self._obj_getters = [
+            field.attr if callable(field.attr) else attrgetter(field.attr) for _, field in self._entries
+        ]
+        self._converts = [(i, field.convert) for i, (_, field) in enumerate(self._entries) if field.convert]
+        self._flat = all(keys is None for _, keys in self._layout)
+        self._names = [name for name, _ in self._layout]
+    
+    def only(self, *names):
+        """Serializer com um subconjunto dos campos, pela ordem indicada"""
+        return Serializer({name: self.fields[name] for name in names})
+    
+    def columns(self):
+        """Colunas (com labels) a selecionar para serializar linhas Core"""
+        return [field.column.label(label) for label, field in self._entries]
+    
+    def _row_getter(self, row):
+        positions = {label: i for i, label in enumerate(row._fields)}
+        indexes = [positions[label] for label in self._labels]
+        if len(indexes) == 1:
+            return lambda row: (row[indexes[0]],)
+        return itemgetter(*indexes)
+    
+    def _build(self, values, extra):
+        if self._converts:
+            values = list(values)
+            for i, convert in self._converts:
+                if values[i] is not None:
+                    values[i] = convert(values[i])
+        if self._flat:
+            result = dict(zip(self._names, values))
+        else:
+            result = {}
+            values = iter(values)
+            for name, keys in self._layout:
+                result[name] = next(values) if keys is None else {key: next(values) for key in keys}
+        if extra:
+            result.update(extra)
+        return result
+    
+    def dump(self, obj, **extra):
+        """Serializar um objeto ORM ou uma linha Core; extra acrescenta campos calculados fora"""
+        if isinstance(obj, Row):
+            return self._build(self._row_getter(obj)(obj), extra)
+        return self._build([getter(obj) for getter in self._obj_getters], extra)
+    
+    def dump_many(self, objs, extra=None):
+        """Serializar uma sequência de objetos ORM ou linhas Core (todas do mesmo tipo)
+
+        extra, se indicado, é uma função obj -> dict de campos calculados fora.
+        """
+        objs = iter(objs)
+        first = next(objs, None)
+        if first is None:
+            return []
+        if isinstance(first, Row):
+            values = self._row_getter(first)
+        else:
+            values = lambda obj: [getter(obj) for getter in self._obj_getters]
+        return [self._build(values(obj), extra(obj) if extra else None) for obj in chain([first], objs)]
+
+
+user_serializer = Serializer({
+    'id': User.id,
+    'name': User.name,
+    'username': User.username,
+    'email': User.email,
+    'phone': User.phone,
+    'role': User.role,
+    'is_active': User.is_active,
+})
+profile_serializer = user_serializer.only('id', 'name', 'username', 'email', 'phone', 'role')
+
+article_serializer = Serializer({
+    'id': Article.id,
+    'name': Article.name,
+    'content': Article.content,
+    'image_url': Article.image_url,
+    'price': Article.price,
+})
+admin_article_serializer = Serializer(dict(
+    article_serializer.fields,
+    total_sold=Article.total_sold,
+    order_item_count=Article.order_item_count,
+    stock=Article.stock,
+))
+
+# Itens com o nome do artigo: em queries Core, com JOIN a Article (ver load_order_items)
+order_item_serializer = Serializer({
+    'product_id': OrderItem.article_id,
+    'name': Field(Article.name, 'article.name'),
+    'quantity': OrderItem.quantity,
+    'price': OrderItem.price,
+})
+admin_order_item_serializer = Serializer({
+    'id': OrderItem.id,
+    'article_name': Field(Article.name, 'article.name'),
+    'quantity': OrderItem.quantity,
+    'price': OrderItem.price,
+})
+
+order_serializer = Serializer({
+    'id': Order.id,
+    'user_id': Order.user_id,
+    'order_date': Field(Order.order_date, convert=datetime.isoformat),
+    'status': Order.status,
+    'shipping_info': {
+        'first_name': Order.first_name,
+        'last_name': Order.last_name,
+        'email': Order.email,
+        'phone': Order.phone,
+        'address': Order.address,
+        'city': Order.city,
+        'postal_code': Order.postal_code,
+        'country': Order.country,
+    },
+    'totals': {
+        'subtotal': Order.subtotal,
+        'shipping': Order.shipping,
+        'tax': Order.tax,
+        'total': Order.total,
+    },
+})
+# Encomendas com o utilizador: em queries Core, com LEFT JOIN a User
+admin_order_serializer = Serializer({
+    'id': Order.id,
+    'user_id': Order.user_id,
+    'user_name': Field(db.func.coalesce(User.name, 'Unknown'), lambda order: order.user.name if order.user else 'Unknown'),
+    'user_email': Field(db.func.coalesce(User.email, 'Unknown'), lambda order: order.user.email if order.user else 'Unknown'),
+    'order_date': Field(Order.order_date, convert=datetime.isoformat),
+    'status': Order.status,
+    'total': Order.total,
+    'shipping_info': {
+        'name': Field(Order.first_name + ' ' + Order.last_name, lambda order: f"{order.first_name} {order.last_name}"),
+        'email': Order.email,
+        'phone': Order.phone,
+        'address': Order.address,
+        'city': Order.city,
+        'postal_code': Order.postal_code,
+        'country': Order.country,
+    },
+})
+
+
+def load_order_items(order_ids, serializer):
+    """Itens serializados das encomendas indicadas, numa única query Core: {order_id: [item, ...]}"""
+    if not order_ids:
+        return {}
+    rows = db.session.execute(order_items_query(order_ids, serializer)).all()
+    return group_order_items(order_ids, rows, serializer)
+
+
+def order_items_query(order_ids, serializer):
+    return db.select(OrderItem.order_id.label('item_order_id'), *serializer.columns()) \
+        .outerjoin(Article, Article.id == OrderItem.article_id) \
+        .where(OrderItem.order_id.in_(list(dict.fromkeys(order_ids)))) \
+        .order_by(OrderItem.order_id, OrderItem.id)
+
+
+def group_order_items(order_ids, rows, serializer):
+    """Agrupar as linhas de order_items_query por encomenda"""
+    items = {order_id: [] for order_id in order_ids}
+    for row, item in zip(rows, serializer.dump_many(rows)):
+        items[row[0]].append(item)
+    return items
+
+
+def apply_article_sales(lines, sign=1):
+    """Atualizar os contadores de vendas dos artigos na transação atual
+
+    `lines` é uma sequência de pares (article_id, quantity), um por OrderItem;
+    sign=-1 desconta as linhas (por exemplo ao eliminar encomendas).
+    """
+    totals = {}
+    for article_id, quantity in lines:
+        sold, count = totals.get(article_id, (0, 0))
+        totals[article_id] = (sold + quantity, count + 1)
+    
+    if not totals:
+        return
+    
+    stmt = db.update(Article).where(Article.id == bindparam('b_id')).values(
+        total_sold=Article.total_sold + bindparam('b_sold'),
+        order_item_count=Article.order_item_count + bindparam('b_count')
+    )
+    db.session.connection().execute(stmt, [
+        {'b_id': article_id, 'b_sold': sign * sold, 'b_count': sign * count}
+        for article_id, (sold, count) in totals.items()
+    ])
+
+
+def upsert_increment(model, key_values, deltas):
+    """Somar deltas a linhas de `model`, criando-as se ainda não existirem
+
+    `key_values` é uma lista de dicts com a chave primária de cada linha e
+    `deltas` a lista paralela de dicts {coluna: incremento}. Em SQLite e
+    PostgreSQL é um único INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if not key_values:
+        return
+    
+    table = model.__table__
+    key_columns = list(key_values[0])
+    delta_columns = list(deltas[0])
+    rows = [dict(keys, **delta) for keys, delta in zip(key_values, deltas)]
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + stmt.excluded[column] for column in delta_columns}
+        )
+        db.session.execute(stmt)
+        return
+    
+    # Outras bases de dados: UPDATE e, se a linha não existir, INSERT
+    for row in rows:
+        where = [table.c[column] == row[column] for column in key_columns]
+        values = {column: table.c[column] + row[column] for column in delta_columns}
+        result = db.session.execute(db.update(table).where(*where).values(**values))
+        if result.rowcount == 0:
+            db.session.execute(db.insert(table).values(**row))
+
+
+def bump_stats(deltas):
+    """Aplicar incrementos ao snapshot de estatísticas na transação atual
+
+    Exemplo: bump_stats({'orders': 1, 'revenue': 19.9, 'orders_status:processando': 1})
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    upsert_increment(
+        StatCounter,
+        [{'key': key} for key in deltas],
+        [{'value': delta} for delta in deltas.values()]
+    )
+
+
+# Marca que o snapshot já foi construído de raiz pelo menos uma vez
+STATS_BUILT_KEY = '__built__'
+# Versão do catálogo: incrementada por todas as alterações de artigos e
+# preservada por rebuild_stats (não é uma estatística)
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def compute_stats():
+    """Calcular todos os contadores do snapshot a partir das tabelas de origem"""
+    stats = {
+        'users': User.query.count(),
+        'active_users': User.query.filter_by(is_active=True).count(),
+        'articles': Article.query.count(),
+        'orders': Order.query.count(),
+        'revenue': float(db.session.query(db.func.sum(Order.total)).scalar() or 0),
+    }
+    order_stats = db.session.query(
+        Order.status,
+        db.func.count(Order.id)
+    ).group_by(Order.status).all()
+    for status, count in order_stats:
+        stats[f'orders_status:{status}'] = count
+    return stats
+
+
+def rebuild_stats():
+    """Reconstruir o snapshot de estatísticas de raiz; devolve os contadores que divergiam"""
+    fresh = compute_stats()
+    current = {row.key: row.value for row in StatCounter.query.all()}
+    current.pop(STATS_BUILT_KEY, None)
+    current.pop(CATALOG_VERSION_KEY, None)
+    drift = {
+        key: (current.get(key, 0), fresh.get(key, 0))
+        for key in set(current) | set(fresh)
+        if abs(current.get(key, 0) - fresh.get(key, 0)) > 1e-6
+    }
+    
+    StatCounter.query.filter(StatCounter.key != CATALOG_VERSION_KEY).delete()
+    db.session.add_all(StatCounter(key=key, value=value) for key, value in fresh.items())
+    db.session.add(StatCounter(key=STATS_BUILT_KEY, value=1))
+    db.session.commit()
+    return drift
+
+
+# Cache do catálogo
+def catalog_version():
+    """Versão atual do catálogo (uma leitura por chave primária)"""
+    counter = db.session.get(StatCounter, CATALOG_VERSION_KEY)
+    return int(counter.value) if counter else 0
+
+
+def catalog_version_query():
+    """A mesma leitura como statement, para sessões assíncronas (scalar() None = versão 0)"""
+    return db.select(StatCounter.value).where(StatCounter.key == CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidar a cache do catálogo em todos os workers, na transação atual"""
+    bump_stats({CATALOG_VERSION_KEY: 1})
+
+
+class CatalogCache:
+    """Resposta JSON de /articles já serializada e comprimida, por versão do catálogo
+
+    Cada worker guarda uma única entrada com os bytes em identity, gzip e (se
+    o módulo brotli estiver instalado) br, e o ETag forte derivado do
+    conteúdo. A entrada é reconstruída quando a versão do catálogo muda.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = None
+    
+    def lookup(self, version):
+        """Entrada da versão indicada, ou None se ainda não foi construída"""
+        entry = self._entry
+        if entry is not None and entry['version'] == version:
+            return entry
+        return None
+    
+    def store(self, version, body):
+        """Guardar os bytes JSON da versão indicada (usado pelas rotas assíncronas)"""
+        entry = self._make_entry(version, body)
+        with self._lock:
+            self._entry = entry
+        return entry
+    
+    def get(self, version, build):
+        entry = self.lookup(version)
+        if entry is not None:
+            return entry
+        
+        with self._lock:
+            entry = self.lookup(version)
+            if entry is None:
+                entry = self._make_entry(version, build())
+                self._entry = entry
+        return entry
+    
+    @staticmethod
+    def _make_entry(version, body):
+        return {
+            'version': version,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=6),
+            'br': brotli.compress(body) if brotli else None,
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+def cached_json_response(entry):
+    """Responder com a representação em cache adequada ao Accept-Encoding (ou 304)"""
+    encoding = 'identity'
+    if entry['br'] is not None and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    
+    # ETag forte por representação: cada codificação tem bytes diferentes
+    etag = entry['etag'] if encoding == 'identity' else f"{entry['etag']}-{encoding}"
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# Histórico de encomendas do cliente
+def bump_order_history(user_ids):
+    """Invalidar o histórico em cache destes utilizadores em todos os workers, na transação atual"""
+    user_ids = sorted(set(user_ids))
+    upsert_increment(
+        OrderHistoryVersion,
+        [{'user_id': user_id} for user_id in user_ids],
+        [{'version': 1} for _ in user_ids]
+    )
+
+
+def order_history_version_query(user_id):
+    """Versão do histórico do utilizador e do catálogo (nomes dos artigos), numa única query"""
+    orders_version = db.select(OrderHistoryVersion.version) \
+        .where(OrderHistoryVersion.user_id == user_id) \
+        .scalar_subquery()
+    catalog = db.select(StatCounter.value) \
+        .where(StatCounter.key == CATALOG_VERSION_KEY) \
+        .scalar_subquery()
+    return db.select(orders_version, catalog)
+
+
+def order_history_version(user_id):
+    """(versão do histórico, versão do catálogo) do utilizador"""
+    orders_version, catalog = db.session.execute(order_history_version_query(user_id)).one()
+    return int(orders_version or 0), int(catalog or 0)
+
+
+class OrderHistoryCache:
+    """Primeira página do histórico de encomendas dos utilizadores mais recentes (LRU)
+
+    Cada entrada guarda as páginas já construídas (por limit; None para o
+    histórico completo) e a versão (histórico, catálogo) com que foram
+    construídas; uma versão diferente descarta a entrada. Só a primeira
+    página (sem cursor) é guardada: é a que a página de perfil pede sempre.
+    """
+    
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, user_id, version, limit, build):
+        page = self.lookup(user_id, version, limit)
+        if page is None:
+            page = self.store(user_id, version, limit, build())
+        return page
+    
+    def lookup(self, user_id, version, limit):
+        """Página em cache, ou None se não existir para esta versão e limit"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry['version'] == version and limit in entry['pages']:
+                self._entries.move_to_end(user_id)
+                return entry['pages'][limit]
+        return None
+    
+    def store(self, user_id, version, limit, page):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry['version'] != version:
+                entry = {'version': version, 'pages': {}}
+                self._entries[user_id] = entry
+            entry['pages'][limit] = page
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return page
+
+
+order_history_cache = OrderHistoryCache(max_users=int(os.environ.get('ORDER_HISTORY_CACHE_SIZE', 1024)))
+
+# Autorização
+def create_user_token(user):
+    """Criar o access token com role e estado do utilizador como claims
+
+    A claim iat segue com frações de segundo (um NumericDate pode não ser
+    inteiro), a precisão de AuthzInvalidation.changed_at: um token emitido
+    no mesmo segundo de uma alteração, mas depois dela, continua confiável.
+    """
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={'role': user.role, 'is_active': user.is_active, 'iat': time.time()}
+    )
+
+
+class AuthzCache:
+    """Cache com TTL das invalidações de autorização (tabela AuthzInvalidation)
+
+    admin_required confia no role/estado das claims do token exceto para
+    utilizadores alterados depois da emissão do token. A lista de alterações
+    é lida da base de dados no máximo uma vez a cada `ttl` segundos por
+    worker, pelo que uma alteração feita noutro worker demora no máximo esse
+    tempo a ser respeitada; no worker que a fez é imediata.
+    """
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._changed = {}
+        self._loaded_at = 0.0
+    
+    def _token_lifetime(self):
+        return app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+    
+    def _refresh(self):
+        now = time.time()
+        if now - self._loaded_at < self.ttl:
+            return
+        # Alterações mais antigas do que a validade de um token já não afetam nenhum token
+        horizon = now - self._token_lifetime()
+        rows = db.session.query(AuthzInvalidation.user_id, AuthzInvalidation.changed_at) \
+            .filter(AuthzInvalidation.changed_at > horizon) \
+            .all()
+        with self._lock:
+            self._changed = dict(rows)
+            self._loaded_at = now
+    
+    def invalidate(self, user_id):
+        """Marcar os tokens atuais do utilizador como não confiáveis (na transação atual)"""
+        now = time.time()
+        AuthzInvalidation.query.filter(AuthzInvalidation.changed_at < now - self._token_lifetime()).delete()
+        db.session.merge(AuthzInvalidation(user_id=user_id, changed_at=now))
+        with self._lock:
+            self._changed[user_id] = now
+    
+    def is_stale(self, user_id, issued_at):
+        """Token emitido (iat, em segundos epoch) antes da última alteração do utilizador
+
+        Tokens com iat inteiro (emitidos antes de create_user_token incluir
+        as frações de segundo) emitidos no segundo da alteração contam como
+        anteriores a ela.
+        """
+        self._refresh()
+        changed_at = self._changed.get(user_id)
+        return changed_at is not None and issued_at <= changed_at
+
+
+authz_cache = AuthzCache(ttl=float(os.environ.get('AUTHZ_CACHE_TTL', 5)))
+
+
+# Stock
+class OutOfStock(Exception):
+    """Pelo menos um artigo não tem stock suficiente; a transação deve ser revertida"""
+
+
+class ReservationError(Exception):
+    """Reserva de stock inexistente, de outro utilizador ou diferente da encomenda"""
+
+
+def _quantities_by_article(lines):
+    totals = {}
+    for article_id, quantity in lines:
+        totals[article_id] = totals.get(article_id, 0) + quantity
+    return totals
+
+
+def decrement_stock(lines):
+    """Retirar ao stock as quantidades de todas as linhas (article_id, quantity)
+
+    Um UPDATE condicional (stock >= quantidade) por artigo, enviado em lote
+    (executemany) na transação atual. A condição é avaliada atomicamente
+    pela base de dados, pelo que encomendas concorrentes nunca deixam o stock
+    negativo. Se algum artigo não tiver stock suficiente é lançada
+    OutOfStock e a transação tem de ser revertida. Artigos com stock NULL
+    não são controlados.
+    """
+    params = [
+        {'b_id': article_id, 'b_qty': quantity}
+        for article_id, quantity in _quantities_by_article(lines).items()
+    ]
+    stmt = db.update(Article).where(
+        Article.id == bindparam('b_id'),
+        or_(Article.stock.is_(None), Article.stock >= bindparam('b_qty'))
+    ).values(stock=Article.stock - bindparam('b_qty'))
+    
+    connection = db.session.connection()
+    if connection.dialect.supports_sane_multi_rowcount:
+        updated = connection.execute(stmt, params).rowcount
+    else:
+        updated = sum(connection.execute(stmt, row).rowcount for row in params)
+    
+    if updated != len(params):
+        raise OutOfStock()
+
+
+def increment_stock(lines):
+    """Devolver ao stock as quantidades das linhas (reservas canceladas ou expiradas)"""
+    params = [
+        {'b_id': article_id, 'b_qty': quantity}
+        for article_id, quantity in _quantities_by_article(lines).items()
+    ]
+    if params:
+        stmt = db.update(Article).where(
+            Article.id == bindparam('b_id'),
+            Article.stock.isnot(None)
+        ).values(stock=Article.stock + bindparam('b_qty'))
+        db.session.connection().execute(stmt, params)
+
+
+def insufficient_stock(lines):
+    """Artigos das linhas cujo stock atual não chega (para a mensagem de erro)"""
+    needed = _quantities_by_article(lines)
+    rows = db.session.query(Article.id, Article.stock).filter(Article.id.in_(needed)).all()
+    return [
+        {'product_id': article_id, 'requested': needed[article_id], 'available': stock}
+        for article_id, stock in rows
+        if stock is not None and stock < needed[article_id]
+    ]
+
+
+def reserve_stock(user_id, lines):
+    """Retirar as linhas ao stock e registá-las numa reserva; devolve (token, expires_at)"""
+    decrement_stock(lines)
+    token = str(uuid.uuid4())
+    expires_at = datetime.utcnow() + timedelta(seconds=app.config['STOCK_RESERVATION_TTL'])
+    db.session.execute(db.insert(StockReservation), [
+        {'token': token, 'user_id': user_id, 'article_id': article_id, 'quantity': quantity, 'expires_at': expires_at}
+        for article_id, quantity in _quantities_by_article(lines).items()
+    ])
+    return token, expires_at
+
+
+def consume_reservation(token, user_id, lines):
+    """Usar uma reserva ativa para as linhas de uma encomenda (o stock já foi retirado)
+
+    Uma reserva expirada mas ainda não limpa é devolvida ao stock e as linhas
+    são retiradas de novo, se houver stock.
+    """
+    reservations = StockReservation.query.filter_by(token=token, user_id=user_id).all()
+    if not reservations:
+        raise ReservationError('Stock reservation not found or expired')
+    
+    reserved = {r.article_id: r.quantity for r in reservations}
+    if reserved != _quantities_by_article(lines):
+        raise ReservationError('Order items do not match the stock reservation')
+    
+    deleted = StockReservation.query.filter(
+        StockReservation.id.in_([r.id for r in reservations])
+    ).delete(synchronize_session=False)
+    if deleted != len(reservations):
+        # Consumida ou libertada em simultâneo por outro pedido
+        raise ReservationError('Stock reservation not found or expired')
+    
+    if any(r.expires_at <= datetime.utcnow() for r in reservations):
+        increment_stock(reserved.items())
+        decrement_stock(lines)
+
+
+def release_reservation(token, user_id):
+    """Cancelar uma reserva, devolvendo as unidades ao stock; devolve False se não existir"""
+    reservations = StockReservation.query.filter_by(token=token, user_id=user_id).all()
+    if not reservations:
+        return False
+    deleted = StockReservation.query.filter(
+        StockReservation.id.in_([r.id for r in reservations])
+    ).delete(synchronize_session=False)
+    if deleted != len(reservations):
+        return False
+    increment_stock((r.article_id, r.quantity) for r in reservations)
+    return True
+
+
+def release_expired_reservations():
+    """Devolver ao stock as reservas expiradas (checkouts abandonados); devolve quantas linhas"""
+    expired = StockReservation.query.filter(StockReservation.expires_at <= datetime.utcnow()).all()
+    if not expired:
+        return 0
+    deleted = StockReservation.query.filter(
+        StockReservation.id.in_([r.id for r in expired])
+    ).delete(synchronize_session=False)
+    if deleted != len(expired):
+        # Outro processo está a libertar as mesmas reservas
+        db.session.rollback()
+        return 0
+    increment_stock((r.article_id, r.quantity) for r in expired)
+    db.session.commit()
+    return len(expired)
+
+
+_last_stock_sweep = 0.0
+
+
+def maybe_release_expired_reservations():
+    """Limpar reservas expiradas no máximo uma vez a cada STOCK_SWEEP_INTERVAL segundos"""
+    global _last_stock_sweep
+    now = time.time()
+    if now - _last_stock_sweep < app.config['STOCK_SWEEP_INTERVAL']:
+        return
+    _last_stock_sweep = now
+    try:
+        release_expired_reservations()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning('Falha ao libertar reservas expiradas: %s', e)
+
+
+def parse_order_lines(items):
+    """Validar a lista de itens do pedido e devolver linhas (article_id, quantity)
+
+    Lança ValueError com a mensagem a devolver ao cliente.
+    """
+    if not items or not isinstance(items, list):
+        raise ValueError('Order must contain at least one item')
+    lines = []
+    for item in items:
+        if not isinstance(item, dict) or 'product_id' not in item or 'quantity' not in item:
+            raise ValueError('Invalid item structure')
+        try:
+            article_id, quantity = int(item['product_id']), int(item['quantity'])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid number format: {str(e)}')
+        if quantity < 1:
+            raise ValueError('Item quantity must be at least 1')
+        lines.append((article_id, quantity))
+    return lines
+
+
+# Regras de preço das encomendas (as mesmas do checkout no frontend)
+FREE_SHIPPING_THRESHOLD = 50.0
+SHIPPING_FEE = 5.99
+TAX_RATE = 0.23  # IVA
+
+
+def compute_order_totals(subtotal):
+    """Calcular subtotal, portes, IVA e total de uma encomenda a partir do subtotal"""
+    shipping = 0.0 if subtotal >= FREE_SHIPPING_THRESHOLD else SHIPPING_FEE
+    tax = subtotal * TAX_RATE
+    return {
+        'subtotal': round(subtotal, 2),
+        'shipping': shipping,
+        'tax': round(tax, 2),
+        'total': round(subtotal + shipping + tax, 2)
+    }
+
+
+# Idempotência
+#
+# Os stores guardam, por chave, a impressão digital do pedido e a resposta
+# (status + corpo). reserve() devolve None se a chave for nova (e fica
+# reservada) ou o registo existente; um registo com status None ainda está a
+# ser processado. A reserva é um lease de lock_timeout segundos: se o worker
+# morrer antes de complete() ou release(), a chave expira e pode ser
+# retomada; complete() estende a validade para ttl.
+class MemoryIdempotencyStore:
+    """Store de idempotência no próprio processo (um worker, testes)"""
+    
+    def __init__(self, ttl, lock_timeout):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        # Respostas guardadas por ordem de conclusão, que é a de expiração
+        self._records = OrderedDict()
+    
+    def _evict(self, now):
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if record['expires_at'] > now:
+                break
+            del self._records[key]
+    
+    def reserve(self, key, fingerprint):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            record = self._records.get(key)
+            if record is not None and record['expires_at'] > now:
+                return dict(record)
+            self._records.pop(key, None)
+            self._records[key] = {
+                'fingerprint': fingerprint, 'status': None, 'body': None, 'expires_at': now + self.lock_timeout
+            }
+            return None
+    
+    def complete(self, key, status, body):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                record['status'], record['body'] = status, body
+                record['expires_at'] = time.time() + self.ttl
+                self._records.move_to_end(key)
+    
+    def release(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class SQLiteIdempotencyStore:
+    """Store de idempotência num ficheiro SQLite partilhado por todos os workers"""
+    
+    SCHEMA = """CREATE TABLE IF NOT EXISTS idempotency_key (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        status INTEGER,
+        body BLOB,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID"""
+    
+    # Remover chaves expiradas a cada N reservas
+    PURGE_EVERY = 500
+    
+    def __init__(self, path, ttl, lock_timeout):
+        self.path = path
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        self._reservations = 0
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+    
+    def reserve(self, key, fingerprint):
+        conn = self._connection()
+        now = time.time()
+        self._reservations += 1
+        if self._reservations % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM idempotency_key WHERE expires_at <= ?', (now,))
+        else:
+            conn.execute('DELETE FROM idempotency_key WHERE key = ? AND expires_at <= ?', (key, now))
+        
+        inserted = conn.execute(
+            'INSERT OR IGNORE INTO idempotency_key (key, fingerprint, expires_at) VALUES (?, ?, ?)',
+            (key, fingerprint, now + self.lock_timeout)
+        ).rowcount
+        if inserted:
+            return None
+        
+        row = conn.execute(
+            'SELECT fingerprint, status, body FROM idempotency_key WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            # Removida entretanto por release(): tentar de novo
+            return self.reserve(key, fingerprint)
+        return {'fingerprint': row[0], 'status': row[1], 'body': row[2]}
+    
+    def complete(self, key, status, body):
+        self._connection().execute(
+            'UPDATE idempotency_key SET status = ?, body = ?, expires_at = ? WHERE key = ?',
+            (status, body, time.time() + self.ttl, key)
+        )
+    
+    def release(self, key):
+        self._connection().execute('DELETE FROM idempotency_key WHERE key = ?', (key,))
+
+
+def create_idempotency_store(backend):
+    ttl, lock_timeout = app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_LOCK_TIMEOUT']
+    if backend == 'memory':
+        return MemoryIdempotencyStore(ttl, lock_timeout)
+    if backend == 'sqlite':
+        return SQLiteIdempotencyStore(app.config['IDEMPOTENCY_DB_PATH'], ttl, lock_timeout)
+    raise ValueError(f'Unknown idempotency backend: {backend}')
+
+
+idempotency_store = create_idempotency_store(app.config['IDEMPOTENCY_BACKEND'])
+
+
+def idempotent(f):
+    """Decorator que torna um POST autenticado repetível com o header Idempotency-Key
+
+    A primeira resposta (exceto erros 5xx) fica guardada para a chave; um
+    pedido repetido com a mesma chave e o mesmo corpo recebe essa resposta
+    sem voltar a executar o endpoint. A chave é única por utilizador e rota,
+    e ambos entram na impressão digital do pedido.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'success': False, 'message': 'Idempotency-Key must be at most 255 characters'}), 400
+        
+        identity = get_jwt_identity()
+        scoped_key = f'{identity}:{request.path}:{key}'
+        payload = request.get_json(silent=True)
+        fingerprint = hashlib.sha256(json.dumps(
+            [identity, request.method, request.path, payload], sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')).hexdigest()
+        
+        record = idempotency_store.reserve(scoped_key, fingerprint)
+        if record is not None:
+            if record['fingerprint'] != fingerprint:
+                return jsonify({
+                    'success': False,
+                    'message': 'Idempotency-Key was already used with a different request'
+                }), 422
+            if record['status'] is None:
+                response = jsonify({
+                    'success': False,
+                    'message': 'A request with this Idempotency-Key is still being processed'
+                })
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            response = Response(record['body'], status=record['status'], mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(scoped_key)
+            raise
+        
+        if response.status_code >= 500:
+            idempotency_store.release(scoped_key)
+        else:
+            idempotency_store.complete(scoped_key, response.status_code, response.get_data())
+        return response
+    return decorated_function
+
+
+# Paginação
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Converter o parâmetro limit num inteiro entre 1 e o máximo permitido"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(*values):
+    """Codificar os valores de ordenação da última linha num cursor opaco"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Descodificar um cursor criado por encode_cursor (lista com `size` valores)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_date_range(date_from, date_to):
+    """Converter date_from/date_to (ISO 8601) num intervalo [início, fim[
+
+    Uma data sem hora em date_to inclui o dia inteiro.
+    """
+    start = end = None
+    try:
+        if date_from:
+            start = datetime.fromisoformat(date_from)
+        if date_to:
+            end = datetime.fromisoformat(date_to)
+            if len(date_to) == 10:
+                end += timedelta(days=1)
+    except ValueError:
+        raise ValueError('Dates must be in ISO 8601 format (YYYY-MM-DD)')
+    return start, end
+
+
+# Agregados diários de vendas
+#
+# Os endpoints de analytics somam linhas de SalesRollup (uma por dia e chave)
+# em vez de percorrer Order/OrderItem: o custo depende do número de dias do
+# intervalo e não do número de encomendas.
+SALES_ROLLUP_DIMENSIONS = ('all', 'article', 'country', 'status')
+SALES_ROLLUP_INTERVALS = ('day', 'week', 'month')
+
+
+def apply_sales_rollup(orders, sign=1):
+    """Somar encomendas aos agregados diários na transação atual
+
+    `orders` é uma sequência de tuplos (order_date, country, status, total,
+    lines), com lines uma lista de (article_id, quantity, price); sign=-1
+    desconta-as (por exemplo ao eliminar encomendas).
+    """
+    deltas = {}
+    
+    def add(dimension, day, key, count, units, revenue):
+        current = deltas.setdefault((dimension, day, key), [0, 0, 0.0])
+        current[0] += sign * count
+        current[1] += sign * units
+        current[2] += sign * revenue
+    
+    for order_date, country, status, total, lines in orders:
+        day = order_date.date()
+        units = sum(quantity for _, quantity, _ in lines)
+        add('all', day, '', 1, units, total)
+        add('country', day, country, 1, units, total)
+        add('status', day, status, 1, units, total)
+        articles = {}
+        for article_id, quantity, price in lines:
+            article_units, article_revenue = articles.get(article_id, (0, 0.0))
+            articles[article_id] = (article_units + quantity, article_revenue + quantity * price)
+        for article_id, (article_units, article_revenue) in articles.items():
+            add('article', day, str(article_id), 1, article_units, article_revenue)
+    
+    # Um delta por linha: o PostgreSQL não aceita a mesma chave duas vezes no mesmo upsert
+    upsert_increment(
+        SalesRollup,
+        [{'dimension': dimension, 'day': day, 'key': key} for dimension, day, key in deltas],
+        [{'orders': count, 'units': units, 'revenue': revenue} for count, units, revenue in deltas.values()]
+    )
+
+
+def move_sales_rollup_status(order, old_status, new_status):
+    """Passar uma encomenda de um estado para outro nos agregados do dia dela"""
+    day = order.order_date.date()
+    units = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)) \
+        .filter(OrderItem.order_id == order.id) \
+        .scalar()
+    upsert_increment(
+        SalesRollup,
+        [{'dimension': 'status', 'day': day, 'key': key} for key in (old_status, new_status)],
+        [{'orders': sign, 'units': sign * units, 'revenue': sign * order.total} for sign in (-1, 1)]
+    )
+
+
+def parse_rollup_days(date_from, date_to):
+    """Converter date_from/date_to num intervalo de dias [início, fim[ (None = sem limite)"""
+    start, end = parse_date_range(date_from, date_to)
+    start_day = start.date() if start else None
+    end_day = None
+    if end:
+        # Os agregados são diários: um fim a meio do dia inclui esse dia
+        end_day = end.date() if end.time() == datetime.min.time() else end.date() + timedelta(days=1)
+    return start_day, end_day
+
+
+def rollup_query(dimension, start_day, end_day, *columns):
+    """Query sobre os agregados de uma dimensão, restrita ao intervalo de dias"""
+    query = db.session.query(*columns).filter(SalesRollup.dimension == dimension)
+    if start_day:
+        query = query.filter(SalesRollup.day >= start_day)
+    if end_day:
+        query = query.filter(SalesRollup.day < end_day)
+    return query
+
+
+def rollup_period(day, interval):
+    """Início do período (dia, semana ISO ou mês) a que pertence um dia"""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def backfill_sales_rollups(start_day=None, end_day=None):
+    """Recalcular os agregados diários de raiz a partir de Order/OrderItem
+
+    Apaga e volta a inserir as linhas do intervalo de dias [start_day,
+    end_day[ (por omissão todo o histórico), numa única transação, com três
+    queries agregadas (GROUP BY) em vez de ler encomenda a encomenda.
+    Devolve o número de linhas de agregados escritas.
+    """
+    day_column = db.func.date(Order.order_date)
+    
+    def in_range(query):
+        if start_day:
+            query = query.filter(Order.order_date >= datetime.combine(start_day, datetime.min.time()))
+        if end_day:
+            query = query.filter(Order.order_date < datetime.combine(end_day, datetime.min.time()))
+        return query
+    
+    rows = {}
+    
+    def add(dimension, day, key, orders=0, units=0, revenue=0.0):
+        current = rows.setdefault((dimension, day, key), [0, 0, 0.0])
+        current[0] += orders
+        current[1] += units or 0
+        current[2] += revenue or 0.0
+    
+    by_order = in_range(db.session.query(
+        day_column, Order.country, Order.status, db.func.count(Order.id), db.func.sum(Order.total)
+    )).group_by(day_column, Order.country, Order.status)
+    for order_day, country, status, orders, revenue in by_order:
+        order_day = date.fromisoformat(str(order_day))
+        add('all', order_day, '', orders=orders, revenue=revenue)
+        add('country', order_day, country, orders=orders, revenue=revenue)
+        add('status', order_day, status, orders=orders, revenue=revenue)
+    
+    units_by_order = in_range(db.session.query(
+        day_column, Order.country, Order.status, db.func.sum(OrderItem.quantity)
+    ).join(OrderItem, OrderItem.order_id == Order.id)).group_by(day_column, Order.country, Order.status)
+    for order_day, country, status, units in units_by_order:
+        order_day = date.fromisoformat(str(order_day))
+        add('all', order_day, '', units=units)
+        add('country', order_day, country, units=units)
+        add('status', order_day, status, units=units)
+    
+    by_article = in_range(db.session.query(
+        day_column, OrderItem.article_id, db.func.count(db.distinct(OrderItem.order_id)),
+        db.func.sum(OrderItem.quantity), db.func.sum(OrderItem.quantity * OrderItem.price)
+    ).join(OrderItem, OrderItem.order_id == Order.id)).group_by(day_column, OrderItem.article_id)
+    for order_day, article_id, orders, units, revenue in by_article:
+        add('article', date.fromisoformat(str(order_day)), str(article_id), orders, units, revenue)
+    
+    delete = db.delete(SalesRollup)
+    if start_day:
+        delete = delete.where(SalesRollup.day >= start_day)
+    if end_day:
+        delete = delete.where(SalesRollup.day < end_day)
+    db.session.execute(delete)
+    if rows:
+        db.session.connection().execute(SalesRollup.__table__.insert(), [
+            {'dimension': dimension, 'day': day, 'key': key, 'orders': orders, 'units': units, 'revenue': revenue}
+            for (dimension, day, key), (orders, units, revenue) in rows.items()
+        ])
+    db.session.commit()
+    return len(rows)
+
+# Exportação de encomendas
+#
+# Uma única query (encomendas + utilizador + itens + artigo) lida com yield_per,
+# agrupada por encomenda à medida que chega: a memória usada não depende do
+# número de encomendas exportadas.
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_CSV_COLUMNS = [
+    'order_id', 'order_date', 'status', 'user_id', 'user_name', 'user_email',
+    'first_name', 'last_name', 'email', 'phone', 'address', 'city', 'postal_code', 'country',
+    'subtotal', 'shipping', 'tax', 'total',
+    'item_id', 'article_id', 'article_name', 'quantity', 'price',
+]
+
+_ORDER_EXPORT_FIELDS = EXPORT_CSV_COLUMNS[:EXPORT_CSV_COLUMNS.index('item_id')]
+
+
+def iter_export_orders(status=None, date_from=None, date_to=None):
+    """Devolver (encomenda, itens) por ordem de id, lendo a BD em lotes"""
+    query = (
+        db.select(
+            Order.id.label('order_id'), Order.order_date, Order.status, Order.user_id,
+            User.name.label('user_name'), User.email.label('user_email'),
+            Order.first_name, Order.last_name, Order.email, Order.phone, Order.address,
+            Order.city, Order.postal_code, Order.country,
+            Order.subtotal, Order.shipping, Order.tax, Order.total,
+            OrderItem.id.label('item_id'), OrderItem.article_id,
+            Article.name.label('article_name'), OrderItem.quantity, OrderItem.price,
+        )
+        .select_from(Order)
+        .outerjoin(User, User.id == Order.user_id)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Article, Article.id == OrderItem.article_id)
+        .order_by(Order.id, OrderItem.id)
+    )
+    if status:
+        query = query.where(Order.status == status)
+    if date_from:
+        query = query.where(Order.order_date >= date_from)
+    if date_to:
+        query = query.where(Order.order_date < date_to)
+    
+    rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for _, order_rows in groupby(rows, key=lambda row: row.order_id):
+        order_rows = list(order_rows)
+        order = {field: getattr(order_rows[0], field) for field in _ORDER_EXPORT_FIELDS}
+        order['order_date'] = order['order_date'].isoformat()
+        items = [
+            {
+                'id': row.item_id,
+                'article_id': row.article_id,
+                'article_name': row.article_name,
+                'quantity': row.quantity,
+                'price': row.price,
+            }
+            for row in order_rows if row.item_id is not None
+        ]
+        yield order, items
+
+
+def export_orders_csv(orders):
+    """Uma linha CSV por item (os campos da encomenda repetem-se), em blocos"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    for count, (order, items) in enumerate(orders, 1):
+        order_values = [order[field] for field in _ORDER_EXPORT_FIELDS]
+        for item in items or [{}]:
+            writer.writerow(order_values + [
+                item.get('id'), item.get('article_id'), item.get('article_name'),
+                item.get('quantity'), item.get('price'),
+            ])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_orders_ndjson(orders):
+    """Uma encomenda por linha JSON, com os itens aninhados, em blocos"""
+    chunk = []
+    for order, items in orders:
+        order['items'] = items
+        chunk.append(dumps_json(order))
+        if len(chunk) == EXPORT_BATCH_SIZE:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
+
+
+ORDER_EXPORT_FORMATS = {
+    'csv': (export_orders_csv, 'text/csv'),
+    'ndjson': (export_orders_ndjson, 'application/x-ndjson'),
+}
+
+
+# Pesquisa full-text (SQLite FTS5)
+#
+# article_fts é uma tabela FTS5 de conteúdo externo sobre article(name, content).
+# Os triggers mantêm o índice sincronizado em qualquer INSERT/UPDATE/DELETE de
+# artigos; o tokenizer unicode61 com remove_diacritics ignora acentos, pelo que
+# "descricao" encontra "Descrição".
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5(
+        name, content,
+        content='article', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ai AFTER INSERT ON article BEGIN
+        INSERT INTO article_fts(rowid, name, content) VALUES (new.id, new.name, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_au AFTER UPDATE OF name, content ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+        INSERT INTO article_fts(rowid, name, content) VALUES (new.id, new.name, new.content);
+    END""",
+]
+
+# Peso das colunas no bm25: um termo no nome vale mais do que na descrição
+SEARCH_RANK = 'bm25(article_fts, 10.0, 1.0)'
+SEARCH_SORTS = {
+    'relevance': f'{SEARCH_RANK}, a.id',
+    'price_asc': 'a.price ASC, a.id',
+    'price_desc': 'a.price DESC, a.id',
+}
+
+_search_index_ready = None
+
+
+def init_search_index():
+    """Criar (se necessário) o índice FTS5 dos artigos e os triggers de sincronização
+
+    Devolve False se a base de dados não suportar FTS5 (ex.: PostgreSQL), caso
+    em que a pesquisa usa ILIKE.
+    """
+    global _search_index_ready
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        _search_index_ready = False
+        return False
+    
+    with engine.begin() as conn:
+        existing = conn.exec_driver_sql(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'article_fts_%'"
+        ).scalar()
+        try:
+            for ddl in SEARCH_INDEX_DDL:
+                conn.exec_driver_sql(ddl)
+        except OperationalError:
+            # SQLite compilado sem FTS5
+            _search_index_ready = False
+            return False
+        
+        # Triggers novos (base de dados nova ou tabela article recriada): reindexar tudo
+        if existing < 3:
+            conn.exec_driver_sql("INSERT INTO article_fts(article_fts) VALUES ('rebuild')")
+    
+    _search_index_ready = True
+    return True
+
+
+def search_index_available():
+    if _search_index_ready is None:
+        init_search_index()
+    return _search_index_ready
+
+
+def build_match_query(text):
+    """Converter o texto pesquisado numa expressão MATCH com prefixo em cada termo"""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+# Autocomplete
+def normalize_text(text):
+    """Minúsculas, sem acentos e sem pontuação (ex.: "Calças-Ganga" -> "calcas ganga")"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', stripped))
+
+
+class PrefixIndex:
+    """Índice de prefixos em memória para o autocomplete de nomes de artigos
+
+    Guarda uma lista ordenada de pares (chave, id) com uma chave por cada
+    palavra do nome (o nome normalizado a partir dessa palavra), para que
+    "den" encontre tanto "Denim Jacket" como "Light Blue Denim Dress". Uma
+    sugestão é um bisect seguido da leitura das entradas com o prefixo.
+    Como a CatalogCache, o índice de cada worker é da versão do catálogo em
+    que foi construído e é reconstruído quando a versão muda, seja qual for
+    o worker que alterou os artigos.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._names = {}
+        self.version = None
+    
+    @staticmethod
+    def _keys(name):
+        words = normalize_text(name).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+    
+    def rebuild(self, rows, version):
+        """Reconstruir o índice a partir de pares (id, nome) da versão indicada do catálogo"""
+        names = {article_id: name for article_id, name in rows}
+        entries = sorted(
+            (key, article_id)
+            for article_id, name in names.items()
+            for key in self._keys(name)
+        )
+        with self._lock:
+            self._entries = entries
+            self._names = names
+            self.version = version
+    
+    def invalidate(self):
+        """Forçar a reconstrução na próxima utilização"""
+        with self._lock:
+            self.version = None
+    
+    def suggest(self, prefix, limit=10):
+        """Devolver até `limit` pares (id, nome) cujo nome tem uma palavra começada por `prefix`"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._entries, (prefix,))
+            while i < len(self._entries) and len(results) < limit:
+                key, article_id = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                if article_id not in seen:
+                    seen.add(article_id)
+                    results.append((article_id, self._names[article_id]))
+                i += 1
+        return results
+
+
+autocomplete_index = PrefixIndex()
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+
+# Recomendações ("comprados juntos")
+#
+# Matriz de co-ocorrência artigo x artigo construída a partir dos cestos
+# (artigos distintos de cada encomenda): com NumPy/SciPy é o produto esparso
+# BᵀB da matriz cesto x artigo; sem eles conta os pares de cada cesto.
+RECOMMENDATIONS_TOP_K = int(os.environ.get('RECOMMENDATIONS_TOP_K', 10))
+RECOMMENDATIONS_BATCH_SIZE = 1000
+
+
+def iter_baskets(after_order_id=0, until_order_id=None):
+    """Artigos distintos de cada encomenda com after_order_id < id <= until_order_id"""
+    query = db.session.query(OrderItem.order_id, OrderItem.article_id) \
+        .filter(OrderItem.order_id > after_order_id)
+    if until_order_id is not None:
+        query = query.filter(OrderItem.order_id <= until_order_id)
+    rows = query.order_by(OrderItem.order_id).yield_per(EXPORT_BATCH_SIZE)
+    for _, basket in groupby(rows, key=lambda row: row.order_id):
+        yield {article_id for _, article_id in basket}
+
+
+def build_cooccurrence(baskets):
+    """Contar os pares de artigos comprados juntos; devolve triplos (article_id, other_id, count)
+
+    Cada par aparece nos dois sentidos; cestos com um único artigo são ignorados.
+    """
+    baskets = [sorted(basket) for basket in baskets if len(basket) > 1]
+    if not baskets:
+        return []
+    
+    if sparse is not None:
+        article_ids = np.unique(np.fromiter(chain.from_iterable(baskets), dtype=np.int64))
+        columns = np.searchsorted(article_ids, np.fromiter(chain.from_iterable(baskets), dtype=np.int64))
+        rows = np.repeat(np.arange(len(baskets)), [len(basket) for basket in baskets])
+        matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.int32), (rows, columns)),
+            shape=(len(baskets), len(article_ids))
+        )
+        cooccurrence = (matrix.T @ matrix).tocoo()
+        off_diagonal = cooccurrence.row != cooccurrence.col
+        return list(zip(
+            article_ids[cooccurrence.row[off_diagonal]].tolist(),
+            article_ids[cooccurrence.col[off_diagonal]].tolist(),
+            cooccurrence.data[off_diagonal].tolist()
+        ))
+    
+    counts = {}
+    for basket in baskets:
+        for i, article_id in enumerate(basket):
+            for other_id in basket[i + 1:]:
+                counts[article_id, other_id] = counts.get((article_id, other_id), 0) + 1
+    return [
+        triple
+        for (article_id, other_id), count in counts.items()
+        for triple in ((article_id, other_id, count), (other_id, article_id, count))
+    ]
+
 
-# Configurações
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = 'your_secret_key_here'  # Mude para um valor seguro
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+def select_top_k(pairs, k=RECOMMENDATIONS_TOP_K):
+    """Os k vizinhos com mais co-ocorrências de cada artigo: {article_id: [[other_id, count], ...]}
 
-# Extensões
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
-migrate = Migrate(app, db)  # <-- Corrigido: migrate fica aqui, não dentro da função
+    Empates são desfeitos pelo id do artigo, para o resultado ser estável.
+    """
+    candidates = {}
+    for article_id, other_id, count in pairs:
+        candidates.setdefault(article_id, []).append((-count, other_id))
+    return {
+        article_id: [[other_id, -count] for count, other_id in heapq.nsmallest(k, neighbors)]
+        for article_id, neighbors in candidates.items()
+    }
 
-# Swagger configuration
-swagger_config = {
-    "headers": [],
-    "specs": [
-        {
-            "endpoint": 'apispec',
-            "route": '/apispec.json',
-            "rule_filter": lambda rule: True,
-            "model_filter": lambda tag: True,
-        }
-    ],
-    "static_url_path": "/flasgger_static",
-    "swagger_ui": True,
-    "specs_route": "/api/docs/"
-}
 
-template = {
-    "swagger": "2.0",
-    "info": {
-        "title": "E-Commerce API",
-        "description": "API para sistema e-commerce com Angular + Flask",
-        "contact": {
-            "responsibleOrganization": "PW-2-PL Team",
-            "responsibleDeveloper": "PW-2-PL Team",
-            "email": "dev@pw2pl.com",
-        },
-        "version": "1.0.0"
-    },
-    "host": "localhost:5000",
-    "basePath": "/api",
-    "schemes": [
-        "http",
-        "https"
-    ],
-    "operationId": "getmyData",
-    "securityDefinitions": {
-        "Bearer": {
-            "type": "apiKey",
-            "name": "Authorization",
-            "in": "header",
-            "description": "JWT Authorization header using the Bearer scheme. Example: \"Authorization: Bearer {token}\""
-        }
-    },
-}
+def save_recommendations(top):
+    """Substituir as linhas de recomendações destes artigos na transação atual"""
+    article_ids = list(top)
+    for start in range(0, len(article_ids), RECOMMENDATIONS_BATCH_SIZE):
+        chunk = article_ids[start:start + RECOMMENDATIONS_BATCH_SIZE]
+        db.session.execute(db.delete(ArticleRecommendation).where(ArticleRecommendation.article_id.in_(chunk)))
+        db.session.connection().execute(ArticleRecommendation.__table__.insert(), [
+            {'article_id': article_id, 'neighbors': json.dumps(top[article_id], separators=(',', ':'))}
+            for article_id in chunk
+        ])
 
-swagger = Swagger(app, config=swagger_config, template=template)
 
-# Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)          
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    phone = db.Column(db.String(20), nullable=False)          
-    password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.String(20), nullable=False, default='user')  # user, admin
-    is_active = db.Column(db.Boolean, nullable=False, default=True)
+def set_recommendations_watermark(last_order_id):
+    state = db.session.get(RecommendationIndexState, 1) or RecommendationIndexState(id=1)
+    state.last_order_id = last_order_id
+    state.built_at = datetime.utcnow()
+    db.session.add(state)
 
-    def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
 
-    def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+def build_recommendations(k=RECOMMENDATIONS_TOP_K):
+    """Reconstruir de raiz a matriz de co-ocorrência e o top-k de todos os artigos
 
+    Devolve o número de pares (nos dois sentidos) e de artigos com recomendações.
+    """
+    last_order_id = db.session.query(db.func.max(Order.id)).scalar() or 0
+    pairs = build_cooccurrence(iter_baskets(until_order_id=last_order_id))
+    
+    db.session.execute(db.delete(ArticleCooccurrence))
+    db.session.execute(db.delete(ArticleRecommendation))
+    for start in range(0, len(pairs), RECOMMENDATIONS_BATCH_SIZE):
+        db.session.connection().execute(ArticleCooccurrence.__table__.insert(), [
+            {'article_id': article_id, 'other_id': other_id, 'count': count}
+            for article_id, other_id, count in pairs[start:start + RECOMMENDATIONS_BATCH_SIZE]
+        ])
+    top = select_top_k(pairs, k)
+    save_recommendations(top)
+    set_recommendations_watermark(last_order_id)
+    db.session.commit()
+    return len(pairs), len(top)
 
-class Article(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    image_url = db.Column(db.String(255), nullable=True)  # Novo campo para imagem
-    price = db.Column(db.Float, nullable=False, default=0.0)  # Novo campo para preço
 
+def update_recommendations(k=RECOMMENDATIONS_TOP_K):
+    """Somar à matriz os cestos das encomendas novas e recalcular o top-k dos artigos afetados
 
-class Order(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    status = db.Column(db.String(50), nullable=False, default='processando')
+    Sem índice construído lê todas as encomendas. Encomendas eliminadas só
+    são descontadas pela reconstrução (build_recommendations).
+    Devolve o número de encomendas novas e de artigos atualizados.
+    """
+    state = db.session.get(RecommendationIndexState, 1)
+    last_order_id = db.session.query(db.func.max(Order.id)).scalar() or 0
+    baskets = list(iter_baskets(state.last_order_id if state else 0, last_order_id))
+    pairs = build_cooccurrence(baskets)
+    for start in range(0, len(pairs), RECOMMENDATIONS_BATCH_SIZE):
+        chunk = pairs[start:start + RECOMMENDATIONS_BATCH_SIZE]
+        upsert_increment(
+            ArticleCooccurrence,
+            [{'article_id': article_id, 'other_id': other_id} for article_id, other_id, _ in chunk],
+            [{'count': count} for _, _, count in chunk]
+        )
     
-    # Shipping Information
-    first_name = db.Column(db.String(100), nullable=False)
-    last_name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), nullable=False)
-    phone = db.Column(db.String(20), nullable=False)
-    address = db.Column(db.String(255), nullable=False)
-    city = db.Column(db.String(100), nullable=False)
-    postal_code = db.Column(db.String(10), nullable=False)
-    country = db.Column(db.String(100), nullable=False)
+    touched = sorted({article_id for article_id, _, _ in pairs})
+    for start in range(0, len(touched), RECOMMENDATIONS_BATCH_SIZE):
+        chunk = touched[start:start + RECOMMENDATIONS_BATCH_SIZE]
+        rows = db.session.query(ArticleCooccurrence.article_id, ArticleCooccurrence.other_id, ArticleCooccurrence.count) \
+            .filter(ArticleCooccurrence.article_id.in_(chunk)) \
+            .all()
+        save_recommendations(select_top_k(rows, k))
+    set_recommendations_watermark(last_order_id)
+    db.session.commit()
+    return len(baskets), len(touched)
+
+# Importação do catálogo
+#
+# Ficheiros JSON (um array de artigos) ou NDJSON (um artigo por linha) lidos
+# em streaming e gravados em lotes: cada lote é uma transação com um SELECT
+# dos nomes existentes, um UPDATE executemany e um INSERT em massa. As caches
+# do catálogo são invalidadas uma única vez, no fim.
+CATALOG_IMPORT_BATCH_SIZE = 1000
+CATALOG_IMPORT_MAX_REJECTED = 100  # linhas rejeitadas detalhadas no relatório
+CATALOG_NAME_MAX_LENGTH = Article.__table__.c.name.type.length
+CATALOG_IMAGE_URL_MAX_LENGTH = Article.__table__.c.image_url.type.length
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_records(stream, chunk_size=64 * 1024):
+    """Ler os registos de um ficheiro JSON (array) ou NDJSON sem o carregar todo
+
+    Devolve triplos (posição, registo, erro): posição é o índice no array ou
+    a linha no NDJSON; uma linha NDJSON inválida dá erro e as seguintes
+    continuam a ser lidas. Um array malformado lança ValueError.
+    """
+    first = stream.read(1)
+    while first and first in ' \t\n\r\ufeff':
+        first = stream.read(1)
+    if not first:
+        return
     
-    # Totals
-    subtotal = db.Column(db.Float, nullable=False)
-    shipping = db.Column(db.Float, nullable=False)
-    tax = db.Column(db.Float, nullable=False)
-    total = db.Column(db.Float, nullable=False)
+    if first != '[':
+        for line_no, line in enumerate(chain([first + stream.readline()], stream), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line), None
+            except ValueError as e:
+                yield line_no, None, f'Invalid JSON: {e}'
+        return
     
-    # Relationship
-    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
-    user = db.relationship('User', backref='orders')
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    position, need_comma = 0, False
+    
+    def read_more():
+        nonlocal buffer, pos, eof
+        more = stream.read(chunk_size)
+        eof = not more
+        buffer, pos = buffer[pos:] + more, 0
+    
+    while True:
+        pos = _JSON_WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError('Unexpected end of JSON array')
+            read_more()
+            continue
+        if buffer[pos] == ']':
+            return
+        if need_comma:
+            if buffer[pos] != ',':
+                raise ValueError(f'Expected "," after item {position}')
+            pos, need_comma = pos + 1, False
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            # Um valor que acaba no fim do bloco (ex.: um número) pode continuar no seguinte
+            complete = end < len(buffer) or eof
+        except ValueError:
+            if eof:
+                raise ValueError(f'Invalid JSON in item {position + 1}')
+            complete = False
+        if not complete:
+            read_more()
+            continue
+        position += 1
+        yield position, record, None
+        pos, need_comma = end, True
 
+def validate_catalog_record(record):
+    """Validar um artigo importado; devolve os valores normalizados ou lança ValueError
 
-class OrderItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)  # Preço no momento da compra
+    Campos ausentes ficam None: num artigo existente mantêm o valor atual.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Item must be a JSON object')
     
-    # Relationship
-    article = db.relationship('Article', backref='order_items')
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('name is required')
+    name = name.strip()
+    if len(name) > CATALOG_NAME_MAX_LENGTH:
+        raise ValueError(f'name longer than {CATALOG_NAME_MAX_LENGTH} characters')
+    
+    values = {'name': name, 'content': None, 'image_url': None, 'price': None, 'stock': None}
+    for field in ('content', 'image_url'):
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f'{field} must be a string')
+        values[field] = value
+    if values['image_url'] is not None and len(values['image_url']) > CATALOG_IMAGE_URL_MAX_LENGTH:
+        raise ValueError(f'image_url longer than {CATALOG_IMAGE_URL_MAX_LENGTH} characters')
+    
+    price = record.get('price')
+    if price is not None:
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            raise ValueError('price must be a number')
+        price = float(price)
+        if not 0 <= price < float('inf'):
+            raise ValueError('price must be a non-negative number')
+        values['price'] = price
+    
+    stock = record.get('stock')
+    if stock is not None:
+        if isinstance(stock, bool) or not isinstance(stock, int) or stock < 0:
+            raise ValueError('stock must be a non-negative integer')
+        values['stock'] = stock
+    return values
+
+
+def upsert_catalog_batch(rows):
+    """Gravar um lote de artigos {nome: (posição, valores)} numa transação
+
+    Devolve (inseridos, atualizados, rejeitados), com rejeitados como
+    pares (posição, motivo).
+    """
+    existing = {
+        name for (name,) in db.session.query(Article.name).filter(Article.name.in_(list(rows))).distinct()
+    }
+    updates, inserts, rejected = [], [], []
+    for name, (position, values) in rows.items():
+        if name in existing:
+            updates.append({f'b_{field}': value for field, value in values.items()})
+        elif values['content'] is None:
+            rejected.append((position, 'content is required for new articles'))
+        else:
+            inserts.append(dict(values, image_url=values['image_url'] or '', price=values['price'] or 0.0))
+    
+    if updates:
+        # Artigos com o mesmo nome são todos atualizados; campos a NULL mantêm o valor atual
+        stmt = db.update(Article).where(Article.name == bindparam('b_name')).values(
+            content=db.func.coalesce(bindparam('b_content'), Article.content),
+            image_url=db.func.coalesce(bindparam('b_image_url'), Article.image_url),
+            price=db.func.coalesce(bindparam('b_price'), Article.price),
+            stock=db.func.coalesce(bindparam('b_stock'), Article.stock),
+        )
+        db.session.connection().execute(stmt, updates)
+    if inserts:
+        db.session.connection().execute(Article.__table__.insert(), inserts)
+        bump_stats({'articles': len(inserts)})
+    db.session.commit()
+    return len(inserts), len(updates), rejected
+
+
+def import_catalog(stream, batch_size=CATALOG_IMPORT_BATCH_SIZE, progress=None):
+    """Importar artigos de um ficheiro JSON/NDJSON (texto), com upsert pelo nome
+
+    Grava em lotes de batch_size artigos (cada lote na sua transação) e
+    chama progress(relatório) depois de cada lote. No fim, se algo mudou,
+    invalida as caches do catálogo (versão do catálogo e autocomplete) uma
+    única vez, mesmo que a importação seja interrompida por um erro.
+    """
+    report = {'processed': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'rejected_rows': [], 'batches': 0}
+    
+    def reject(position, reason):
+        report['rejected'] += 1
+        if len(report['rejected_rows']) < CATALOG_IMPORT_MAX_REJECTED:
+            report['rejected_rows'].append({'position': position, 'error': reason})
+    
+    def flush(batch):
+        inserted, updated, rejected = upsert_catalog_batch(batch)
+        report['inserted'] += inserted
+        report['updated'] += updated
+        for position, reason in rejected:
+            reject(position, reason)
+        report['batches'] += 1
+        if progress:
+            progress(report)
+    
+    batch = {}
+    try:
+        for position, record, error in iter_json_records(stream):
+            report['processed'] += 1
+            if error is None:
+                try:
+                    values = validate_catalog_record(record)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                reject(position, error)
+                continue
+            
+            # Nome repetido no mesmo lote: os campos do registo mais recente prevalecem
+            if values['name'] in batch:
+                _, previous = batch[values['name']]
+                values = {**previous, **{field: value for field, value in values.items() if value is not None}}
+            batch[values['name']] = (position, values)
+            
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = {}
+        if batch:
+            flush(batch)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if report['inserted'] or report['updated']:
+            bump_catalog_version()
+            db.session.commit()
+    return report
+
+
+# Consultas de leitura do catálogo, da pesquisa e do histórico
+#
+# As rotas síncronas e as assíncronas (asgi.py) constroem os mesmos
+# statements a partir dos parâmetros do pedido e diferem apenas na sessão que
+# os executa. Parâmetros inválidos levantam QueryParamError com a mensagem a
+# devolver ao cliente.
+class QueryParamError(ValueError):
+    pass
+
+
+# Campos e ordenações aceites na listagem pública de artigos
+ARTICLE_FIELDS = ('id', 'name', 'content', 'image_url', 'price')
+ARTICLE_SORTS = ('id', 'name', 'price')
+CATALOG_QUERY_PARAMS = ('limit', 'offset', 'cursor', 'min_price', 'max_price', 'sort', 'fields')
+
+
+def catalog_full_query():
+    return db.select(*article_serializer.columns()).order_by(Article.id)
+
+
+def catalog_page_query(args):
+    """Página de /articles: (serializer, limit, statement, count_statement)
+
+    count_statement é None quando há cursor (o total só segue sem cursor).
+    O statement lê limit + 1 linhas para saber se há página seguinte; sem
+    limit, offset nem cursor devolve todos os artigos filtrados (limit None).
+    """
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_field = sort.lstrip('-')
+    if sort_field not in ARTICLE_SORTS:
+        raise QueryParamError(f'Invalid sort. Must be one of: {", ".join(ARTICLE_SORTS)} (prefix "-" for descending)')
+    
+    fields = args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(ARTICLE_FIELDS)
+    invalid_fields = [f for f in fields if f not in ARTICLE_FIELDS]
+    if invalid_fields:
+        raise QueryParamError(f'Invalid fields: {", ".join(invalid_fields)}')
+    
+    try:
+        paginated = any(param in args for param in ('limit', 'offset', 'cursor'))
+        limit = parse_limit(args.get('limit')) if paginated else None
+        offset = max(0, int(args.get('offset', 0)))
+        min_price = float(args['min_price']) if args.get('min_price') else None
+        max_price = float(args['max_price']) if args.get('max_price') else None
+        cursor = args.get('cursor')
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, 2)
+            last_id = int(last_id)
+    except ValueError:
+        raise QueryParamError('Invalid limit, offset, price range or cursor')
+    
+    sort_column = getattr(Article, sort_field)
+    serializer = article_serializer.only(*fields)
+    # Colunas de ordenação são sempre lidas (para o cursor), mesmo fora de fields
+    query = db.select(*serializer.columns(), sort_column.label('sort_value'), Article.id.label('sort_id'))
+    
+    if min_price is not None:
+        query = query.where(Article.price >= min_price)
+    if max_price is not None:
+        query = query.where(Article.price <= max_price)
+    
+    count_query = None
+    if cursor:
+        if descending:
+            query = query.where(or_(sort_column < last_value, and_(sort_column == last_value, Article.id < last_id)))
+        else:
+            query = query.where(or_(sort_column > last_value, and_(sort_column == last_value, Article.id > last_id)))
+    else:
+        count_query = db.select(db.func.count()).select_from(query.subquery())
+        query = query.offset(offset)
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), Article.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Article.id.asc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return serializer, limit, query, count_query
+
+
+def catalog_page_response(serializer, limit, rows, total):
+    """Resposta da página com os headers X-Total-Count e X-Next-Cursor"""
+    has_more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+    
+    response = json_response(serializer.dump_many(rows))
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_cursor(rows[-1].sort_value, rows[-1].sort_id)
+    return response
+
+
+def search_query(args, index_available):
+    """Pesquisa de artigos: (statement, count_statement)
+
+    index_available só é chamado se houver termos a pesquisar; sem índice
+    FTS5 a pesquisa usa ILIKE. Sem limit nem offset devolve todos os
+    resultados.
+    """
+    name_query = args.get('name', '')
+    sort = args.get('sort', 'relevance')
+    
+    if sort not in SEARCH_SORTS:
+        raise QueryParamError(f'Invalid sort. Must be one of: {", ".join(SEARCH_SORTS)}')
+    
+    try:
+        paginated = 'limit' in args or 'offset' in args
+        limit = parse_limit(args.get('limit')) if paginated else None
+        offset = max(0, int(args.get('offset', 0)))
+    except ValueError:
+        raise QueryParamError('limit and offset must be integers')
+    
+    match = build_match_query(name_query)
+    
+    if match and index_available():
+        count_query = db.text('SELECT count(*) FROM article_fts WHERE article_fts MATCH :match') \
+            .bindparams(match=match)
+        sql = (
+            'SELECT a.id, a.name, a.content, a.image_url, a.price '
+            'FROM article_fts JOIN article a ON a.id = article_fts.rowid '
+            'WHERE article_fts MATCH :match '
+            f'ORDER BY {SEARCH_SORTS[sort]}'
+        )
+        if limit is None:
+            return db.text(sql).bindparams(match=match), count_query
+        query = db.text(f'{sql} LIMIT :limit OFFSET :offset').bindparams(match=match, limit=limit, offset=offset)
+        return query, count_query
+    
+    query = db.select(*article_serializer.columns())
+    for term in re.findall(r'\w+', name_query):
+        query = query.where(or_(Article.name.ilike(f"%{term}%"), Article.content.ilike(f"%{term}%")))
+    if sort == 'price_asc':
+        query = query.order_by(Article.price.asc(), Article.id)
+    elif sort == 'price_desc':
+        query = query.order_by(Article.price.desc(), Article.id)
+    else:
+        query = query.order_by(Article.id)
+    count_query = db.select(db.func.count()).select_from(query.subquery())
+    return query.limit(limit).offset(offset), count_query
+
+
+def search_response(rows, total):
+    response = json_response(article_serializer.dump_many(rows))
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+def order_history_query(user_id, args):
+    """Página do histórico do utilizador: (limit, cursor, statement)
+
+    Keyset pagination sobre (order_date, id), do mais recente para o mais
+    antigo; o statement lê limit + 1 encomendas. Sem limit nem cursor, limit
+    é None e o statement lê o histórico completo (a página de perfil não
+    pagina).
+    """
+    try:
+        paginated = 'limit' in args or 'cursor' in args
+        limit = parse_limit(args.get('limit')) if paginated else None
+        cursor = args.get('cursor')
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, 2)
+            last_date, last_id = datetime.fromisoformat(last_date), int(last_id)
+    except (TypeError, ValueError) as e:
+        raise QueryParamError(str(e))
+    
+    query = db.select(*order_serializer.columns()).where(Order.user_id == user_id)
+    if cursor:
+        query = query.where(or_(
+            Order.order_date < last_date,
+            and_(Order.order_date == last_date, Order.id < last_id)
+        ))
+    query = query.order_by(Order.order_date.desc(), Order.id.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return limit, cursor, query
+
+
+def split_order_history(rows, limit):
+    """(encomendas da página, has_more) a partir das linhas lidas pelo statement de order_history_query"""
+    if limit is None:
+        return rows, False
+    return rows[:limit], len(rows) > limit
+
+
+def order_history_page(orders, limit, has_more, items):
+    """Payload da página a partir das encomendas (já cortadas a limit) e dos itens agrupados"""
+    return {
+        'success': True,
+        'orders': order_serializer.dump_many(orders, extra=lambda order: {'items': items[order.id]}),
+        'pagination': {
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(orders[-1].order_date, orders[-1].id) if has_more else None
+        }
+    }
 
 
 # Rotas
@@ -234,9 +2818,10 @@ def register():
     new_user = User(name=name, username=username, email=email, phone=phone)
     new_user.set_password(password)
     db.session.add(new_user)
+    bump_stats({'users': 1, 'active_users': 1})
     db.session.commit()
     
-    access_token = create_access_token(identity=str(new_user.id))
+    access_token = create_user_token(new_user)
     return jsonify({
         'message': 'User registered successfully.',
         'access_token': access_token
@@ -335,7 +2920,7 @@ def login():
     if not password_valid:
         return jsonify({'error': 'Invalid username or password'}), 401
 
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_user_token(user)
     return jsonify({
         'access_token': access_token,
         'user': {
@@ -346,18 +2931,57 @@ def login():
         }
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas por rota (pedidos, latência, queries SQL) no formato do Prometheus"""
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/articles', methods=['GET'])
+@read_only
 def list_all_articles():
-    articles = Article.query.all()
-    result = [{'id': a.id, 'name': a.name, 'content': a.content, 'image_url': a.image_url, 'price': a.price} for a in articles]
-    return jsonify(result), 200
+    """Listar o catálogo
+
+    Sem parâmetros devolve o catálogo completo a partir da cache do catálogo,
+    com ETag forte (If-None-Match recebe 304 enquanto o catálogo não mudar).
+
+    Com parâmetros devolve uma página: limit, offset ou cursor, min_price,
+    max_price, sort (id, name, price; prefixo "-" para descendente) e fields
+    (ex.: fields=id,name,price,image_url). O cursor da página seguinte segue
+    no header X-Next-Cursor e, sem cursor, o total no header X-Total-Count.
+    """
+    if not any(param in request.args for param in CATALOG_QUERY_PARAMS):
+        def build():
+            rows = db.session.execute(catalog_full_query())
+            return dumps_json(article_serializer.dump_many(rows))
+        
+        entry = catalog_cache.get(catalog_version(), build)
+        return cached_json_response(entry)
+    
+    try:
+        serializer, limit, query, count_query = catalog_page_query(request.args)
+    except QueryParamError as e:
+        return jsonify({'msg': str(e)}), 400
+    
+    total = db.session.execute(count_query).scalar() if count_query is not None else None
+    rows = db.session.execute(query).all()
+    return catalog_page_response(serializer, limit, rows, total)
 
 @app.route('/articles/search', methods=['GET'])
+@read_only
 def search_articles():
-    name_query = request.args.get('name', '')
-    articles = Article.query.filter(Article.name.ilike(f"%{name_query}%")).all()
-    result = [{'id': a.id, 'name': a.name, 'content': a.content, 'image_url': a.image_url, 'price': a.price} for a in articles]
-    return jsonify(result), 200
+    """Pesquisar artigos por nome e descrição
+
+    Parâmetros: name (texto), sort (relevance, price_asc, price_desc),
+    limit e offset. O total de resultados segue no header X-Total-Count.
+    """
+    try:
+        query, count_query = search_query(request.args, search_index_available)
+    except QueryParamError as e:
+        return jsonify({'msg': str(e)}), 400
+    
+    total = db.session.execute(count_query).scalar()
+    articles = db.session.execute(query).all()
+    return search_response(articles, total)
 
 @app.route('/articles', methods=['POST'])
 def add_article():
@@ -372,10 +2996,65 @@ def add_article():
     
     new_article = Article(name=name, content=content, image_url=image_url, price=float(price))
     db.session.add(new_article)
+    bump_stats({'articles': 1})
+    bump_catalog_version()
     db.session.commit()
     
     return jsonify({'msg': 'Article added.', 'id': new_article.id}), 201
 
+@app.route('/articles/autocomplete', methods=['GET'])
+def autocomplete_articles():
+    """Sugestões de nomes de artigos para a caixa de pesquisa
+
+    Parâmetros: q (prefixo) e limit (máximo 20). Responde a partir do índice
+    em memória; a única query é a leitura da versão do catálogo.
+    """
+    prefix = request.args.get('q', '')
+    try:
+        limit = parse_limit(request.args.get('limit'), default=10, maximum=AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    
+    version = catalog_version()
+    if autocomplete_index.version != version:
+        autocomplete_index.rebuild(db.session.query(Article.id, Article.name).all(), version)
+    
+    suggestions = autocomplete_index.suggest(prefix, limit)
+    return jsonify([{'id': article_id, 'name': name} for article_id, name in suggestions]), 200
+
+@app.route('/articles/<int:article_id>/recommendations', methods=['GET'])
+def article_recommendations(article_id):
+    """Artigos frequentemente comprados juntos com este artigo
+
+    Parâmetro opcional: limit (máximo RECOMMENDATIONS_TOP_K). Lê a linha
+    pré-calculada do artigo e os dados dos vizinhos por chave primária, sem
+    percorrer OrderItem (ver `flask recommendations build`).
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'), default=RECOMMENDATIONS_TOP_K, maximum=RECOMMENDATIONS_TOP_K)
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    
+    row = db.session.get(ArticleRecommendation, article_id)
+    neighbors = json.loads(row.neighbors)[:limit] if row else []
+    articles = {
+        article.id: article
+        for article in db.session.query(Article.id, Article.name, Article.price, Article.image_url)
+        .filter(Article.id.in_([other_id for other_id, _ in neighbors]))
+    } if neighbors else {}
+    
+    return jsonify([
+        {
+            'id': other_id,
+            'name': articles[other_id].name,
+            'price': articles[other_id].price,
+            'image_url': articles[other_id].image_url,
+            'bought_together': count
+        }
+        for other_id, count in neighbors
+        if other_id in articles
+    ]), 200
+
 @app.route('/api/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
@@ -385,14 +3064,7 @@ def get_profile():
     if not user:
         return jsonify({'msg': 'User not found.'}), 404
     
-    return jsonify({
-        'id': user.id,
-        'name': user.name,
-        'username': user.username,
-        'email': user.email,
-        'phone': user.phone,
-        'role': user.role
-    }), 200
+    return json_response(profile_serializer.dump(user))
 
 @app.route('/api/profile', methods=['PUT'])
 @jwt_required()
@@ -457,88 +3129,290 @@ def change_password():
     
     return jsonify({'msg': 'Password changed successfully.'}), 200
 
-# === ADMIN ENDPOINTS ===
+# === ADMIN ENDPOINTS ===
+
+def admin_required(f):
+    """Decorator para verificar se utilizador é admin
+
+    O role e o estado vêm das claims do token; só há consulta à base de dados
+    para tokens sem claims (emitidos antes destas existirem) ou de
+    utilizadores alterados depois da emissão do token (ver AuthzCache).
+    """
+    from functools import wraps
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        current_user_id = int(get_jwt_identity())
+        claims = get_jwt()
+        
+        if 'role' in claims and not authz_cache.is_stale(current_user_id, claims['iat']):
+            role, is_active = claims['role'], claims.get('is_active', True)
+        else:
+            user = db.session.get(User, current_user_id)
+            role, is_active = (user.role, user.is_active) if user else (None, False)
+        
+        if role != 'admin' or not is_active:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/api/admin/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_only
+def get_admin_stats():
+    """Obter estatísticas do sistema para dashboard admin
+
+    Responde a partir do snapshot StatCounter (uma leitura de poucas linhas);
+    só o recalcula de raiz se ainda não tiver sido construído. A reconstrução
+    lê e escreve no primário: uma réplica atrasada daria contadores antigos.
+    """
+    try:
+        counters = {row.key: row.value for row in StatCounter.query.all()}
+        if STATS_BUILT_KEY not in counters:
+            db.session.rollback()
+            replica_router.pin_primary()
+            rebuild_stats()
+            counters = {row.key: row.value for row in StatCounter.query.all()}
+        
+        # Estatísticas de encomendas por status
+        prefix = 'orders_status:'
+        order_status_counts = {
+            key[len(prefix):]: int(value)
+            for key, value in counters.items()
+            if key.startswith(prefix) and value
+        }
+        
+        return jsonify({
+            'success': True,
+            'stats': {
+                'total_users': int(counters.get('users', 0)),
+                'active_users': int(counters.get('active_users', 0)),
+                'total_articles': int(counters.get('articles', 0)),
+                'total_orders': int(counters.get('orders', 0)),
+                'total_revenue': float(counters.get('revenue', 0)),
+                'order_status_counts': order_status_counts
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/analytics/sales', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_only
+def get_sales_timeseries():
+    """Encomendas, unidades e receita por dia, semana ou mês (admin)
 
-def admin_required(f):
-    """Decorator para verificar se utilizador é admin"""
-    from functools import wraps
+    Parâmetros opcionais: date_from, date_to (inclusivo) e interval
+    (day, week ou month; por omissão day). Soma os agregados diários do
+    intervalo, sem ler encomendas.
+    """
+    interval = request.args.get('interval', 'day')
+    if interval not in SALES_ROLLUP_INTERVALS:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid interval. Must be one of: {", ".join(SALES_ROLLUP_INTERVALS)}'
+        }), 400
+    try:
+        start_day, end_day = parse_rollup_days(request.args.get('date_from'), request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(int(current_user_id))
+    try:
+        rows = rollup_query(
+            'all', start_day, end_day,
+            SalesRollup.day, SalesRollup.orders, SalesRollup.units, SalesRollup.revenue
+        ).order_by(SalesRollup.day).all()
         
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        series = []
+        for period, period_rows in groupby(rows, key=lambda row: rollup_period(row.day, interval)):
+            period_rows = list(period_rows)
+            series.append({
+                'period': period.isoformat(),
+                'orders': sum(row.orders for row in period_rows),
+                'units': sum(row.units for row in period_rows),
+                'revenue': round(sum(row.revenue for row in period_rows), 2)
+            })
         
-        return f(*args, **kwargs)
-    return decorated_function
+        return jsonify({
+            'success': True,
+            'interval': interval,
+            'series': series,
+            'totals': {
+                'orders': sum(point['orders'] for point in series),
+                'units': sum(point['units'] for point in series),
+                'revenue': round(sum(point['revenue'] for point in series), 2)
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/admin/stats', methods=['GET'])
+@app.route('/api/admin/analytics/top-articles', methods=['GET'])
 @jwt_required()
 @admin_required
-def get_admin_stats():
-    """Obter estatísticas do sistema para dashboard admin"""
+@read_only
+def get_top_articles():
+    """Artigos mais vendidos num intervalo de datas (admin)
+
+    Parâmetros opcionais: date_from, date_to (inclusivo), limit (máximo 200,
+    por omissão 10) e by (revenue ou units).
+    """
+    by = request.args.get('by', 'revenue')
+    if by not in ('revenue', 'units'):
+        return jsonify({'success': False, 'error': 'Invalid by. Must be one of: revenue, units'}), 400
     try:
-        total_users = User.query.count()
-        total_articles = Article.query.count()
-        total_orders = Order.query.count()
-        
-        # Estatísticas de encomendas por status
-        order_stats = db.session.query(
-            Order.status,
-            db.func.count(Order.id).label('count')
-        ).group_by(Order.status).all()
+        limit = parse_limit(request.args.get('limit'), default=10)
+        start_day, end_day = parse_rollup_days(request.args.get('date_from'), request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        units = db.func.sum(SalesRollup.units)
+        revenue = db.func.sum(SalesRollup.revenue)
+        rows = rollup_query(
+            'article', start_day, end_day,
+            SalesRollup.key, db.func.sum(SalesRollup.orders), units, revenue
+        ).group_by(SalesRollup.key) \
+            .having(db.func.sum(SalesRollup.orders) > 0) \
+            .order_by((revenue if by == 'revenue' else units).desc()) \
+            .limit(limit) \
+            .all()
         
-        order_status_counts = {status: count for status, count in order_stats}
+        article_ids = [int(key) for key, _, _, _ in rows]
+        names = dict(db.session.query(Article.id, Article.name).filter(Article.id.in_(article_ids)).all())
         
-        # Receita total
-        total_revenue = db.session.query(db.func.sum(Order.total)).scalar() or 0
+        return jsonify({
+            'success': True,
+            'articles': [{
+                'article_id': int(key),
+                'name': names.get(int(key)),
+                'orders': orders,
+                'units': units,
+                'revenue': round(revenue, 2)
+            } for key, orders, units, revenue in rows]
+        }), 200
         
-        # Utilizadores ativos
-        active_users = User.query.filter_by(is_active=True).count()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/analytics/breakdown', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_only
+def get_sales_breakdown():
+    """Encomendas, unidades e receita por país ou por estado (admin)
+
+    Parâmetros: by (country ou status; por omissão country) e, opcionais,
+    date_from e date_to (inclusivo).
+    """
+    by = request.args.get('by', 'country')
+    if by not in ('country', 'status'):
+        return jsonify({'success': False, 'error': 'Invalid by. Must be one of: country, status'}), 400
+    try:
+        start_day, end_day = parse_rollup_days(request.args.get('date_from'), request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        revenue = db.func.sum(SalesRollup.revenue)
+        rows = rollup_query(
+            by, start_day, end_day,
+            SalesRollup.key, db.func.sum(SalesRollup.orders), db.func.sum(SalesRollup.units), revenue
+        ).group_by(SalesRollup.key).having(db.func.sum(SalesRollup.orders) > 0).order_by(revenue.desc()).all()
         
         return jsonify({
             'success': True,
-            'stats': {
-                'total_users': total_users,
-                'active_users': active_users,
-                'total_articles': total_articles,
-                'total_orders': total_orders,
-                'total_revenue': float(total_revenue),
-                'order_status_counts': order_status_counts
-            }
+            'by': by,
+            'breakdown': [
+                {by: key, 'orders': orders, 'units': units, 'revenue': round(revenue, 2)}
+                for key, orders, units, revenue in rows
+            ]
         }), 200
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/db/replicas', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_replica_status():
+    """Estado das réplicas de leitura (verifica-as agora)"""
+    for key in replica_router.bind_keys:
+        replica_router.check(key)
+    return jsonify({'success': True, 'replicas': replica_router.status()}), 200
+
 @app.route('/api/admin/users', methods=['GET'])
 @jwt_required()
 @admin_required
+@read_only
 def get_all_users():
-    """Listar todos os utilizadores"""
+    """Listar utilizadores (admin) com paginação, ordenação e filtros
+
+    Parâmetros opcionais: page, per_page, sort (orders, name, role),
+    order (asc, desc), role e is_active. Sem page nem per_page devolve
+    todos os utilizadores (o painel admin lê a lista completa). O número de
+    encomendas de cada utilizador vem de um único LEFT JOIN agregado.
+    """
     try:
-        users = User.query.all()
-        users_data = []
+        paginated = 'page' in request.args or 'per_page' in request.args
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = parse_limit(request.args.get('per_page')) if paginated else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page and per_page must be integers'}), 400
+    
+    sort = request.args.get('sort', 'name')
+    direction = request.args.get('order', 'asc')
+    role = request.args.get('role')
+    is_active = request.args.get('is_active')
+    
+    if direction not in ('asc', 'desc'):
+        return jsonify({'success': False, 'error': 'order must be asc or desc'}), 400
+    
+    try:
+        total_orders = db.func.count(Order.id).label('total_orders')
+        sort_columns = {'orders': total_orders, 'name': User.name, 'role': User.role}
+        if sort not in sort_columns:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid sort. Must be one of: {", ".join(sort_columns)}'
+            }), 400
         
-        for user in users:
-            user_orders = Order.query.filter_by(user_id=user.id).count()
-            
-            users_data.append({
-                'id': user.id,
-                'name': user.name,
-                'username': user.username,
-                'email': user.email,
-                'phone': user.phone,
-                'role': user.role,
-                'is_active': user.is_active,
-                'total_orders': user_orders
-            })
+        filters = []
+        if role:
+            filters.append(User.role == role)
+        if is_active is not None:
+            filters.append(User.is_active == (is_active.lower() in ('1', 'true', 'yes')))
         
-        return jsonify({
+        total = db.session.query(db.func.count(User.id)).filter(*filters).scalar()
+        
+        sort_column = sort_columns[sort]
+        sort_column = sort_column.desc() if direction == 'desc' else sort_column.asc()
+        query = db.session.query(*user_serializer.columns(), total_orders) \
+            .outerjoin(Order, Order.user_id == User.id) \
+            .filter(*filters) \
+            .group_by(User.id) \
+            .order_by(sort_column, User.id.asc())
+        if per_page is None:
+            per_page = max(total, 1)
+        else:
+            query = query.limit(per_page).offset((page - 1) * per_page)
+        rows = query.all()
+        
+        users_data = user_serializer.dump_many(rows, extra=lambda row: {'total_orders': row.total_orders})
+        
+        return json_response({
             'success': True,
-            'users': users_data
+            'users': users_data,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            }
         }), 200
         
     except Exception as e:
@@ -556,6 +3430,10 @@ def update_user_admin(user_id):
         
         data = request.get_json()
         
+        # Só booleanos JSON: bool("false") seria True
+        if 'is_active' in data and not isinstance(data['is_active'], bool):
+            return jsonify({'success': False, 'error': 'is_active must be a boolean'}), 400
+        
         # Atualizar campos permitidos
         if 'name' in data:
             user.name = data['name']
@@ -563,10 +3441,15 @@ def update_user_admin(user_id):
             user.email = data['email']
         if 'phone' in data:
             user.phone = data['phone']
-        if 'role' in data:
+        if 'role' in data and data['role'] != user.role:
             user.role = data['role']
+            authz_cache.invalidate(user.id)
         if 'is_active' in data:
-            user.is_active = data['is_active']
+            is_active = data['is_active']
+            if is_active != user.is_active:
+                bump_stats({'active_users': 1 if is_active else -1})
+                authz_cache.invalidate(user.id)
+            user.is_active = is_active
         
         db.session.commit()
         
@@ -598,12 +3481,45 @@ def delete_user_admin(user_id):
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
+        # Descontar as vendas das encomendas que vão ser eliminadas
+        sold_lines = db.session.query(OrderItem.order_id, OrderItem.article_id, OrderItem.quantity, OrderItem.price) \
+            .join(Order, Order.id == OrderItem.order_id) \
+            .filter(Order.user_id == user_id) \
+            .all()
+        apply_article_sales([(article_id, quantity) for _, article_id, quantity, _ in sold_lines], sign=-1)
+        lines_by_order = {}
+        for order_id, article_id, quantity, price in sold_lines:
+            lines_by_order.setdefault(order_id, []).append((article_id, quantity, price))
+        
         # Eliminar encomendas associadas
         orders = Order.query.filter_by(user_id=user_id).all()
+        stats_deltas = {
+            'users': -1,
+            'active_users': -1 if user.is_active else 0,
+            'orders': -len(orders),
+            'revenue': -sum(order.total for order in orders)
+        }
         for order in orders:
+            key = f'orders_status:{order.status}'
+            stats_deltas[key] = stats_deltas.get(key, 0) - 1
             OrderItem.query.filter_by(order_id=order.id).delete()
             db.session.delete(order)
         
+        apply_sales_rollup(
+            [(order.order_date, order.country, order.status, order.total, lines_by_order.get(order.id, []))
+             for order in orders],
+            sign=-1
+        )
+        # Reservas de stock do utilizador (ativas ou expiradas por limpar): devolver as unidades
+        reserved = db.session.query(StockReservation.article_id, StockReservation.quantity) \
+            .filter(StockReservation.user_id == user_id) \
+            .all()
+        StockReservation.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        increment_stock(reserved)
+        
+        bump_stats(stats_deltas)
+        bump_order_history([user_id])
+        authz_cache.invalidate(user_id)
         db.session.delete(user)
         db.session.commit()
         
@@ -619,31 +3535,28 @@ def delete_user_admin(user_id):
 @app.route('/api/admin/articles', methods=['GET'])
 @jwt_required()
 @admin_required
+@read_only
 def get_all_articles_admin():
     """Listar todos os artigos (admin)"""
     try:
-        articles = Article.query.all()
-        articles_data = []
+        rows = db.session.query(*admin_article_serializer.columns()).order_by(Article.id).all()
         
-        for article in articles:
-            # Contar quantas vezes foi vendido
-            total_sold = db.session.query(
-                db.func.sum(OrderItem.quantity)
-            ).filter_by(article_id=article.id).scalar() or 0
-            
-            articles_data.append({
-                'id': article.id,
-                'name': article.name,
-                'content': article.content,
-                'image_url': article.image_url,
-                'price': article.price,
-                'total_sold': int(total_sold)
-            })
+        # Unidades em reservas ativas, numa única query agregada
+        reserved = dict(
+            db.session.query(StockReservation.article_id, db.func.sum(StockReservation.quantity))
+            .filter(StockReservation.expires_at > datetime.utcnow())
+            .group_by(StockReservation.article_id)
+            .all()
+        )
         
-        return jsonify({
+        articles_data = admin_article_serializer.dump_many(
+            rows, extra=lambda row: {'reserved': int(reserved.get(row.id, 0))}
+        )
+        
+        return json_response({
             'success': True,
             'articles': articles_data
-        }), 200
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -660,6 +3573,7 @@ def create_article_admin():
         content = data.get('content')
         image_url = data.get('image_url', '')
         price = data.get('price', 0.0)
+        stock = data.get('stock')
         
         if not name or not content:
             return jsonify({
@@ -667,14 +3581,20 @@ def create_article_admin():
                 'error': 'Name and content are required'
             }), 400
         
+        if stock is not None and int(stock) < 0:
+            return jsonify({'success': False, 'error': 'Stock cannot be negative'}), 400
+        
         new_article = Article(
             name=name,
             content=content,
             image_url=image_url,
-            price=float(price)
+            price=float(price),
+            stock=int(stock) if stock is not None else None
         )
         
         db.session.add(new_article)
+        bump_stats({'articles': 1})
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -687,6 +3607,36 @@ def create_article_admin():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/articles/import', methods=['POST'])
+@jwt_required()
+@admin_required
+def import_articles_admin():
+    """Importar artigos em massa (admin)
+
+    Aceita um array JSON ou NDJSON no corpo do pedido, ou um ficheiro no
+    campo multipart "file"; o conteúdo é lido em streaming. Artigos com um
+    nome já existente são atualizados (campos ausentes mantêm o valor).
+    """
+    try:
+        upload = request.files.get('file')
+        raw = upload.stream if upload else request.stream
+        stream = io.TextIOWrapper(raw, encoding='utf-8-sig')
+        
+        def log_progress(report):
+            app.logger.info(
+                'Importação do catálogo: %d processados, %d inseridos, %d atualizados, %d rejeitados',
+                report['processed'], report['inserted'], report['updated'], report['rejected']
+            )
+        
+        report = import_catalog(stream, progress=log_progress)
+        return jsonify({'success': True, **report}), 200
+        
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/admin/articles/<int:article_id>', methods=['PUT'])
 @jwt_required()
 @admin_required
@@ -707,7 +3657,13 @@ def update_article_admin(article_id):
             article.image_url = data['image_url']
         if 'price' in data:
             article.price = float(data['price'])
+        if 'stock' in data:
+            # Contagem absoluta (inventário); para entradas de stock usar /stock, que é atómico
+            if data['stock'] is not None and int(data['stock']) < 0:
+                return jsonify({'success': False, 'error': 'Stock cannot be negative'}), 400
+            article.stock = int(data['stock']) if data['stock'] is not None else None
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -730,14 +3686,16 @@ def delete_article_admin(article_id):
             return jsonify({'success': False, 'error': 'Article not found'}), 404
         
         # Verificar se artigo tem encomendas associadas
-        order_items = OrderItem.query.filter_by(article_id=article_id).count()
-        if order_items > 0:
+        if article.order_item_count > 0:
             return jsonify({
                 'success': False,
                 'error': 'Cannot delete article with existing orders'
             }), 400
         
+        StockReservation.query.filter_by(article_id=article_id).delete()
         db.session.delete(article)
+        bump_stats({'articles': -1})
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -749,56 +3707,145 @@ def delete_article_admin(article_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/admin/orders', methods=['GET'])
+@app.route('/api/admin/articles/<int:article_id>/stock', methods=['POST'])
 @jwt_required()
 @admin_required
-def get_all_orders_admin():
-    """Listar todas as encomendas (admin)"""
+def adjust_article_stock(article_id):
+    """Ajustar o stock de um artigo (admin)
+
+    Corpo: {"delta": 10} para entradas ou {"delta": -2} para quebras. O
+    ajuste é um único UPDATE atómico, seguro em paralelo com encomendas;
+    um artigo sem stock controlado passa a ter stock = delta.
+    """
     try:
-        orders = Order.query.order_by(Order.order_date.desc()).all()
-        orders_data = []
+        data = request.get_json() or {}
+        try:
+            delta = int(data['delta'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'delta must be an integer'}), 400
         
-        for order in orders:
-            user = User.query.get(order.user_id)
-            order_items = []
-            
-            for item in order.items:
-                order_items.append({
-                    'id': item.id,
-                    'article_name': item.article.name,
-                    'quantity': item.quantity,
-                    'price': item.price
-                })
-            
-            orders_data.append({
-                'id': order.id,
-                'user_id': order.user_id,
-                'user_name': user.name if user else 'Unknown',
-                'user_email': user.email if user else 'Unknown',
-                'order_date': order.order_date.isoformat(),
-                'status': order.status,
-                'total': order.total,
-                'items_count': len(order.items),
-                'items': order_items,
-                'shipping_info': {
-                    'name': f"{order.first_name} {order.last_name}",
-                    'email': order.email,
-                    'phone': order.phone,
-                    'address': order.address,
-                    'city': order.city,
-                    'postal_code': order.postal_code,
-                    'country': order.country
-                }
-            })
+        current = db.func.coalesce(Article.stock, 0)
+        result = db.session.execute(
+            db.update(Article)
+            .where(Article.id == article_id, current + delta >= 0)
+            .values(stock=current + delta),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            if not db.session.get(Article, article_id):
+                return jsonify({'success': False, 'error': 'Article not found'}), 404
+            return jsonify({'success': False, 'error': 'Stock cannot be negative'}), 400
+        
+        db.session.commit()
+        stock = db.session.query(Article.stock).filter_by(id=article_id).scalar()
         
         return jsonify({
             'success': True,
-            'orders': orders_data
+            'message': 'Stock updated successfully',
+            'stock': stock
         }), 200
         
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/orders', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_only
+def get_all_orders_admin():
+    """Listar encomendas (admin) com paginação por cursor e filtros
+
+    Parâmetros opcionais: limit, cursor, status, date_from, date_to.
+    Sem limit nem cursor devolve todas as encomendas (o painel admin lê a
+    lista completa). O número de queries por página é constante: encomendas
+    + utilizador num JOIN e os itens (com o nome do artigo) numa única query
+    IN, ambas lidas como linhas Core e serializadas sem hidratar objetos ORM.
+    """
+    try:
+        paginated = 'limit' in request.args or 'cursor' in request.args
+        limit = parse_limit(request.args.get('limit')) if paginated else None
+        date_from, date_to = parse_date_range(request.args.get('date_from'), request.args.get('date_to'))
+        status = request.args.get('status')
+        cursor = request.args.get('cursor')
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, 2)
+            last_date, last_id = datetime.fromisoformat(last_date), int(last_id)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        query = db.session.query(*admin_order_serializer.columns()).outerjoin(User, User.id == Order.user_id)
+        
+        if status:
+            query = query.filter(Order.status == status)
+        if date_from:
+            query = query.filter(Order.order_date >= date_from)
+        if date_to:
+            query = query.filter(Order.order_date < date_to)
+        
+        # Keyset pagination sobre (order_date, id), do mais recente para o mais antigo
+        if cursor:
+            query = query.filter(or_(
+                Order.order_date < last_date,
+                and_(Order.order_date == last_date, Order.id < last_id)
+            ))
+        
+        query = query.order_by(Order.order_date.desc(), Order.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        orders = query.all()
+        has_more = limit is not None and len(orders) > limit
+        orders = orders[:limit]
+        items = load_order_items([order.id for order in orders], admin_order_item_serializer)
+        orders_data = admin_order_serializer.dump_many(
+            orders, extra=lambda order: {'items_count': len(items[order.id]), 'items': items[order.id]}
+        )
+        
+        next_cursor = encode_cursor(orders[-1].order_date, orders[-1].id) if has_more else None
+        
+        return json_response({
+            'success': True,
+            'orders': orders_data,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        })
+        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/orders/export', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_only
+def export_orders_admin():
+    """Exportar encomendas (admin) em streaming, como CSV ou NDJSON
+
+    Parâmetros opcionais: format (csv ou ndjson), status, date_from, date_to.
+    A resposta é gerada à medida que as linhas são lidas da base de dados.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ORDER_EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+    try:
+        date_from, date_to = parse_date_range(request.args.get('date_from'), request.args.get('date_to'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    writer, mimetype = ORDER_EXPORT_FORMATS[export_format]
+    orders = iter_export_orders(request.args.get('status'), date_from, date_to)
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    
+    return Response(
+        stream_with_context(writer(orders)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/admin/orders/<int:order_id>/status', methods=['PUT'])
 @jwt_required()
 @admin_required
@@ -819,6 +3866,21 @@ def update_order_status(order_id):
                 'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'
             }), 400
         
+        lines = []
+        if new_status != order.status:
+            # Cancelar devolve as unidades ao stock; reativar uma encomenda cancelada
+            # volta a retirá-las, com o mesmo UPDATE condicional das encomendas novas
+            if 'cancelado' in (order.status, new_status):
+                lines = db.session.query(OrderItem.article_id, OrderItem.quantity) \
+                    .filter(OrderItem.order_id == order.id) \
+                    .all()
+                if new_status == 'cancelado':
+                    increment_stock(lines)
+                else:
+                    decrement_stock(lines)
+            bump_stats({f'orders_status:{order.status}': -1, f'orders_status:{new_status}': 1})
+            bump_order_history([order.user_id])
+            move_sales_rollup_status(order, order.status, new_status)
         order.status = new_status
         db.session.commit()
         
@@ -827,13 +3889,33 @@ def update_order_status(order_id):
             'message': 'Order status updated successfully'
         }), 200
         
+    except OutOfStock:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Insufficient stock',
+            'items': insufficient_stock(lines)
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/orders', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_order():
+    """Criar encomenda
+
+    Os preços vêm do catálogo e não do cliente: todos os artigos referidos
+    são lidos numa única query IN, os totais são calculados no servidor e os
+    itens são inseridos num único INSERT (executemany), tudo numa transação.
+    O campo totals do pedido, se enviado, é ignorado. Aceita o header
+    Idempotency-Key para que repetições do cliente não dupliquem encomendas.
+
+    O stock é retirado com um UPDATE condicional por artigo; com
+    reservation_id são usadas as unidades reservadas no checkout
+    (POST /api/stock/reservations). Sem stock suficiente responde 409.
+    """
     current_user_id = get_jwt_identity()
     user = User.query.get(int(current_user_id))
     
@@ -843,12 +3925,11 @@ def create_order():
     data = request.get_json()
     
     # Validar estrutura dos dados
-    if not data or 'shipping_info' not in data or 'items' not in data or 'totals' not in data:
-        return jsonify({'success': False, 'message': 'Invalid data structure. Required: shipping_info, items, totals'}), 400
+    if not data or 'shipping_info' not in data or 'items' not in data:
+        return jsonify({'success': False, 'message': 'Invalid data structure. Required: shipping_info, items'}), 400
     
     shipping_info = data.get('shipping_info', {})
     items = data.get('items', [])
-    totals = data.get('totals', {})
     
     # Validar campos obrigatórios
     required_shipping_fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'city', 'postal_code', 'country']
@@ -857,16 +3938,36 @@ def create_order():
     if missing_fields:
         return jsonify({'success': False, 'message': f'Missing shipping fields: {", ".join(missing_fields)}'}), 400
     
-    if not items:
-        return jsonify({'success': False, 'message': 'Order must contain at least one item'}), 400
-    
-    required_total_fields = ['subtotal', 'shipping', 'tax', 'total']
-    missing_total_fields = [field for field in required_total_fields if field not in totals]
+    # Linhas (article_id, quantity) pela ordem do pedido
+    try:
+        lines = parse_order_lines(items)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    if missing_total_fields:
-        return jsonify({'success': False, 'message': f'Missing total fields: {", ".join(missing_total_fields)}'}), 400
+    maybe_release_expired_reservations()
     
     try:
+        # Snapshot dos preços de todos os artigos da encomenda numa única query
+        article_ids = {article_id for article_id, _ in lines}
+        prices = dict(
+            db.session.query(Article.id, Article.price).filter(Article.id.in_(article_ids)).all()
+        )
+        unknown = sorted(article_ids - prices.keys())
+        if unknown:
+            return jsonify({
+                'success': False,
+                'message': f'Unknown products: {", ".join(map(str, unknown))}'
+            }), 400
+        
+        totals = compute_order_totals(sum(prices[article_id] * quantity for article_id, quantity in lines))
+        
+        # Retirar as unidades ao stock (ou usar a reserva feita no checkout)
+        reservation_id = data.get('reservation_id')
+        if reservation_id:
+            consume_reservation(str(reservation_id), int(current_user_id), lines)
+        else:
+            decrement_stock(lines)
+        
         # Criar nova encomenda
         new_order = Order(
             user_id=int(current_user_id),
@@ -878,48 +3979,131 @@ def create_order():
             city=shipping_info['city'],
             postal_code=shipping_info['postal_code'],
             country=shipping_info['country'],
-            subtotal=float(totals['subtotal']),
-            shipping=float(totals['shipping']),
-            tax=float(totals['tax']),
-            total=float(totals['total'])
+            **totals
         )
         
         db.session.add(new_order)
         db.session.flush()  # Para obter o ID da encomenda
         
-        # Criar items da encomenda
-        for item in items:
-            if not all(field in item for field in ['product_id', 'name', 'price', 'quantity']):
-                db.session.rollback()
-                return jsonify({'success': False, 'message': 'Invalid item structure'}), 400
-            
-            order_item = OrderItem(
-                order_id=new_order.id,
-                article_id=item['product_id'],
-                quantity=int(item['quantity']),
-                price=float(item['price'])
-            )
-            db.session.add(order_item)
+        # Criar items da encomenda num único INSERT (executemany)
+        db.session.execute(db.insert(OrderItem), [
+            {'order_id': new_order.id, 'article_id': article_id, 'quantity': quantity, 'price': prices[article_id]}
+            for article_id, quantity in lines
+        ])
         
+        apply_article_sales(lines)
+        bump_stats({
+            'orders': 1,
+            'revenue': new_order.total,
+            f'orders_status:{new_order.status}': 1
+        })
+        bump_order_history([new_order.user_id])
+        apply_sales_rollup([(
+            new_order.order_date, new_order.country, new_order.status, new_order.total,
+            [(article_id, quantity, prices[article_id]) for article_id, quantity in lines]
+        )])
+        order_id = new_order.id
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': 'Order created successfully.',
-            'order_id': new_order.id
+            'order_id': order_id,
+            'totals': totals
         }), 201
         
-    except ValueError as e:
+    except OutOfStock:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient stock',
+            'items': insufficient_stock(lines)
+        }), 409
+    except ReservationError as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': f'Invalid number format: {str(e)}'}), 400
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao criar encomenda: {e}")
         return jsonify({'success': False, 'message': 'Error creating order.'}), 500
 
+@app.route('/api/stock/reservations', methods=['POST'])
+@jwt_required()
+def create_stock_reservation():
+    """Reservar stock para o checkout
+
+    Corpo: {"items": [{"product_id": 1, "quantity": 2}, ...]}. As unidades
+    ficam reservadas durante STOCK_RESERVATION_TTL segundos; o reservation_id
+    devolvido deve ser enviado em POST /api/orders.
+    """
+    current_user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    try:
+        lines = parse_order_lines(data.get('items'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    maybe_release_expired_reservations()
+    
+    try:
+        article_ids = {article_id for article_id, _ in lines}
+        known = {article_id for (article_id,) in db.session.query(Article.id).filter(Article.id.in_(article_ids))}
+        unknown = sorted(article_ids - known)
+        if unknown:
+            return jsonify({
+                'success': False,
+                'message': f'Unknown products: {", ".join(map(str, unknown))}'
+            }), 400
+        
+        token, expires_at = reserve_stock(current_user_id, lines)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'reservation_id': token,
+            'expires_at': expires_at.isoformat()
+        }), 201
+        
+    except OutOfStock:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient stock',
+            'items': insufficient_stock(lines)
+        }), 409
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Erro ao reservar stock')
+        return jsonify({'success': False, 'message': 'Error reserving stock.'}), 500
+
+@app.route('/api/stock/reservations/<reservation_id>', methods=['DELETE'])
+@jwt_required()
+def delete_stock_reservation(reservation_id):
+    """Cancelar uma reserva de stock (ex.: carrinho abandonado pelo utilizador)"""
+    try:
+        if not release_reservation(reservation_id, int(get_jwt_identity())):
+            return jsonify({'success': False, 'message': 'Stock reservation not found'}), 404
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Stock reservation released'}), 200
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Erro ao libertar reserva')
+        return jsonify({'success': False, 'message': 'Error releasing reservation.'}), 500
+
 @app.route('/api/orders', methods=['GET'])
 @jwt_required()
+@read_only
 def get_user_orders():
+    """Histórico de encomendas do utilizador autenticado, com paginação por cursor
+
+    Parâmetros opcionais: limit e cursor (next_cursor da página anterior);
+    sem nenhum dos dois devolve o histórico completo. O número de queries é
+    constante: encomendas da página e os itens (com o nome do artigo) numa
+    única query IN, lidas como linhas Core. A primeira página vem da cache de
+    histórico enquanto não houver encomendas novas, mudanças de estado ou
+    alterações ao catálogo.
+    """
     current_user_id = get_jwt_identity()
     user = User.query.get(int(current_user_id))
     
@@ -927,52 +4111,282 @@ def get_user_orders():
         return jsonify({'success': False, 'orders': [], 'message': 'User not found.'}), 404
     
     try:
-        # Buscar encomendas do utilizador ordenadas por data (mais recentes primeiro)
-        orders = Order.query.filter_by(user_id=int(current_user_id)).order_by(Order.order_date.desc()).all()
-        
-        result = []
-        for order in orders:
-            order_items = []
-            for item in order.items:
-                order_items.append({
-                    'product_id': item.article_id,
-                    'name': item.article.name,
-                    'quantity': item.quantity,
-                    'price': item.price
-                })
-            
-            result.append({
-                'id': order.id,
-                'user_id': order.user_id,
-                'order_date': order.order_date.isoformat(),
-                'status': order.status,
-                'shipping_info': {
-                    'first_name': order.first_name,
-                    'last_name': order.last_name,
-                    'email': order.email,
-                    'phone': order.phone,
-                    'address': order.address,
-                    'city': order.city,
-                    'postal_code': order.postal_code,
-                    'country': order.country
-                },
-                'items': order_items,
-                'totals': {
-                    'subtotal': order.subtotal,
-                    'shipping': order.shipping,
-                    'tax': order.tax,
-                    'total': order.total
-                }
-            })
-        
-        return jsonify({'success': True, 'orders': result}), 200
+        limit, cursor, query = order_history_query(user.id, request.args)
+    except QueryParamError as e:
+        return jsonify({'success': False, 'orders': [], 'message': str(e)}), 400
+    
+    def build_page():
+        orders, has_more = split_order_history(db.session.execute(query).all(), limit)
+        items = load_order_items([order.id for order in orders], order_item_serializer)
+        return order_history_page(orders, limit, has_more, items)
+    
+    try:
+        if cursor:
+            page = build_page()
+        else:
+            page = order_history_cache.get(user.id, order_history_version(user.id), limit, build_page)
+        return json_response(page)
         
     except Exception as e:
         print(f"Erro ao buscar encomendas: {e}")
         return jsonify({'success': False, 'orders': [], 'message': 'Error fetching orders.'}), 500
 
+# === CLI ===
+
+@app.cli.command('rebuild-article-counters')
+def rebuild_article_counters():
+    """Recalcular total_sold e order_item_count de todos os artigos a partir de OrderItem"""
+    sold = db.select(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)) \
+        .where(OrderItem.article_id == Article.id) \
+        .scalar_subquery()
+    count = db.select(db.func.count(OrderItem.id)) \
+        .where(OrderItem.article_id == Article.id) \
+        .scalar_subquery()
+    
+    result = db.session.execute(
+        db.update(Article).values(total_sold=sold, order_item_count=count),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    click.echo(f'Contadores recalculados para {result.rowcount} artigos.')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Criar o índice full-text dos artigos (se necessário) e reindexar todos os artigos"""
+    if not init_search_index():
+        click.echo('Base de dados sem suporte FTS5: a pesquisa usa ILIKE.')
+        return
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO article_fts(article_fts) VALUES ('rebuild')")
+    click.echo('Índice de pesquisa reconstruído.')
+
+
+@app.cli.command('release-expired-reservations')
+def release_expired_reservations_command():
+    """Devolver ao stock as reservas de checkout expiradas"""
+    released = release_expired_reservations()
+    click.echo(f'{released} linhas de reserva expiradas libertadas.')
+
+
+@app.cli.group('catalog')
+def catalog_cli():
+    """Gestão do catálogo de artigos"""
+
+
+@catalog_cli.command('import')
+@click.argument('path', default='artigos.json', type=click.Path(allow_dash=True))
+@click.option('--batch-size', default=CATALOG_IMPORT_BATCH_SIZE, show_default=True, help='Artigos por transação')
+def catalog_import_command(path, batch_size):
+    """Importar artigos de um ficheiro JSON ou NDJSON (upsert pelo nome; "-" lê do stdin)"""
+    started = time.perf_counter()
+    
+    def echo_progress(report):
+        click.echo(
+            f"  {report['processed']} processados ({report['inserted']} inseridos, "
+            f"{report['updated']} atualizados, {report['rejected']} rejeitados)"
+        )
+    
+    with click.open_file(path, encoding='utf-8-sig') as stream:
+        try:
+            report = import_catalog(stream, batch_size, progress=echo_progress)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    
+    for row in report['rejected_rows']:
+        click.echo(f"  Rejeitado #{row['position']}: {row['error']}", err=True)
+    if report['rejected'] > len(report['rejected_rows']):
+        click.echo(f"  ... e mais {report['rejected'] - len(report['rejected_rows'])} rejeitados", err=True)
+    click.echo(
+        f"Importação concluída em {time.perf_counter() - started:.2f}s: {report['inserted']} inseridos, "
+        f"{report['updated']} atualizados, {report['rejected']} rejeitados."
+    )
+
+
+@app.cli.group('recommendations')
+def recommendations_cli():
+    """Índice de recomendações de artigos comprados juntos"""
+
+
+@recommendations_cli.command('build')
+@click.option('--top-k', default=RECOMMENDATIONS_TOP_K, show_default=True, help='Vizinhos guardados por artigo')
+def recommendations_build_command(top_k):
+    """Reconstruir de raiz a matriz de co-ocorrência e as recomendações"""
+    started = time.perf_counter()
+    pairs, articles = build_recommendations(top_k)
+    click.echo(
+        f'{pairs} pares, {articles} artigos com recomendações '
+        f'({"NumPy/SciPy" if sparse is not None else "Python"}, {time.perf_counter() - started:.2f}s).'
+    )
+
+
+@recommendations_cli.command('update')
+@click.option('--top-k', default=RECOMMENDATIONS_TOP_K, show_default=True, help='Vizinhos guardados por artigo')
+def recommendations_update_command(top_k):
+    """Incluir nas recomendações as encomendas feitas desde a última atualização"""
+    orders, articles = update_recommendations(top_k)
+    click.echo(f'{orders} encomendas novas, {articles} artigos atualizados.')
+
+
+# Tabelas que nunca devem ser lidas por inteiro pelas rotas de encomendas
+QUERY_PLAN_TABLES = ('order', 'order_item')
+
+
+def _plan_full_scans(statement, plan):
+    """Linhas do EXPLAIN QUERY PLAN que percorrem uma tabela vigiada por inteiro
+
+    Percorrer um índice só é aceite com LIMIT (páginas keyset, que param ao
+    fim de limit linhas); qualquer outro SCAN lê a tabela toda.
+    """
+    bounded = re.search(r'\bLIMIT\b', statement, re.IGNORECASE) is not None
+    scans = []
+    for detail in plan:
+        match = re.match(r'SCAN (?:TABLE )?"?(\w+)"?', detail)
+        if match and match.group(1) in QUERY_PLAN_TABLES and not (bounded and 'USING' in detail):
+            scans.append(detail)
+    return scans
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Correr EXPLAIN QUERY PLAN nas queries das rotas de encomendas e falhar se houver full scans
+
+    Chama as rotas (só leitura) com o cliente de testes, regista o SQL que
+    executam e analisa o plano de cada SELECT na base de dados configurada.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('EXPLAIN QUERY PLAN só é suportado em SQLite.')
+        return
+    
+    user = User.query.order_by(User.id).first()
+    user_id = user.id if user else 0
+    admin_token = create_access_token(identity=str(user_id), additional_claims={'role': 'admin', 'is_active': True})
+    user_token = create_access_token(identity=str(user_id))
+    cursor = encode_cursor(datetime.utcnow(), 0)
+    
+    requests_to_check = [
+        ('/api/orders', user_token),
+        ('/api/admin/orders?limit=50', admin_token),
+        ('/api/admin/orders?status=processando', admin_token),
+        ('/api/admin/orders?date_from=2024-01-01&date_to=2024-12-31', admin_token),
+        (f'/api/admin/orders?status=entregue&cursor={cursor}', admin_token),
+        ('/api/admin/orders/export?status=entregue', admin_token),
+        ('/api/admin/orders/export?format=ndjson&date_from=2024-01-01&date_to=2024-02-01', admin_token),
+        ('/api/admin/stats', admin_token),
+    ]
+    if not user:
+        click.echo('Aviso: sem utilizadores, /api/orders não chega a consultar encomendas.')
+    
+    # O primeiro pedido às estatísticas pode reconstruir o snapshot (leitura completa esperada)
+    client = app.test_client()
+    client.get('/api/admin/stats', headers={'Authorization': f'Bearer {admin_token}'})
+    
+    captured = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+    
+    statements = {}
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        for url, token in requests_to_check:
+            # Os pedidos partilham o app context do comando: começar cada um com a sessão vazia
+            db.session.remove()
+            captured.clear()
+            response = client.get(url, headers={'Authorization': f'Bearer {token}'})
+            response.get_data()
+            if response.status_code != 200:
+                click.echo(f'Aviso: {url} respondeu {response.status_code}')
+            statements[url] = list(captured)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    
+    # Somas de vendas por artigo (rebuild-article-counters / estatísticas de artigos)
+    sales = db.select(db.func.sum(OrderItem.quantity), db.func.count(OrderItem.id)) \
+        .where(OrderItem.article_id == 1)
+    compiled = sales.compile(db.engine)
+    statements['article sales'] = [(str(compiled), tuple(compiled.params.values()))]
+    
+    failures = 0
+    connection = db.engine.raw_connection()
+    try:
+        for name, queries in statements.items():
+            for statement, parameters in queries:
+                plan = [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                scans = _plan_full_scans(statement, plan)
+                if scans:
+                    failures += 1
+                    click.echo(f'FULL SCAN em {name}: {"; ".join(scans)}\n    {" ".join(statement.split())}')
+                elif any('TEMP B-TREE' in detail for detail in plan):
+                    click.echo(f'Aviso (ordenação sem índice) em {name}: {"; ".join(plan)}')
+    finally:
+        # O SQLite não revalida o schema em EXPLAIN: descartar a ligação em vez
+        # de a devolver ao pool com planos em cache
+        connection.invalidate()
+    
+    total = sum(len(queries) for queries in statements.values())
+    if failures:
+        raise click.ClickException(f'{failures} de {total} queries fazem full scan a {", ".join(QUERY_PLAN_TABLES)}.')
+    click.echo(f'{total} queries verificadas, nenhuma faz full scan a {", ".join(QUERY_PLAN_TABLES)}.')
+
+
+@app.cli.command('sync-replicas')
+def sync_replicas_command():
+    """Copiar a base de dados SQLite primária para as réplicas SQLite (testes locais)
+
+    Em PostgreSQL as réplicas são mantidas pela replicação do servidor.
+    """
+    if db.engine.dialect.name != 'sqlite' or not replica_router.enabled:
+        raise click.ClickException('Só disponível com um primário SQLite e DATABASE_REPLICA_URLS definidas.')
+    
+    source = db.engine.raw_connection()
+    try:
+        for key in replica_router.bind_keys:
+            engine = db.engines[key]
+            if engine.dialect.name != 'sqlite':
+                click.echo(f'{key}: não é SQLite, ignorada.')
+                continue
+            engine.dispose()
+            target = sqlite3.connect(engine.url.database)
+            try:
+                source.driver_connection.backup(target)
+            finally:
+                target.close()
+            replica_router.check(key)
+            click.echo(f'{key}: copiada para {engine.url.database}.')
+    finally:
+        source.close()
+
+
+@app.cli.command('backfill-sales-rollups')
+@click.option('--date-from', help='Primeiro dia a recalcular (YYYY-MM-DD); por omissão todo o histórico')
+@click.option('--date-to', help='Último dia a recalcular (YYYY-MM-DD, inclusivo)')
+def backfill_sales_rollups_command(date_from, date_to):
+    """Recalcular os agregados diários de vendas a partir das encomendas"""
+    try:
+        start_day, end_day = parse_rollup_days(date_from, date_to)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    written = backfill_sales_rollups(start_day, end_day)
+    click.echo(f'{written} linhas de agregados diários escritas.')
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Verificar o snapshot de estatísticas do dashboard e reconstruí-lo de raiz"""
+    drift = rebuild_stats()
+    if not drift:
+        click.echo('Snapshot de estatísticas consistente.')
+        return
+    for key, (stored, fresh) in sorted(drift.items()):
+        click.echo(f'{key}: {stored:g} -> {fresh:g}')
+    click.echo(f'Snapshot reconstruído ({len(drift)} contadores corrigidos).')
+
+
 if __name__ == '__main__':
     # Cria tabelas se não existirem
     with app.app_context():
         db.create_all()
+        init_search_index()
     app.run(debug=True)
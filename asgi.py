@@ -0,0 +1,262 @@
+"""Modo de serviço ASGI: rotas de leitura assíncronas sobre a mesma app Flask
+
+As rotas limitadas por I/O mais pedidas (GET /articles, GET /articles/search
+e GET /api/orders) correm como corrotinas sobre o engine assíncrono do
+SQLAlchemy (aiosqlite em SQLite, asyncpg em PostgreSQL): um worker atende
+muitas ligações em simultâneo enquanto espera pela base de dados, em vez de
+ocupar um thread por pedido. Todas as outras rotas são a app WSGI, servida
+pelo asgiref num thread por pedido.
+
+As rotas assíncronas usam os mesmos statements, serializers e caches das
+rotas síncronas (ver "Consultas de leitura" em app.py) e correm dentro do
+contexto de pedido do Flask, pelo que os hooks da app (CORS, métricas,
+Server-Timing) e os erros do JWT dão as mesmas respostas. As réplicas de
+leitura não são usadas neste modo: as queries assíncronas vão para
+ASYNC_DATABASE_URL (por omissão o DATABASE_URL com o driver assíncrono).
+
+Uso:
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+"""
+import asyncio
+import io
+import os
+import sys
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import (
+    CATALOG_QUERY_PARAMS, QueryParamError, User, app, article_serializer, cached_json_response,
+    catalog_cache, catalog_full_query, catalog_page_query, catalog_page_response, catalog_version_query,
+    db, dumps_json, engine_options, group_order_items, json_response, order_history_cache,
+    order_history_page, order_history_query, order_history_version_query, order_item_serializer,
+    order_items_query, search_index_available, search_query, search_response, set_sqlite_pragmas,
+    split_order_history,
+)
+
+# Driver assíncrono de cada base de dados suportada
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """O mesmo URL com o driver assíncrono (ex.: sqlite:///app.db -> sqlite+aiosqlite:///app.db)"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'Sem driver assíncrono para {backend}: defina ASYNC_DATABASE_URL')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def async_engine_options(url):
+    """Opções do pool do engine assíncrono (as mesmas DB_POOL_* do engine síncrono)"""
+    options = engine_options(url)
+    if options and make_url(url).get_backend_name() == 'sqlite':
+        # O aiosqlite usa NullPool por omissão: uma ligação nova (e os pragmas) por pedido
+        options['poolclass'] = AsyncAdaptedQueuePool
+    return options
+
+
+ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL') or async_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_engine_options(ASYNC_DATABASE_URL))
+async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+if async_engine.dialect.name == 'sqlite':
+    @event.listens_for(async_engine.sync_engine, 'connect')
+    def apply_async_sqlite_pragmas(dbapi_connection, connection_record):
+        """Os mesmos SQLITE_PRAGMAS das ligações síncronas, nas ligações aiosqlite"""
+        set_sqlite_pragmas(dbapi_connection)
+
+
+_search_index_checked = False
+
+
+async def ensure_search_index():
+    """Verificar (e criar) o índice FTS5 uma vez por worker, fora do event loop"""
+    global _search_index_checked
+    if not _search_index_checked:
+        def check():
+            with app.app_context():
+                search_index_available()
+
+        await asyncio.to_thread(check)
+        _search_index_checked = True
+
+
+# Rotas assíncronas (mesmos parâmetros e respostas das rotas em app.py)
+async def list_all_articles(session):
+    if not any(param in request.args for param in CATALOG_QUERY_PARAMS):
+        version = int(await session.scalar(catalog_version_query()) or 0)
+        entry = catalog_cache.lookup(version)
+        if entry is None:
+            rows = (await session.execute(catalog_full_query())).all()
+            # Serializar e comprimir o catálogo completo fora do event loop
+            entry = await asyncio.to_thread(
+                lambda: catalog_cache.store(version, dumps_json(article_serializer.dump_many(rows)))
+            )
+        return cached_json_response(entry)
+
+    try:
+        serializer, limit, query, count_query = catalog_page_query(request.args)
+    except QueryParamError as e:
+        return jsonify({'msg': str(e)}), 400
+
+    total = await session.scalar(count_query) if count_query is not None else None
+    rows = (await session.execute(query)).all()
+    return catalog_page_response(serializer, limit, rows, total)
+
+
+async def search_articles(session):
+    await ensure_search_index()
+    try:
+        query, count_query = search_query(request.args, search_index_available)
+    except QueryParamError as e:
+        return jsonify({'msg': str(e)}), 400
+
+    total = await session.scalar(count_query)
+    articles = (await session.execute(query)).all()
+    return search_response(articles, total)
+
+
+async def get_user_orders(session):
+    verify_jwt_in_request()
+    user_id = await session.scalar(db.select(User.id).where(User.id == int(get_jwt_identity())))
+
+    if user_id is None:
+        return jsonify({'success': False, 'orders': [], 'message': 'User not found.'}), 404
+
+    try:
+        limit, cursor, query = order_history_query(user_id, request.args)
+    except QueryParamError as e:
+        return jsonify({'success': False, 'orders': [], 'message': str(e)}), 400
+
+    async def build_page():
+        orders, has_more = split_order_history((await session.execute(query)).all(), limit)
+        order_ids = [order.id for order in orders]
+        item_rows = (await session.execute(order_items_query(order_ids, order_item_serializer))).all() if order_ids else []
+        items = group_order_items(order_ids, item_rows, order_item_serializer)
+        return order_history_page(orders, limit, has_more, items)
+
+    try:
+        if cursor:
+            page = await build_page()
+        else:
+            orders_version, catalog = (await session.execute(order_history_version_query(user_id))).one()
+            version = (int(orders_version or 0), int(catalog or 0))
+            page = order_history_cache.lookup(user_id, version, limit)
+            if page is None:
+                page = order_history_cache.store(user_id, version, limit, await build_page())
+        return json_response(page)
+
+    except Exception:
+        app.logger.exception('Erro ao buscar encomendas')
+        return jsonify({'success': False, 'orders': [], 'message': 'Error fetching orders.'}), 500
+
+
+ASYNC_ROUTES = {
+    '/articles': list_all_articles,
+    '/articles/search': search_articles,
+    '/api/orders': get_user_orders,
+}
+
+
+# Servidor ASGI
+def request_path(scope):
+    """Caminho do pedido relativo ao root_path (prefixo onde a app está montada)"""
+    path, root_path = scope['path'], scope.get('root_path', '')
+    return path[len(root_path):] if root_path and path.startswith(root_path) else path
+
+
+def build_environ(scope):
+    """Environ WSGI mínimo de um pedido GET, para o contexto de pedido do Flask"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': request_path(scope).encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+async def dispatch(view, scope, send):
+    """Correr a rota assíncrona com os hooks e o tratamento de erros do Flask (como em full_dispatch_request)"""
+    with app.request_context(build_environ(scope)):
+        try:
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    async with async_session() as session:
+                        response = await view(session)
+            except Exception as e:
+                response = app.handle_user_exception(e)
+            response = app.finalize_request(response)
+        except Exception as e:
+            response = app.handle_exception(e)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response.headers.to_wsgi_list()
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+wsgi_application = WsgiToAsgi(app)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    view = ASYNC_ROUTES.get(request_path(scope)) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if view is not None:
+        await dispatch(view, scope, send)
+        return
+
+    # Um thread por pedido WSGI (por omissão o asgiref correria todos no mesmo thread)
+    async with ThreadSensitiveContext():
+        await wsgi_application(scope, receive, send)
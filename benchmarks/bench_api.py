@@ -0,0 +1,498 @@
+"""Benchmark de todas as rotas da API: cliente de testes do Flask e carga HTTP
+
+Cria uma base de dados SQLite temporária na escala pedida (utilizadores,
+artigos, encomendas, itens por encomenda) e mede:
+
+  * client: cada rota chamada sequencialmente através do cliente de testes
+    do Flask (latência sem rede, queries SQL por pedido);
+  * http:   as rotas sem efeitos destrutivos servidas por um servidor
+    werkzeug com threads e chamadas por N threads em simultâneo
+    (pedidos/s e latência com concorrência).
+
+Para cada rota reporta p50/p95/p99, pedidos/s, códigos de resposta e o
+número de queries SQL (lido do header Server-Timing). Os resultados vão
+para JSON; com --compare são comparados com um ficheiro de uma execução
+anterior (ex.: de outro commit) e o script termina com código 1 se algum
+p95 piorar mais do que --regression-pct.
+
+Uso:
+    python benchmarks/bench_api.py --scale small --output results.json
+    python benchmarks/bench_api.py --scale small --compare results.json
+    python benchmarks/bench_api.py --users 500 --articles 1000 --orders 5000 --items 3 --modes http
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Escalas predefinidas: utilizadores, artigos, encomendas, itens por encomenda
+SCALES = {
+    'small': {'users': 100, 'articles': 200, 'orders': 1000, 'items': 3},
+    'medium': {'users': 1000, 'articles': 2000, 'orders': 20000, 'items': 3},
+    'large': {'users': 10000, 'articles': 10000, 'orders': 200000, 'items': 4},
+}
+
+PASSWORD = 'password123'
+ORDER_STATUSES = ['processando', 'em trânsito', 'entregue', 'cancelado']
+SHIPPING_INFO = {
+    'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@bench.local', 'phone': '000000000',
+    'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'PT',
+}
+ARTICLE_WORDS = ['Camisola', 'Calças', 'Casaco', 'Sapatos', 'Chapéu', 'Meias', 'Vestido', 'Saia', 'Cinto', 'Mala']
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+SEED_BATCH_SIZE = 5000
+
+# Módulo app, importado em main() depois de configurar o ambiente
+application = None
+
+
+def seed(scale, rounds, rng):
+    """Popular a base de dados com inserts em lote e reconstruir os dados derivados"""
+    app, db = application.app, application.db
+    User, Article, Order, OrderItem = application.User, application.Article, application.Order, application.OrderItem
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        application.init_search_index()
+
+        password_hash = application._bcrypt_hash(PASSWORD, rounds)
+        users = [{'name': 'Admin', 'username': 'admin', 'email': 'admin@bench.local', 'phone': '000000000',
+                  'password_hash': password_hash, 'role': 'admin'}]
+        users += [
+            {'name': f'User {i}', 'username': f'user{i}', 'email': f'user{i}@bench.local', 'phone': '000000000',
+             'password_hash': password_hash, 'role': 'user'}
+            for i in range(scale['users'])
+        ]
+        db.session.execute(db.insert(User), users)
+
+        prices = [round(rng.uniform(1, 200), 2) for _ in range(scale['articles'])]
+        db.session.execute(db.insert(Article), [
+            {'name': f'{ARTICLE_WORDS[i % len(ARTICLE_WORDS)]} {i}', 'content': f'Descrição do artigo {i} em algodão',
+             'image_url': '', 'price': prices[i]}
+            for i in range(scale['articles'])
+        ])
+
+        # Encomendas ao longo do último ano, com ids atribuídos explicitamente para inserir os itens em lote
+        now = datetime.utcnow()
+        item_id = 0
+        for start in range(0, scale['orders'], SEED_BATCH_SIZE):
+            orders, items = [], []
+            for order_id in range(start + 1, min(start + SEED_BATCH_SIZE, scale['orders']) + 1):
+                subtotal = 0.0
+                for article_id in rng.sample(range(1, scale['articles'] + 1), min(scale['items'], scale['articles'])):
+                    item_id += 1
+                    quantity = rng.randint(1, 3)
+                    subtotal += prices[article_id - 1] * quantity
+                    items.append({'id': item_id, 'order_id': order_id, 'article_id': article_id,
+                                  'quantity': quantity, 'price': prices[article_id - 1]})
+                totals = application.compute_order_totals(subtotal)
+                orders.append(dict(
+                    SHIPPING_INFO, id=order_id, user_id=rng.randint(2, scale['users'] + 1),
+                    order_date=now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+                    status=rng.choice(ORDER_STATUSES), **totals
+                ))
+            db.session.execute(db.insert(Order), orders)
+            db.session.execute(db.insert(OrderItem), items)
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    runner.invoke(args=['rebuild-article-counters'])
+    runner.invoke(args=['rebuild-stats'])
+    runner.invoke(args=['backfill-sales-rollups'])
+    runner.invoke(args=['recommendations', 'build'])
+
+
+class Context:
+    """Tokens e geradores de dados partilhados pelos cenários"""
+
+    def __init__(self, scale, rng):
+        from flask_jwt_extended import create_access_token
+
+        self.scale = scale
+        self.rng = rng
+        self._counter = 0
+        self._lock = threading.Lock()
+        with application.app.app_context():
+            self.admin_token = create_access_token(
+                identity='1', additional_claims={'role': 'admin', 'is_active': True})
+            self.user_tokens = [
+                create_access_token(identity=str(user_id),
+                                    additional_claims={'role': 'user', 'is_active': True})
+                for user_id in range(2, min(scale['users'], 50) + 2)
+            ]
+
+    def unique(self):
+        with self._lock:
+            self._counter += 1
+            return f'{os.getpid()}-{self._counter}'
+
+    def user_token(self):
+        return self.rng.choice(self.user_tokens)
+
+    def article_id(self):
+        return self.rng.randint(1, self.scale['articles'])
+
+    def import_records(self, count=50):
+        """Lote para a importação do catálogo: metade atualiza artigos existentes, metade são novos"""
+        records = []
+        for i in range(count):
+            if i % 2:
+                article = self.article_id() - 1
+                name = f'{ARTICLE_WORDS[article % len(ARTICLE_WORDS)]} {article}'
+            else:
+                name = f'Artigo importado {self.unique()}'
+            records.append({'name': name, 'content': 'Descrição importada', 'price': round(self.rng.uniform(1, 200), 2),
+                            'stock': self.rng.randint(0, 100)})
+        return records
+
+    def order_items(self):
+        return [{'product_id': self.article_id(), 'quantity': self.rng.randint(1, 3)}
+                for _ in range(self.rng.randint(1, 3))]
+
+    def insert(self, model, **values):
+        """Criar uma linha fora da medição (para rotas que eliminam recursos)"""
+        with application.app.app_context():
+            result = application.db.session.execute(application.db.insert(model).values(**values))
+            application.db.session.commit()
+            return result.inserted_primary_key[0]
+
+
+def reservation_token(ctx):
+    """Preparação de stock_release: criar uma reserva do primeiro utilizador e devolver o token"""
+    token = f'bench-{ctx.unique()}'
+    ctx.insert(application.StockReservation, token=token, user_id=2, article_id=1, quantity=1,
+               expires_at=datetime.utcnow() + timedelta(minutes=5))
+    return token
+
+
+def scenarios():
+    """(nome, método, path, corpo, autenticação, preparação, usar na carga HTTP)
+
+    path e corpo são funções do contexto (e do valor devolvido pela
+    preparação, que corre fora da medição).
+    """
+    a = application
+    month_ago = (datetime.utcnow() - timedelta(days=30)).date().isoformat()
+    return [
+        ('home', 'GET', lambda c, p: '/', None, None, None, True),
+        ('metrics', 'GET', lambda c, p: '/metrics', None, None, None, True),
+        ('articles_full_catalog', 'GET', lambda c, p: '/articles', None, None, None, True),
+        ('articles_page', 'GET', lambda c, p: '/articles?limit=50&sort=-price&fields=id,name,price',
+         None, None, None, True),
+        ('articles_price_range', 'GET', lambda c, p: '/articles?min_price=20&max_price=80&limit=50&offset=100',
+         None, None, None, True),
+        ('articles_search', 'GET', lambda c, p: '/articles/search?name=camisola&limit=20', None, None, None, True),
+        ('articles_autocomplete', 'GET', lambda c, p: '/articles/autocomplete?q=ca', None, None, None, True),
+        ('articles_recommendations', 'GET', lambda c, p: f'/articles/{c.article_id()}/recommendations',
+         None, None, None, True),
+        ('articles_add', 'POST', lambda c, p: '/articles',
+         lambda c, p: {'name': f'Artigo bench {c.unique()}', 'content': 'Descrição', 'price': 9.99},
+         None, None, False),
+        ('register', 'POST', lambda c, p: '/api/register',
+         lambda c, p: {'name': 'Bench', 'username': f'bench{c.unique()}', 'email': f'bench{c.unique()}@bench.local',
+                       'phone': '000000000', 'password': PASSWORD},
+         None, None, True),
+        ('login', 'POST', lambda c, p: '/api/login',
+         lambda c, p: {'username': f'user{c.rng.randrange(c.scale["users"])}', 'password': PASSWORD},
+         None, None, True),
+        ('profile_get', 'GET', lambda c, p: '/api/profile', None, 'user', None, True),
+        ('profile_update', 'PUT', lambda c, p: '/api/profile',
+         lambda c, p: {'name': 'User 0', 'username': 'user0', 'email': 'user0@bench.local', 'phone': '912345678'},
+         'first_user', None, True),
+        ('profile_password', 'PUT', lambda c, p: '/api/profile/password',
+         lambda c, p: {'currentPassword': PASSWORD, 'newPassword': PASSWORD}, 'user', None, False),
+        ('orders_create', 'POST', lambda c, p: '/api/orders',
+         lambda c, p: {'shipping_info': SHIPPING_INFO, 'items': c.order_items()}, 'user', None, True),
+        ('orders_history', 'GET', lambda c, p: '/api/orders', None, 'user', None, True),
+        ('stock_reserve', 'POST', lambda c, p: '/api/stock/reservations',
+         lambda c, p: {'items': c.order_items()}, 'user', None, True),
+        ('stock_release', 'DELETE', lambda c, p: f'/api/stock/reservations/{p}', None, 'first_user',
+         reservation_token, False),
+        ('admin_stats', 'GET', lambda c, p: '/api/admin/stats', None, 'admin', None, True),
+        ('admin_analytics_sales', 'GET', lambda c, p: '/api/admin/analytics/sales?interval=day',
+         None, 'admin', None, True),
+        ('admin_analytics_sales_month', 'GET', lambda c, p: '/api/admin/analytics/sales?interval=month',
+         None, 'admin', None, True),
+        ('admin_analytics_top_articles', 'GET',
+         lambda c, p: f'/api/admin/analytics/top-articles?date_from={month_ago}&by=units&limit=20',
+         None, 'admin', None, True),
+        ('admin_analytics_breakdown', 'GET', lambda c, p: '/api/admin/analytics/breakdown?by=country',
+         None, 'admin', None, True),
+        ('admin_replicas', 'GET', lambda c, p: '/api/admin/db/replicas', None, 'admin', None, True),
+        ('admin_users', 'GET', lambda c, p: '/api/admin/users?per_page=50&sort=orders', None, 'admin', None, True),
+        ('admin_user_update', 'PUT', lambda c, p: f'/api/admin/users/{c.rng.randint(2, c.scale["users"] + 1)}',
+         lambda c, p: {'phone': '912345678'}, 'admin', None, True),
+        ('admin_user_delete', 'DELETE', lambda c, p: f'/api/admin/users/{p}', None, 'admin',
+         lambda c: c.insert(a.User, name='Bench', username=f'del{c.unique()}', email=f'del{c.unique()}@bench.local',
+                            phone='0', password_hash='x'),
+         False),
+        ('admin_articles', 'GET', lambda c, p: '/api/admin/articles', None, 'admin', None, True),
+        ('admin_article_create', 'POST', lambda c, p: '/api/admin/articles',
+         lambda c, p: {'name': f'Artigo admin {c.unique()}', 'content': 'Descrição', 'price': 19.99},
+         'admin', None, False),
+        ('admin_articles_import', 'POST', lambda c, p: '/api/admin/articles/import',
+         lambda c, p: c.import_records(), 'admin', None, False),
+        ('admin_article_update', 'PUT', lambda c, p: f'/api/admin/articles/{c.article_id()}',
+         lambda c, p: {'price': round(c.rng.uniform(1, 200), 2)}, 'admin', None, True),
+        ('admin_article_delete', 'DELETE', lambda c, p: f'/api/admin/articles/{p}', None, 'admin',
+         lambda c: c.insert(a.Article, name=f'Apagar {c.unique()}', content='x', price=1.0),
+         False),
+        ('admin_article_stock', 'POST', lambda c, p: f'/api/admin/articles/{c.article_id()}/stock',
+         lambda c, p: {'delta': 1}, 'admin', None, True),
+        ('admin_orders', 'GET', lambda c, p: '/api/admin/orders?limit=50', None, 'admin', None, True),
+        ('admin_orders_filtered', 'GET', lambda c, p: f'/api/admin/orders?status=entregue&date_from={month_ago}',
+         None, 'admin', None, True),
+        ('admin_orders_export', 'GET', lambda c, p: f'/api/admin/orders/export?format=ndjson&date_from={month_ago}',
+         None, 'admin', None, True),
+        ('admin_order_status', 'PUT', lambda c, p: f'/api/admin/orders/{c.rng.randint(1, c.scale["orders"])}/status',
+         lambda c, p: {'status': c.rng.choice(ORDER_STATUSES)}, 'admin', None, True),
+    ]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(name, latencies, statuses, queries, elapsed):
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) or 0, 3),
+        'p95_ms': round(percentile(latencies, 95) or 0, 3),
+        'p99_ms': round(percentile(latencies, 99) or 0, 3),
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else None,
+        'queries_per_request': statistics.median(queries) if queries else None,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def headers_for(ctx, auth):
+    if auth == 'admin':
+        return {'Authorization': f'Bearer {ctx.admin_token}'}
+    if auth == 'user':
+        return {'Authorization': f'Bearer {ctx.user_token()}'}
+    if auth == 'first_user':
+        return {'Authorization': f'Bearer {ctx.user_tokens[0]}'}
+    return {}
+
+
+def query_count(server_timing):
+    match = SERVER_TIMING_QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def run_client(ctx, selected, iterations, warmup):
+    """Cada rota, sequencialmente, através do cliente de testes do Flask"""
+    client = application.app.test_client()
+    results = []
+    for name, method, path, body, auth, prepare, _ in selected:
+        latencies, statuses, queries = [], Counter(), []
+        elapsed = 0.0
+        for i in range(warmup + iterations):
+            prepared = prepare(ctx) if prepare else None
+            url, payload = path(ctx, prepared), body(ctx, prepared) if body else None
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=payload, headers=headers_for(ctx, auth))
+            response.get_data()
+            duration = time.perf_counter() - start
+            if i < warmup:
+                continue
+            elapsed += duration
+            latencies.append(duration * 1000)
+            statuses[response.status_code] += 1
+            count = query_count(response.headers.get('Server-Timing'))
+            if count is not None:
+                queries.append(count)
+        results.append(summarize(name, latencies, statuses, queries, elapsed))
+        print(f'client {name}: p50 {results[-1]["p50_ms"]} ms', file=sys.stderr)
+    return results
+
+
+def run_http(ctx, selected, threads, duration):
+    """Rotas servidas por um servidor werkzeug com threads, N clientes em simultâneo por rota"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, application.app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    port = server.server_port
+
+    results = []
+    try:
+        for name, method, path, body, auth, prepare, _ in selected:
+            latencies, statuses, queries = [], Counter(), []
+            lock = threading.Lock()
+            deadline = time.perf_counter() + duration
+
+            def worker():
+                local_latencies, local_statuses, local_queries = [], Counter(), []
+                while time.perf_counter() < deadline:
+                    payload = body(ctx, None) if body else None
+                    headers = headers_for(ctx, auth)
+                    data = None
+                    if payload is not None:
+                        data = json.dumps(payload)
+                        headers['Content-Type'] = 'application/json'
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    start = time.perf_counter()
+                    try:
+                        connection.request(method, path(ctx, None), body=data, headers=headers)
+                        response = connection.getresponse()
+                        response.read()
+                        status, server_timing = response.status, response.getheader('Server-Timing')
+                    except OSError:
+                        status, server_timing = 'error', None
+                    finally:
+                        connection.close()
+                    local_latencies.append((time.perf_counter() - start) * 1000)
+                    local_statuses[status] += 1
+                    count = query_count(server_timing)
+                    if count is not None:
+                        local_queries.append(count)
+                with lock:
+                    latencies.extend(local_latencies)
+                    statuses.update(local_statuses)
+                    queries.extend(local_queries)
+
+            started = time.perf_counter()
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            results.append(summarize(name, latencies, statuses, queries, time.perf_counter() - started))
+            print(f'http {name}: {results[-1]["requests_per_second"]} req/s', file=sys.stderr)
+    finally:
+        server.shutdown()
+    return results
+
+
+def compare(baseline, current, regression_pct):
+    """Comparar p95 por (modo, cenário); devolve as regressões acima do limite"""
+    regressions = []
+    for mode in ('client', 'http'):
+        before = {row['scenario']: row for row in baseline.get(mode, [])}
+        for row in current.get(mode, []):
+            old = before.get(row['scenario'])
+            if not old or not old['p95_ms']:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            line = f'{mode:6} {row["scenario"]:28} p95 {old["p95_ms"]:9.3f} -> {row["p95_ms"]:9.3f} ms ({change:+.1f}%)'
+            if old.get('queries_per_request') != row.get('queries_per_request'):
+                line += f'  queries {old.get("queries_per_request")} -> {row.get("queries_per_request")}'
+            print(line, file=sys.stderr)
+            if change > regression_pct:
+                regressions.append({'mode': mode, 'scenario': row['scenario'], 'change_pct': round(change, 1)})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    global application
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small', help='escala predefinida da base de dados')
+    parser.add_argument('--users', type=int, help='substitui o número de utilizadores da escala')
+    parser.add_argument('--articles', type=int, help='substitui o número de artigos da escala')
+    parser.add_argument('--orders', type=int, help='substitui o número de encomendas da escala')
+    parser.add_argument('--items', type=int, help='substitui o número de itens por encomenda da escala')
+    parser.add_argument('--modes', default='client,http', help='client, http ou ambos')
+    parser.add_argument('--scenarios', help='só estes cenários (separados por vírgula)')
+    parser.add_argument('--iterations', type=int, default=50, help='pedidos por cenário no modo client')
+    parser.add_argument('--warmup', type=int, default=5, help='pedidos de aquecimento por cenário (modo client)')
+    parser.add_argument('--threads', type=int, default=8, help='clientes em simultâneo no modo http')
+    parser.add_argument('--duration', type=float, default=3.0, help='segundos por cenário no modo http')
+    parser.add_argument('--rounds', type=int, default=4, help='work factor bcrypt (login, registo)')
+    parser.add_argument('--seed', type=int, default=42, help='semente dos dados e dos pedidos')
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--regression-pct', type=float, default=20.0,
+                        help='aumento de p95 (%%) a partir do qual --compare falha')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for field in scale:
+        if getattr(args, field) is not None:
+            scale[field] = getattr(args, field)
+
+    # Base de dados e configuração temporárias: têm de ser definidas antes de importar a app
+    tmpdir = tempfile.mkdtemp(prefix='bench-api-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ['IDEMPOTENCY_DB_PATH'] = os.path.join(tmpdir, 'idempotency.db')
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.rounds)
+    os.environ.setdefault('QUERY_COUNT_WARN_THRESHOLD', '0')
+    sys.path.insert(0, ROOT)
+    import app as application
+    import logging
+    application.app.logger.setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    seed(scale, args.rounds, rng)
+    seed_seconds = round(time.perf_counter() - started, 2)
+    print(f'seed: {scale} em {seed_seconds}s', file=sys.stderr)
+
+    ctx = Context(scale, rng)
+    selected = scenarios()
+    if args.scenarios:
+        names = set(args.scenarios.split(','))
+        selected = [scenario for scenario in selected if scenario[0] in names]
+
+    modes = args.modes.split(',')
+    results = {
+        'benchmark': 'api',
+        'git_commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'scale': scale,
+        'seed_seconds': seed_seconds,
+    }
+    if 'client' in modes:
+        results['client'] = run_client(ctx, selected, args.iterations, args.warmup)
+    if 'http' in modes:
+        results['http'] = run_http(ctx, [s for s in selected if s[6]], args.threads, args.duration)
+    application.password_hasher.shutdown()
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.regression_pct)
+        results['regressions'] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
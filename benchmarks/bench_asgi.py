@@ -0,0 +1,222 @@
+"""Benchmark do modo ASGI contra o modo WSGI com threads, com muitas ligações
+
+Arranca a app em cada modo num processo próprio (um único processo em ambos)
+e mede, para vários números de ligações simultâneas, pedidos/s, latência
+(p50/p95/p99) e erros nas rotas de leitura servidas de forma assíncrona:
+página do catálogo, pesquisa e histórico de encomendas.
+
+- threaded: servidor WSGI do Werkzeug com um thread por ligação;
+- asgi: uvicorn com asgi:application (rotas assíncronas sobre aiosqlite/asyncpg).
+
+Cada pedido abre uma ligação nova (Connection: close), como clientes que
+chegam em simultâneo. O gerador de carga corre na mesma máquina; com poucos
+CPUs os números absolutos incluem o custo do próprio cliente. Com SQLite as
+queries quase não esperam por I/O; use --database-url com um PostgreSQL
+remoto para medir o caso em que a base de dados tem latência de rede.
+
+Uso:
+    pip install -r requirements-asgi.txt
+    python benchmarks/bench_asgi.py --connections 10,100,500 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+MODES = ('threaded', 'asgi')
+
+
+def seed(articles, orders, users):
+    """Criar os dados no DATABASE_URL do ambiente e devolver os pedidos a fazer"""
+    sys.path.insert(0, ROOT)
+    import app as application
+    from flask_jwt_extended import create_access_token
+
+    app, db = application.app, application.db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.insert(application.User), [
+            {'name': f'Utilizador {i}', 'username': f'user{i}', 'email': f'user{i}@bench.local',
+             'phone': '000000000', 'password_hash': 'x'}
+            for i in range(users)
+        ])
+        db.session.execute(db.insert(application.Article), [
+            {'name': f'Artigo {i}', 'content': f'Descrição do artigo {i} com algum texto de exemplo.',
+             'image_url': f'/images/artigo-{i}.jpg', 'price': float(i % 100 + 0.99), 'stock': i % 50}
+            for i in range(articles)
+        ])
+        base = datetime(2024, 1, 1)
+        db.session.execute(db.insert(application.Order), [
+            {'user_id': i % users + 1, 'order_date': base + timedelta(minutes=i), 'status': 'processando',
+             'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@bench.local', 'phone': '000000000',
+             'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'PT',
+             'subtotal': 30.0, 'shipping': 0.0, 'tax': 6.9, 'total': 36.9}
+            for i in range(orders)
+        ])
+        db.session.execute(db.insert(application.OrderItem), [
+            {'order_id': i + 1, 'article_id': (i * 7 + j) % articles + 1, 'quantity': j + 1, 'price': 10.0}
+            for i in range(orders) for j in range(3)
+        ])
+        db.session.commit()
+        tokens = [create_access_token(identity=str(i + 1)) for i in range(users)]
+
+    requests = []
+    for i in range(max(users, 50)):
+        requests.append((f'/articles?limit=50&offset={i * 50 % articles}', {}))
+        requests.append((f'/articles/search?name=artigo%20{i}&limit=20', {}))
+        requests.append(('/api/orders?limit=20', {'Authorization': f'Bearer {tokens[i % users]}'}))
+    return requests
+
+
+def serve_threaded(port):
+    """Corre no processo filho: servidor WSGI com um thread por ligação"""
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+    import app as application
+
+    server = make_server(HOST, port, application.app, threaded=True)
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, env):
+    if mode == 'threaded':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-threaded', str(port)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', HOST, '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log', '--backlog', '4096']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'O servidor {mode} terminou ao arrancar (código {process.returncode})')
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'O servidor {mode} não arrancou em 30 s')
+
+
+async def fetch(port, path, headers, timeout):
+    """GET numa ligação nova; devolve o status HTTP"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, port), timeout)
+    try:
+        lines = [f'GET {path} HTTP/1.1', f'Host: {HOST}:{port}', 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def run_load(port, requests, connections, duration, timeout):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    latencies = []
+    counts = {'ok': 0, 'http_errors': 0, 'connection_errors': 0}
+
+    async def client(n):
+        i = n
+        while loop.time() < deadline:
+            path, headers = requests[i % len(requests)]
+            i += connections
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path, headers, timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                counts['connection_errors'] += 1
+                continue
+            if status == 200:
+                counts['ok'] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                counts['http_errors'] += 1
+
+    await asyncio.gather(*(client(n) for n in range(connections)))
+    latencies.sort()
+
+    def percentile(pct):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))], 2) if latencies else None
+
+    return {
+        'requests_per_second': round(counts['ok'] / duration, 2),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else None,
+        **counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help='modos a comparar')
+    parser.add_argument('--connections', default='10,100,500', help='ligações simultâneas (lista)')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos por medição')
+    parser.add_argument('--articles', type=int, default=5000, help='artigos no catálogo')
+    parser.add_argument('--orders', type=int, default=5000, help='encomendas (3 itens cada)')
+    parser.add_argument('--users', type=int, default=200, help='utilizadores com histórico')
+    parser.add_argument('--timeout', type=float, default=30.0, help='timeout de cada pedido (segundos)')
+    parser.add_argument('--database-url', help='base de dados a usar (por omissão SQLite temporário)')
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    parser.add_argument('--serve-threaded', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_threaded:
+        serve_threaded(args.serve_threaded)
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix='bench-asgi-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault('IDEMPOTENCY_DB_PATH', os.path.join(tmpdir, 'idempotency.db'))
+    requests = seed(args.articles, args.orders, args.users)
+
+    results = []
+    for mode in args.modes.split(','):
+        port = free_port()
+        server = start_server(mode, port, dict(os.environ))
+        try:
+            # Aquecimento: caches da app, índice de pesquisa e pool de ligações
+            asyncio.run(run_load(port, requests, 10, 1.0, args.timeout))
+            for connections in (int(n) for n in args.connections.split(',')):
+                result = asyncio.run(run_load(port, requests, connections, args.duration, args.timeout))
+                results.append(dict(mode=mode, connections=connections, **result))
+        finally:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps({
+        'benchmark': 'asgi',
+        'database': 'sqlite' if not args.database_url else args.database_url.split(':', 1)[0],
+        'articles': args.articles,
+        'orders': args.orders,
+        'duration_s': args.duration,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark do hashing de passwords: logins concorrentes vs leituras do catálogo
+
+Para cada tamanho de pool (0 = bcrypt no thread do pedido) corre N threads a
+fazer login durante alguns segundos enquanto outro thread lê uma página do
+catálogo, e reporta logins/s e a latência das leituras do catálogo.
+
+Uso:
+    python benchmarks/bench_password_pool.py --pools 0,1,2,4 --threads 8 --duration 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Base de dados temporária: tem de ser definida antes de importar a app
+_tmpdir = tempfile.mkdtemp(prefix='bench-bcrypt-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as application  # noqa: E402
+
+app, db = application.app, application.db
+
+
+def seed(users, rounds):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        password_hash = application._bcrypt_hash('password123', rounds)
+        db.session.add_all(
+            application.User(name=f'User {i}', username=f'user{i}', email=f'user{i}@bench.local',
+                             phone='000000000', password_hash=password_hash)
+            for i in range(users)
+        )
+        db.session.add_all(
+            application.Article(name=f'Artigo {i}', content='Descrição', price=float(i % 100))
+            for i in range(500)
+        )
+        db.session.commit()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(pool_size, threads, duration, users, rounds):
+    application.password_hasher.shutdown()
+    application.password_hasher = application.PasswordHasher(pool_size, threads * 4, rounds)
+
+    stop = threading.Event()
+    logins = []
+    rejected = []
+    catalog_latencies = []
+
+    def login_worker(n):
+        client = app.test_client()
+        done = busy = 0
+        while not stop.is_set():
+            response = client.post('/api/login', json={'username': f'user{n % users}', 'password': 'password123'})
+            if response.status_code == 200:
+                done += 1
+            elif response.status_code == 503:
+                busy += 1
+        logins.append(done)
+        rejected.append(busy)
+
+    def catalog_worker():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get('/articles?limit=50&sort=-price&fields=id,name,price')
+            catalog_latencies.append((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=login_worker, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=catalog_worker))
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    return {
+        'pool_size': pool_size,
+        'login_threads': threads,
+        'logins_per_second': round(sum(logins) / duration, 2),
+        'logins_rejected': sum(rejected),
+        'catalog_requests': len(catalog_latencies),
+        'catalog_p50_ms': round(percentile(catalog_latencies, 50) or 0, 2),
+        'catalog_p95_ms': round(percentile(catalog_latencies, 95) or 0, 2),
+        'catalog_p99_ms': round(percentile(catalog_latencies, 99) or 0, 2),
+        'catalog_mean_ms': round(statistics.fmean(catalog_latencies), 2) if catalog_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pools', default=f'0,1,{os.cpu_count() or 1}', help='tamanhos de pool a comparar')
+    parser.add_argument('--threads', type=int, default=8, help='threads a fazer login')
+    parser.add_argument('--duration', type=float, default=5.0, help='segundos por cenário')
+    parser.add_argument('--rounds', type=int, default=app.config['BCRYPT_LOG_ROUNDS'], help='work factor bcrypt')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    args = parser.parse_args()
+
+    seed(args.users, args.rounds)
+    pools = sorted({int(p) for p in args.pools.split(',')})
+    results = {
+        'benchmark': 'password_pool',
+        'cpu_count': os.cpu_count(),
+        'rounds': args.rounds,
+        'duration_s': args.duration,
+        'results': [run(pool, args.threads, args.duration, args.users, args.rounds) for pool in pools],
+    }
+    application.password_hasher.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
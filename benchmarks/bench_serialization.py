@@ -0,0 +1,241 @@
+"""Benchmark da serialização JSON das respostas maiores
+
+Compara, para o catálogo completo (/articles), a lista de artigos admin e
+uma página de 200 encomendas admin com os itens:
+
+- legacy: objetos ORM hidratados, dicts construídos à mão e json da
+  biblioteca standard (o código anterior à camada de serialização);
+- serializers_json: linhas Core + serializers, com o módulo json;
+- serializers_orjson: linhas Core + serializers, com orjson (se instalado).
+
+Mede o tempo de construir a resposta (query + serialização) e o tamanho
+do corpo, e também os endpoints completos pelo cliente de testes do Flask.
+
+Uso:
+    python benchmarks/bench_serialization.py --articles 20000 --orders 5000 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Base de dados temporária: tem de ser definida antes de importar a app
+_tmpdir = tempfile.mkdtemp(prefix='bench-serialization-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault('IDEMPOTENCY_DB_PATH', os.path.join(_tmpdir, 'idempotency.db'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as application  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy.orm import joinedload, selectinload  # noqa: E402
+
+app, db = application.app, application.db
+Article, Order, OrderItem, User = application.Article, application.Order, application.OrderItem, application.User
+
+ORDERS_PAGE = 200
+
+
+def seed(articles, orders, users=200, items=3):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            {'name': f'Utilizador {i}', 'username': f'user{i}', 'email': f'user{i}@bench.local',
+             'phone': '000000000', 'password_hash': 'x', 'role': 'admin' if i == 0 else 'user'}
+            for i in range(users)
+        ])
+        db.session.execute(db.insert(Article), [
+            {'name': f'Artigo {i}', 'content': f'Descrição do artigo {i} com algum texto de exemplo.',
+             'image_url': f'/images/artigo-{i}.jpg', 'price': float(i % 100 + 0.99), 'stock': i % 50}
+            for i in range(articles)
+        ])
+        base = datetime(2024, 1, 1)
+        db.session.execute(db.insert(Order), [
+            {'user_id': i % users + 1, 'order_date': base + timedelta(minutes=i), 'status': 'processando',
+             'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@bench.local', 'phone': '000000000',
+             'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'PT',
+             'subtotal': 30.0, 'shipping': 0.0, 'tax': 6.9, 'total': 36.9}
+            for i in range(orders)
+        ])
+        db.session.execute(db.insert(OrderItem), [
+            {'order_id': i + 1, 'article_id': (i * 7 + j) % articles + 1, 'quantity': j + 1, 'price': 10.0}
+            for i in range(orders) for j in range(items)
+        ])
+        db.session.commit()
+        return create_access_token(identity='1', additional_claims={'role': 'admin', 'is_active': True})
+
+
+def legacy_dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Implementações anteriores: objetos ORM e dicts construídos à mão
+def legacy_catalog():
+    articles = Article.query.order_by(Article.id).all()
+    return legacy_dumps([
+        {'id': a.id, 'name': a.name, 'content': a.content, 'image_url': a.image_url, 'price': a.price}
+        for a in articles
+    ])
+
+
+def legacy_admin_articles():
+    articles = Article.query.order_by(Article.id).all()
+    return legacy_dumps({'success': True, 'articles': [{
+        'id': a.id, 'name': a.name, 'content': a.content, 'image_url': a.image_url, 'price': a.price,
+        'total_sold': a.total_sold, 'order_item_count': a.order_item_count, 'stock': a.stock, 'reserved': 0
+    } for a in articles]})
+
+
+def legacy_admin_orders():
+    orders = Order.query.options(
+        joinedload(Order.user),
+        selectinload(Order.items).joinedload(OrderItem.article)
+    ).order_by(Order.order_date.desc(), Order.id.desc()).limit(ORDERS_PAGE).all()
+    orders_data = []
+    for order in orders:
+        user = order.user
+        items = [{'id': item.id, 'article_name': item.article.name, 'quantity': item.quantity, 'price': item.price}
+                 for item in order.items]
+        orders_data.append({
+            'id': order.id, 'user_id': order.user_id,
+            'user_name': user.name if user else 'Unknown', 'user_email': user.email if user else 'Unknown',
+            'order_date': order.order_date.isoformat(), 'status': order.status, 'total': order.total,
+            'items_count': len(items), 'items': items,
+            'shipping_info': {
+                'name': f'{order.first_name} {order.last_name}', 'email': order.email, 'phone': order.phone,
+                'address': order.address, 'city': order.city, 'postal_code': order.postal_code,
+                'country': order.country
+            }
+        })
+    return legacy_dumps({'success': True, 'orders': orders_data})
+
+
+# Camada de serialização: linhas Core + serializers + dumps_json
+def serializers_catalog():
+    rows = db.session.query(*application.article_serializer.columns()).order_by(Article.id)
+    return application.dumps_json(application.article_serializer.dump_many(rows))
+
+
+def serializers_admin_articles():
+    serializer = application.admin_article_serializer
+    rows = db.session.query(*serializer.columns()).order_by(Article.id)
+    return application.dumps_json({
+        'success': True,
+        'articles': serializer.dump_many(rows, extra=lambda row: {'reserved': 0})
+    })
+
+
+def serializers_admin_orders():
+    orders = db.session.query(*application.admin_order_serializer.columns()) \
+        .outerjoin(User, User.id == Order.user_id) \
+        .order_by(Order.order_date.desc(), Order.id.desc()) \
+        .limit(ORDERS_PAGE) \
+        .all()
+    items = application.load_order_items([order.id for order in orders], application.admin_order_item_serializer)
+    return application.dumps_json({'success': True, 'orders': application.admin_order_serializer.dump_many(
+        orders, extra=lambda order: {'items_count': len(items[order.id]), 'items': items[order.id]}
+    )})
+
+
+RESPONSES = {
+    'catalog': (legacy_catalog, serializers_catalog),
+    'admin_articles': (legacy_admin_articles, serializers_admin_articles),
+    'admin_orders_page': (legacy_admin_orders, serializers_admin_orders),
+}
+
+ENDPOINTS = {
+    'GET /articles?limit=200': '/articles?limit=200',
+    'GET /api/admin/articles': '/api/admin/articles',
+    f'GET /api/admin/orders?limit={ORDERS_PAGE}': f'/api/admin/orders?limit={ORDERS_PAGE}',
+    'GET /api/admin/users?per_page=200': '/api/admin/users?per_page=200',
+}
+
+
+def timed(func, repeat):
+    samples = []
+    body = b''
+    for _ in range(repeat):
+        db.session.remove()  # sem objetos ORM em cache entre repetições
+        start = time.perf_counter()
+        body = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, len(body)
+
+
+def summary(samples):
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'mean_ms': round(statistics.fmean(samples), 2),
+        'min_ms': round(min(samples), 2),
+    }
+
+
+def bench_responses(repeat):
+    results = []
+    fast_json = application.orjson
+    with app.app_context():
+        for name, (legacy, serializers) in RESPONSES.items():
+            variants = [('legacy', legacy, None), ('serializers_json', serializers, None)]
+            if fast_json is not None:
+                variants.append(('serializers_orjson', serializers, fast_json))
+            baseline = None
+            for variant, func, backend in variants:
+                application.orjson = backend
+                try:
+                    samples, size = timed(func, repeat)
+                finally:
+                    application.orjson = fast_json
+                result = dict(response=name, variant=variant, bytes=size, **summary(samples))
+                if baseline is None:
+                    baseline = result['p50_ms']
+                result['speedup'] = round(baseline / result['p50_ms'], 2) if result['p50_ms'] else None
+                results.append(result)
+    return results
+
+
+def bench_endpoints(token, repeat):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    results = []
+    for name, url in ENDPOINTS.items():
+        client.get(url, headers=headers)  # aquecimento (caches da app)
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        results.append(dict(endpoint=name, bytes=len(response.get_data()), **summary(samples)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=20000, help='artigos no catálogo')
+    parser.add_argument('--orders', type=int, default=5000, help='encomendas (3 itens cada)')
+    parser.add_argument('--repeat', type=int, default=20, help='repetições por medição')
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    args = parser.parse_args()
+
+    token = seed(args.articles, args.orders)
+    output = json.dumps({
+        'benchmark': 'serialization',
+        'json_backend': 'orjson' if application.orjson is not None else 'json',
+        'articles': args.articles,
+        'orders': args.orders,
+        'repeat': args.repeat,
+        'responses': bench_responses(args.repeat),
+        'endpoints': bench_endpoints(token, args.repeat),
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
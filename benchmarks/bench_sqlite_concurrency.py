@@ -0,0 +1,173 @@
+"""Benchmark do SQLite com escritas concorrentes: leituras durante as escritas
+
+Compara a configuração por omissão do SQLite (journal DELETE, sem pragmas)
+com a configuração da app (WAL, synchronous=NORMAL, busy_timeout, mmap,
+cache). Em cada cenário, threads escritoras criam encomendas enquanto
+threads leitoras listam encomendas; reporta escritas/s, erros de escrita
+("database is locked"), leituras/s e a latência das leituras.
+
+Cada cenário corre num processo próprio com uma base de dados nova, porque
+os pragmas são aplicados quando as ligações são criadas.
+
+Uso:
+    python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 4 --duration 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Variáveis SQLITE_* de cada cenário (valor vazio = pragma não aplicado)
+SCENARIOS = {
+    'sqlite_defaults': {
+        'SQLITE_JOURNAL_MODE': '', 'SQLITE_SYNCHRONOUS': '', 'SQLITE_BUSY_TIMEOUT': '',
+        'SQLITE_MMAP_SIZE': '', 'SQLITE_CACHE_SIZE': '', 'SQLITE_TEMP_STORE': '',
+    },
+    'app_tuned': {},
+}
+
+SHIPPING_INFO = {
+    'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@bench.local', 'phone': '000000000',
+    'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'PT',
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_scenario(writers, readers, duration, orders):
+    """Corre no processo filho: a app é importada já com o ambiente do cenário"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as application
+    from flask_jwt_extended import create_access_token
+
+    app, db = application.app, application.db
+    with app.app_context():
+        db.create_all()
+        admin = application.User(name='Admin', username='admin', email='admin@bench.local',
+                                 phone='000000000', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.add_all(
+            application.Article(name=f'Artigo {i}', content='Descrição', price=float(i % 100 + 1))
+            for i in range(200)
+        )
+        db.session.commit()
+        admin_token = create_access_token(identity=str(admin.id),
+                                          additional_claims={'role': 'admin', 'is_active': True})
+        # Histórico inicial para as leituras terem trabalho
+        client = app.test_client()
+        for i in range(orders):
+            client.post('/api/orders', headers={'Authorization': f'Bearer {admin_token}'}, json={
+                'shipping_info': SHIPPING_INFO,
+                'items': [{'product_id': i % 200 + 1, 'quantity': 1}],
+            })
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'writes': 0, 'write_errors': 0, 'reads': 0, 'read_errors': 0}
+    read_latencies = []
+
+    def writer(n):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        i = 0
+        while not stop.is_set():
+            i += 1
+            response = client.post('/api/orders', headers=headers, json={
+                'shipping_info': SHIPPING_INFO,
+                'items': [{'product_id': (n * 7 + i) % 200 + 1, 'quantity': 1},
+                          {'product_id': (n * 13 + i) % 200 + 1, 'quantity': 2}],
+            })
+            with lock:
+                counts['writes' if response.status_code == 201 else 'write_errors'] += 1
+
+    def reader(n):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get('/api/admin/orders?limit=50', headers=headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code == 200:
+                    counts['reads'] += 1
+                    read_latencies.append(elapsed)
+                else:
+                    counts['read_errors'] += 1
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'journal_mode': journal_mode,
+        'writes_per_second': round(counts['writes'] / duration, 2),
+        'write_errors': counts['write_errors'],
+        'reads_per_second': round(counts['reads'] / duration, 2),
+        'read_errors': counts['read_errors'],
+        'read_p50_ms': round(percentile(read_latencies, 50) or 0, 2),
+        'read_p95_ms': round(percentile(read_latencies, 95) or 0, 2),
+        'read_p99_ms': round(percentile(read_latencies, 99) or 0, 2),
+        'read_mean_ms': round(statistics.fmean(read_latencies), 2) if read_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='cenários a comparar')
+    parser.add_argument('--writers', type=int, default=4, help='threads a criar encomendas')
+    parser.add_argument('--readers', type=int, default=4, help='threads a listar encomendas')
+    parser.add_argument('--duration', type=float, default=5.0, help='segundos por cenário')
+    parser.add_argument('--orders', type=int, default=500, help='encomendas criadas antes de medir')
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.writers, args.readers, args.duration, args.orders)))
+        return
+
+    results = []
+    for name in args.scenarios.split(','):
+        tmpdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+        env = dict(os.environ, **SCENARIOS[name])
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        env['IDEMPOTENCY_DB_PATH'] = os.path.join(tmpdir, 'idempotency.db')
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name,
+             '--writers', str(args.writers), '--readers', str(args.readers),
+             '--duration', str(args.duration), '--orders', str(args.orders)],
+            env=env, capture_output=True, text=True, check=True
+        )
+        results.append(dict(scenario=name, **json.loads(completed.stdout.strip().splitlines()[-1])))
+
+    output = json.dumps({
+        'benchmark': 'sqlite_concurrency',
+        'writers': args.writers,
+        'readers': args.readers,
+        'duration_s': args.duration,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
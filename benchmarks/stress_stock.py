@@ -0,0 +1,168 @@
+"""Teste de carga do stock: encomendas concorrentes não podem vender a mais
+
+Cria alguns artigos com stock limitado e corre N threads a fazer encomendas
+(metade via reserva + encomenda) até o stock esgotar. No fim verifica que,
+para cada artigo, stock final + unidades vendidas + reservadas = stock
+inicial e que o stock nunca ficou negativo, e reporta encomendas/s.
+Termina com código 1 se houver oversell.
+
+Uso:
+    python benchmarks/stress_stock.py --threads 16 --articles 5 --stock 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Base de dados temporária: tem de ser definida antes de importar a app
+_tmpdir = tempfile.mkdtemp(prefix='stress-stock-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir, 'stress.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as application  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+app, db = application.app, application.db
+
+SHIPPING_INFO = {
+    'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@bench.local', 'phone': '000000000',
+    'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'PT',
+}
+
+
+def seed(users, articles, stock):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(
+            application.User(name=f'User {i}', username=f'user{i}', email=f'user{i}@bench.local',
+                             phone='000000000', password_hash='x')
+            for i in range(users)
+        )
+        db.session.add_all(
+            application.Article(name=f'Artigo {i}', content='Descrição', price=10.0, stock=stock)
+            for i in range(articles)
+        )
+        db.session.commit()
+        return [create_access_token(identity=str(user_id)) for user_id in range(1, users + 1)]
+
+
+def run(tokens, threads, articles, max_quantity, reserve_ratio, max_duration):
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'orders': 0, 'sold_out': 0, 'errors': 0}
+
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(n)
+        headers = {'Authorization': f'Bearer {tokens[n % len(tokens)]}'}
+        while not stop.is_set():
+            items = [
+                {'product_id': article_id, 'quantity': rng.randint(1, max_quantity)}
+                for article_id in rng.sample(range(1, articles + 1), rng.randint(1, min(3, articles)))
+            ]
+            body = {'shipping_info': SHIPPING_INFO, 'items': items}
+            response = None
+            if rng.random() < reserve_ratio:
+                response = client.post('/api/stock/reservations', json={'items': items}, headers=headers)
+                if response.status_code == 201:
+                    body['reservation_id'] = response.get_json()['reservation_id']
+                    response = None
+            if response is None:
+                response = client.post('/api/orders', json=body, headers=headers)
+
+            with lock:
+                if response.status_code == 201:
+                    counts['orders'] += 1
+                elif response.status_code == 409:
+                    counts['sold_out'] += 1
+                else:
+                    counts['errors'] += 1
+
+    # Pára quando todo o stock estiver vendido (ou ao fim de max_duration segundos)
+    def watcher():
+        deadline = time.perf_counter() + max_duration
+        while not stop.is_set():
+            time.sleep(0.2)
+            with app.app_context():
+                remaining = db.session.query(db.func.sum(application.Article.stock)).scalar() or 0
+            if remaining == 0 or time.perf_counter() > deadline:
+                stop.set()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=watcher))
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = time.perf_counter() - start
+
+    counts['elapsed_s'] = round(elapsed, 2)
+    counts['orders_per_second'] = round(counts['orders'] / elapsed, 2)
+    return counts
+
+
+def check(initial_stock):
+    with app.app_context():
+        sold = dict(
+            db.session.query(application.OrderItem.article_id, db.func.sum(application.OrderItem.quantity))
+            .group_by(application.OrderItem.article_id)
+        )
+        reserved = dict(
+            db.session.query(application.StockReservation.article_id,
+                             db.func.sum(application.StockReservation.quantity))
+            .group_by(application.StockReservation.article_id)
+        )
+        report = []
+        for article in application.Article.query.order_by(application.Article.id):
+            units_sold = int(sold.get(article.id, 0))
+            units_reserved = int(reserved.get(article.id, 0))
+            report.append({
+                'article_id': article.id,
+                'stock': article.stock,
+                'sold': units_sold,
+                'reserved': units_reserved,
+                'consistent': article.stock >= 0 and article.stock + units_sold + units_reserved == initial_stock,
+            })
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='threads a fazer encomendas')
+    parser.add_argument('--articles', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=200, help='stock inicial de cada artigo')
+    parser.add_argument('--max-quantity', type=int, default=3, help='quantidade máxima por linha')
+    parser.add_argument('--reserve-ratio', type=float, default=0.5, help='fração de encomendas com reserva prévia')
+    parser.add_argument('--max-duration', type=float, default=60.0, help='limite de segundos do teste')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--output', help='ficheiro JSON de resultados (por omissão stdout)')
+    args = parser.parse_args()
+
+    tokens = seed(args.users, args.articles, args.stock)
+    result = run(tokens, args.threads, args.articles, args.max_quantity, args.reserve_ratio, args.max_duration)
+    articles = check(args.stock)
+    results = {
+        'benchmark': 'stress_stock',
+        'threads': args.threads,
+        'initial_stock': args.stock,
+        'results': result,
+        'articles': articles,
+        'oversold': not all(article['consistent'] for article in articles),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if results['oversold'] else 0)
+
+
+if __name__ == '__main__':
+    main()
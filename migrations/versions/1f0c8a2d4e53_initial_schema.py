@@ -0,0 +1,88 @@
+"""Esquema inicial: utilizadores, artigos e encomendas
+
+Revision ID: 1f0c8a2d4e53
+Revises:
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f0c8a2d4e53'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bases de dados criadas antes das migrações (db.create_all()) já têm
+    # estas tabelas: só se criam as que faltam
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('phone', sa.String(length=20), nullable=False),
+            sa.Column('password_hash', sa.String(length=128), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+            sa.UniqueConstraint('email'),
+        )
+    if 'article' not in existing:
+        op.create_table(
+            'article',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=120), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('image_url', sa.String(length=255), nullable=True),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'order' not in existing:
+        op.create_table(
+            'order',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('order_date', sa.DateTime(), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=False),
+            sa.Column('first_name', sa.String(length=100), nullable=False),
+            sa.Column('last_name', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('phone', sa.String(length=20), nullable=False),
+            sa.Column('address', sa.String(length=255), nullable=False),
+            sa.Column('city', sa.String(length=100), nullable=False),
+            sa.Column('postal_code', sa.String(length=10), nullable=False),
+            sa.Column('country', sa.String(length=100), nullable=False),
+            sa.Column('subtotal', sa.Float(), nullable=False),
+            sa.Column('shipping', sa.Float(), nullable=False),
+            sa.Column('tax', sa.Float(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'order_item' not in existing:
+        op.create_table(
+            'order_item',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('article_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['article_id'], ['article.id']),
+            sa.ForeignKeyConstraint(['order_id'], ['order.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('order_item')
+    op.drop_table('order')
+    op.drop_table('article')
+    op.drop_table('user')
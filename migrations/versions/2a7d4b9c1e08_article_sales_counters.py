@@ -0,0 +1,40 @@
+"""Contadores de vendas por artigo (total_sold, order_item_count)
+
+Revision ID: 2a7d4b9c1e08
+Revises: 1f0c8a2d4e53
+Create Date: 2026-10-18 20:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7d4b9c1e08'
+down_revision = '1f0c8a2d4e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('article')}
+    added = False
+    for name in ('total_sold', 'order_item_count'):
+        if name not in columns:
+            op.add_column('article', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+            added = True
+
+    # Colunas novas numa base de dados com encomendas: preencher a partir de
+    # order_item (o mesmo cálculo de `flask rebuild-article-counters`)
+    if added:
+        op.execute(
+            'UPDATE article SET '
+            'total_sold = (SELECT coalesce(sum(quantity), 0) FROM order_item WHERE order_item.article_id = article.id), '
+            'order_item_count = (SELECT count(id) FROM order_item WHERE order_item.article_id = article.id)'
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('article') as batch_op:
+        batch_op.drop_column('order_item_count')
+        batch_op.drop_column('total_sold')
@@ -0,0 +1,32 @@
+"""Snapshot das estatísticas do dashboard (stat_counter)
+
+Revision ID: 3c5e9f1a2b74
+Revises: 2a7d4b9c1e08
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e9f1a2b74'
+down_revision = '2a7d4b9c1e08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O snapshot fica vazio: o primeiro GET /api/admin/stats (ou
+    # `flask rebuild-stats`) constrói-o a partir das tabelas de origem
+    if 'stat_counter' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'stat_counter',
+            sa.Column('key', sa.String(length=80), nullable=False),
+            sa.Column('value', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('key'),
+        )
+
+
+def downgrade():
+    op.drop_table('stat_counter')
@@ -0,0 +1,47 @@
+"""Índices compostos nas tabelas de encomendas
+
+Revision ID: 4b1e7d2c9a10
+Revises: 8b3d5f7a2c40
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1e7d2c9a10'
+down_revision = '8b3d5f7a2c40'
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas) - os mesmos declarados nos modelos Order e OrderItem
+INDEXES = [
+    ('ix_order_user_id_order_date', 'order', ['user_id', 'order_date']),
+    ('ix_order_order_date_id', 'order', ['order_date', 'id']),
+    ('ix_order_status_order_date_id', 'order', ['status', 'order_date', 'id']),
+    ('ix_order_item_order_id', 'order_item', ['order_id']),
+    ('ix_order_item_article_id_quantity', 'order_item', ['article_id', 'quantity']),
+]
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    # Bases de dados criadas por db.create_all() já têm estes índices: só se
+    # criam os que faltam
+    existing = {table: _existing_indexes(table) for table in {table for _, table, _ in INDEXES}}
+    for name, table, columns in INDEXES:
+        if name not in existing[table]:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    existing = {table: _existing_indexes(table) for table in {table for _, table, _ in INDEXES}}
+    for name, table, _ in reversed(INDEXES):
+        if name in existing[table]:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,61 @@
+"""Índice full-text dos artigos (SQLite FTS5) e triggers de sincronização
+
+Revision ID: 5d2f8b3c6e91
+Revises: 3c5e9f1a2b74
+Create Date: 2026-10-18 20:15:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2f8b3c6e91'
+down_revision = '3c5e9f1a2b74'
+branch_labels = None
+depends_on = None
+
+# O mesmo DDL de SEARCH_INDEX_DDL em app.py, à data desta revisão
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5(
+        name, content,
+        content='article', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ai AFTER INSERT ON article BEGIN
+        INSERT INTO article_fts(rowid, name, content) VALUES (new.id, new.name, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_au AFTER UPDATE OF name, content ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+        INSERT INTO article_fts(rowid, name, content) VALUES (new.id, new.name, new.content);
+    END""",
+]
+
+
+def upgrade():
+    # Só SQLite: nas outras bases de dados a pesquisa usa ILIKE
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    
+    try:
+        for ddl in SEARCH_INDEX_DDL:
+            bind.exec_driver_sql(ddl)
+    except OperationalError:
+        # SQLite compilado sem FTS5: a app usa ILIKE
+        return
+    
+    # Indexar os artigos que já existem
+    bind.exec_driver_sql("INSERT INTO article_fts(article_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('article_fts_au', 'article_fts_ad', 'article_fts_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS article_fts')
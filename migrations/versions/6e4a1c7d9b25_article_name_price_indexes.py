@@ -0,0 +1,33 @@
+"""Índices de ordenação do catálogo (article.name, article.price)
+
+Revision ID: 6e4a1c7d9b25
+Revises: 5d2f8b3c6e91
+Create Date: 2026-10-18 20:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e4a1c7d9b25'
+down_revision = '5d2f8b3c6e91'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_article_name': ['name'],
+    'ix_article_price': ['price'],
+}
+
+
+def upgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('article')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'article', columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='article')
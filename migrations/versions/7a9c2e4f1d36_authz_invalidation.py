@@ -0,0 +1,30 @@
+"""Invalidações de autorização (authz_invalidation)
+
+Revision ID: 7a9c2e4f1d36
+Revises: 6e4a1c7d9b25
+Create Date: 2026-10-18 20:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a9c2e4f1d36'
+down_revision = '6e4a1c7d9b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'authz_invalidation' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'authz_invalidation',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('changed_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+
+
+def downgrade():
+    op.drop_table('authz_invalidation')
@@ -0,0 +1,49 @@
+"""Stock dos artigos e reservas de stock do checkout
+
+Revision ID: 8b3d5f7a2c40
+Revises: 7a9c2e4f1d36
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3d5f7a2c40'
+down_revision = '7a9c2e4f1d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    
+    # Stock NULL = não controlado: os artigos existentes continuam a poder ser
+    # encomendados até o admin definir o stock
+    if 'stock' not in {column['name'] for column in inspector.get_columns('article')}:
+        op.add_column('article', sa.Column('stock', sa.Integer(), nullable=True, server_default=sa.text('NULL')))
+    
+    if 'stock_reservation' not in inspector.get_table_names():
+        op.create_table(
+            'stock_reservation',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('token', sa.String(length=36), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('article_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['article_id'], ['article.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_stock_reservation_token', 'stock_reservation', ['token'])
+        op.create_index('ix_stock_reservation_expires_at', 'stock_reservation', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservation_expires_at', table_name='stock_reservation')
+    op.drop_index('ix_stock_reservation_token', table_name='stock_reservation')
+    op.drop_table('stock_reservation')
+    with op.batch_alter_table('article') as batch_op:
+        batch_op.drop_column('stock')
@@ -0,0 +1,31 @@
+"""Versão do histórico de encomendas por utilizador
+
+Revision ID: 9c6a2e8d4f17
+Revises: 4b1e7d2c9a10
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c6a2e8d4f17'
+down_revision = '4b1e7d2c9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sem linha = versão 0: as caches de histórico começam vazias, nada a preencher
+    if 'order_history_version' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'order_history_version',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+
+
+def downgrade():
+    op.drop_table('order_history_version')
@@ -0,0 +1,69 @@
+"""Agregados diários de vendas
+
+Revision ID: ad4f8b2c6e39
+Revises: 9c6a2e8d4f17
+Create Date: 2026-10-18 20:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad4f8b2c6e39'
+down_revision = '9c6a2e8d4f17'
+branch_labels = None
+depends_on = None
+
+
+# Dimensão -> expressão da chave, por encomenda ('all' tem a chave vazia)
+ORDER_DIMENSIONS = {
+    'all': "''",
+    'country': 'o.country',
+    'status': 'o.status',
+}
+
+
+def _backfill(day):
+    """Preencher os agregados a partir das encomendas existentes (o cálculo de `flask backfill-sales-rollups`)"""
+    units = '(SELECT order_id, sum(quantity) AS units FROM order_item GROUP BY order_id)'
+    for dimension, key in ORDER_DIMENSIONS.items():
+        group_by = day if dimension == 'all' else f'{day}, {key}'
+        op.execute(
+            'INSERT INTO sales_rollup (dimension, day, key, orders, units, revenue) '
+            f"SELECT '{dimension}', {day}, {key}, count(o.id), coalesce(sum(u.units), 0), "
+            'coalesce(sum(o.total), 0) '
+            f'FROM "order" o LEFT JOIN {units} u ON u.order_id = o.id '
+            f'GROUP BY {group_by}'
+        )
+    op.execute(
+        'INSERT INTO sales_rollup (dimension, day, key, orders, units, revenue) '
+        f"SELECT 'article', {day}, CAST(i.article_id AS VARCHAR(100)), count(DISTINCT i.order_id), "
+        'sum(i.quantity), sum(i.quantity * i.price) '
+        'FROM order_item i JOIN "order" o ON o.id = i.order_id '
+        f'GROUP BY {day}, i.article_id'
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'sales_rollup' in sa.inspect(bind).get_table_names():
+        return
+
+    op.create_table(
+        'sales_rollup',
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'day', 'key'),
+    )
+    # Tabela nova numa base de dados com encomendas: os endpoints de analytics
+    # só leem os agregados, que têm de refletir o histórico existente
+    _backfill('date(o.order_date)' if bind.dialect.name == 'sqlite' else 'CAST(o.order_date AS DATE)')
+
+
+def downgrade():
+    op.drop_table('sales_rollup')
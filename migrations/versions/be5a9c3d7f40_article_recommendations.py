@@ -0,0 +1,51 @@
+"""Índice de recomendações de artigos comprados juntos
+
+Revision ID: be5a9c3d7f40
+Revises: ad4f8b2c6e39
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be5a9c3d7f40'
+down_revision = 'ad4f8b2c6e39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # As tabelas começam vazias (o endpoint devolve uma lista vazia): o índice
+    # é construído a partir das encomendas existentes por `flask recommendations build`
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'article_cooccurrence' not in tables:
+        op.create_table(
+            'article_cooccurrence',
+            sa.Column('article_id', sa.Integer(), nullable=False),
+            sa.Column('other_id', sa.Integer(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('article_id', 'other_id'),
+        )
+    if 'article_recommendation' not in tables:
+        op.create_table(
+            'article_recommendation',
+            sa.Column('article_id', sa.Integer(), nullable=False),
+            sa.Column('neighbors', sa.Text(), nullable=False),
+            sa.PrimaryKeyConstraint('article_id'),
+        )
+    if 'recommendation_index_state' not in tables:
+        op.create_table(
+            'recommendation_index_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('last_order_id', sa.Integer(), nullable=False),
+            sa.Column('built_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('recommendation_index_state')
+    op.drop_table('article_recommendation')
+    op.drop_table('article_cooccurrence')
@@ -0,0 +1,155 @@
+"""Fixtures dos testes da API
+
+A app é importada uma única vez com uma base de dados SQLite temporária
+(definida antes do import, como nos benchmarks); cada teste recomeça com as
+tabelas vazias e as caches em memória da app limpas.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_tmpdir = tempfile.mkdtemp(prefix='ecommerce-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ['IDEMPOTENCY_BACKEND'] = 'memory'
+os.environ['IDEMPOTENCY_DB_PATH'] = os.path.join(_tmpdir, 'idempotency.db')
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+os.environ['BCRYPT_POOL_SIZE'] = '0'
+sys.path.insert(0, ROOT)
+
+import app as application  # noqa: E402
+
+SHIPPING_INFO = {
+    'first_name': 'Ana', 'last_name': 'Silva', 'email': 'ana@test.local', 'phone': '912345678',
+    'address': 'Rua do Teste 1', 'city': 'Lisboa', 'postal_code': '1000-001', 'country': 'Portugal',
+}
+
+
+def reset_app_state():
+    """Tabelas vazias e caches em memória da app como num worker acabado de arrancar"""
+    db = application.db
+    with application.app.app_context():
+        db.session.remove()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE IF EXISTS article_fts')
+            conn.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+        db.drop_all()
+        db.create_all()
+    application._search_index_ready = None
+    application._last_stock_sweep = 0.0
+    application.catalog_cache._entry = None
+    application.order_history_cache._entries.clear()
+    application.autocomplete_index.invalidate()
+    application.authz_cache._changed = {}
+    application.authz_cache._loaded_at = 0.0
+    application.idempotency_store = application.create_idempotency_store(application.app.config['IDEMPOTENCY_BACKEND'])
+
+
+@pytest.fixture
+def app():
+    application.app.config['TESTING'] = True
+    reset_app_state()
+    yield application.app
+    with application.app.app_context():
+        application.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username='cliente', role='user', is_active=True, password='password123', name=None):
+        with app.app_context():
+            user = application.User(
+                name=name or username.title(), username=username, email=f'{username}@test.local',
+                phone='912345678', role=role, is_active=is_active
+            )
+            user.set_password(password)
+            application.db.session.add(user)
+            application.db.session.commit()
+            return user.id
+    return make_user
+
+
+@pytest.fixture
+def headers_for(app):
+    """Header Authorization com um token como o do login (claims role e is_active)"""
+    def headers_for(user_id):
+        with app.app_context():
+            user = application.db.session.get(application.User, user_id)
+            return {'Authorization': f'Bearer {application.create_user_token(user)}'}
+    return headers_for
+
+
+@pytest.fixture
+def admin_headers(make_user, headers_for):
+    return headers_for(make_user('admin', role='admin'))
+
+
+@pytest.fixture
+def user_headers(make_user, headers_for):
+    return headers_for(make_user('cliente'))
+
+
+@pytest.fixture
+def make_articles(app):
+    """Criar artigos diretamente na base de dados; devolve os ids"""
+    def make_articles(count=3, price=10.0, stock=None, names=None):
+        names = names or [f'Artigo {i}' for i in range(count)]
+        with app.app_context():
+            articles = [
+                application.Article(name=name, content=f'Descrição do {name.lower()}', price=price + i, stock=stock)
+                for i, name in enumerate(names)
+            ]
+            application.db.session.add_all(articles)
+            application.db.session.commit()
+            return [article.id for article in articles]
+    return make_articles
+
+
+@pytest.fixture
+def make_order(app):
+    """Inserir uma encomenda diretamente (sem contadores nem agregados); devolve o id"""
+    def make_order(user_id, lines, order_date=None, status='processando', country='Portugal'):
+        with app.app_context():
+            prices = dict(application.db.session.query(application.Article.id, application.Article.price))
+            subtotal = sum(prices[article_id] * quantity for article_id, quantity in lines)
+            order = application.Order(
+                user_id=user_id, order_date=order_date or datetime.utcnow(), status=status,
+                **dict(SHIPPING_INFO, country=country),
+                **application.compute_order_totals(subtotal)
+            )
+            application.db.session.add(order)
+            application.db.session.flush()
+            application.db.session.add_all(
+                application.OrderItem(order_id=order.id, article_id=article_id, quantity=quantity, price=prices[article_id])
+                for article_id, quantity in lines
+            )
+            application.db.session.commit()
+            return order.id
+    return make_order
+
+
+@pytest.fixture
+def place_order(client):
+    """Criar uma encomenda pela API (POST /api/orders)"""
+    def place_order(headers, lines, **extra):
+        return client.post('/api/orders', headers=headers, json=dict({
+            'shipping_info': SHIPPING_INFO,
+            'items': [{'product_id': article_id, 'quantity': quantity} for article_id, quantity in lines],
+        }, **extra))
+    return place_order
+
+
+def query_count(response):
+    """Número de queries SQL do pedido, do header Server-Timing"""
+    timing = response.headers['Server-Timing']
+    return int(timing.split('desc="', 1)[1].split(' ', 1)[0])
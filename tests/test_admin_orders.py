@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import query_count
+
+
+@pytest.fixture
+def orders(make_user, make_articles, make_order):
+    """Sete encomendas de dois clientes, uma por hora, com estados alternados"""
+    alice, bruno = make_user('alice'), make_user('bruno')
+    article_ids = make_articles(3)
+    base = datetime(2024, 3, 1, 12, 0)
+    return [
+        make_order(
+            (alice, bruno)[i % 2], [(article_ids[i % 3], 1), (article_ids[(i + 1) % 3], 2)],
+            order_date=base + timedelta(hours=i), status=('processando', 'entregue')[i % 2]
+        )
+        for i in range(7)
+    ]
+
+
+def test_without_pagination_params_returns_every_order(client, admin_headers, orders):
+    response = client.get('/api/admin/orders', headers=admin_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [order['id'] for order in data['orders']] == list(reversed(orders))
+    assert data['pagination']['has_more'] is False
+    assert data['pagination']['next_cursor'] is None
+
+
+def test_cursor_pages_cover_every_order_once_newest_first(client, admin_headers, orders):
+    seen, url = [], '/api/admin/orders?limit=3'
+    while url:
+        data = client.get(url, headers=admin_headers).get_json()
+        seen += [order['id'] for order in data['orders']]
+        cursor = data['pagination']['next_cursor']
+        assert data['pagination']['has_more'] is (cursor is not None)
+        url = f'/api/admin/orders?limit=3&cursor={cursor}' if cursor else None
+
+    assert seen == list(reversed(orders))
+
+
+def test_orders_include_user_items_and_shipping_info(client, admin_headers, orders):
+    order = client.get('/api/admin/orders?limit=1', headers=admin_headers).get_json()['orders'][0]
+
+    assert order['user_name'] == 'Alice'
+    assert order['user_email'] == 'alice@test.local'
+    assert order['items_count'] == 2 == len(order['items'])
+    assert {item['article_name'] for item in order['items']} == {'Artigo 0', 'Artigo 1'}
+    assert order['shipping_info']['name'] == 'Ana Silva'
+    assert order['order_date'] == '2024-03-01T18:00:00'
+
+
+def test_filters_by_status_and_date_range(client, admin_headers, orders):
+    delivered = client.get('/api/admin/orders?status=entregue', headers=admin_headers).get_json()['orders']
+    assert [order['id'] for order in delivered] == [orders[5], orders[3], orders[1]]
+
+    url = '/api/admin/orders?date_from=2024-03-01T14:00:00&date_to=2024-03-01T16:00:00'
+    in_range = client.get(url, headers=admin_headers).get_json()['orders']
+    assert [order['id'] for order in in_range] == [orders[3], orders[2]]
+
+
+def test_query_count_does_not_grow_with_page_size(client, admin_headers, orders):
+    client.get('/api/admin/orders?limit=1', headers=admin_headers)  # carrega a cache de autorização
+    small = client.get('/api/admin/orders?limit=1', headers=admin_headers)
+    large = client.get('/api/admin/orders?limit=7', headers=admin_headers)
+
+    assert len(large.get_json()['orders']) == 7
+    assert query_count(small) == query_count(large)
+
+
+@pytest.mark.parametrize('params', ['limit=abc', 'cursor=not-a-cursor', 'date_from=ontem'])
+def test_invalid_params_return_400(client, admin_headers, params):
+    response = client.get(f'/api/admin/orders?{params}', headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_requires_admin(client, user_headers):
+    assert client.get('/api/admin/orders', headers=user_headers).status_code == 403
@@ -0,0 +1,74 @@
+import pytest
+
+from conftest import query_count
+
+
+@pytest.fixture
+def users(make_user, make_articles, make_order):
+    """Admin sem encomendas, Carla com 3, Bruno com 1 e Diana (inativa) com 0"""
+    ids = {
+        'admin': make_user('admin', role='admin'),
+        'carla': make_user('carla'),
+        'bruno': make_user('bruno'),
+        'diana': make_user('diana', is_active=False),
+    }
+    article_id, = make_articles(1)
+    for user, count in (('carla', 3), ('bruno', 1)):
+        for _ in range(count):
+            make_order(ids[user], [(article_id, 1)])
+    return ids
+
+
+@pytest.fixture
+def headers(headers_for, users):
+    return headers_for(users['admin'])
+
+
+def names(response):
+    return [user['username'] for user in response.get_json()['users']]
+
+
+def test_without_pagination_params_returns_every_user(client, headers):
+    data = client.get('/api/admin/users', headers=headers).get_json()
+
+    assert [user['username'] for user in data['users']] == ['admin', 'bruno', 'carla', 'diana']
+    assert data['pagination'] == {'page': 1, 'per_page': 4, 'total': 4, 'pages': 1}
+
+
+def test_total_orders_comes_from_the_grouped_join(client, headers):
+    data = client.get('/api/admin/users', headers=headers).get_json()
+
+    assert {user['username']: user['total_orders'] for user in data['users']} == {
+        'admin': 0, 'bruno': 1, 'carla': 3, 'diana': 0,
+    }
+
+
+def test_sort_by_orders_descending(client, headers):
+    response = client.get('/api/admin/users?sort=orders&order=desc', headers=headers)
+
+    assert names(response) == ['carla', 'bruno', 'admin', 'diana']
+
+
+def test_pages_and_filters(client, headers):
+    page = client.get('/api/admin/users?per_page=3&page=2', headers=headers).get_json()
+    assert [user['username'] for user in page['users']] == ['diana']
+    assert page['pagination'] == {'page': 2, 'per_page': 3, 'total': 4, 'pages': 2}
+
+    assert names(client.get('/api/admin/users?role=admin', headers=headers)) == ['admin']
+    assert names(client.get('/api/admin/users?is_active=false', headers=headers)) == ['diana']
+
+
+def test_query_count_does_not_grow_with_users(client, headers, make_user):
+    client.get('/api/admin/users', headers=headers)  # carrega a cache de autorização
+    before = query_count(client.get('/api/admin/users', headers=headers))
+    for i in range(5):
+        make_user(f'extra{i}')
+
+    response = client.get('/api/admin/users', headers=headers)
+    assert len(response.get_json()['users']) == 9
+    assert query_count(response) == before
+
+
+@pytest.mark.parametrize('params', ['sort=email', 'order=up', 'page=x'])
+def test_invalid_params_return_400(client, headers, params):
+    assert client.get(f'/api/admin/users?{params}', headers=headers).status_code == 400
@@ -0,0 +1,52 @@
+import app as application
+
+
+def counters(app):
+    with app.app_context():
+        return {
+            row.id: (row.total_sold, row.order_item_count)
+            for row in application.db.session.query(
+                application.Article.id, application.Article.total_sold, application.Article.order_item_count
+            )
+        }
+
+
+def test_placing_an_order_increments_the_counters(app, user_headers, make_articles, place_order):
+    first, second, third = make_articles(3)
+
+    assert place_order(user_headers, [(first, 2), (second, 1)]).status_code == 201
+    assert place_order(user_headers, [(first, 1)]).status_code == 201
+
+    assert counters(app) == {first: (3, 2), second: (1, 1), third: (0, 0)}
+
+
+def test_deleting_a_user_discounts_their_orders(app, client, admin_headers, make_user, headers_for,
+                                                make_articles, place_order):
+    first, second = make_articles(2)
+    leaving, staying = make_user('sai'), make_user('fica')
+    place_order(headers_for(leaving), [(first, 2), (second, 1)])
+    place_order(headers_for(staying), [(first, 1)])
+
+    assert client.delete(f'/api/admin/users/{leaving}', headers=admin_headers).status_code == 200
+    assert counters(app) == {first: (1, 1), second: (0, 0)}
+
+
+def test_rebuild_command_recomputes_counters_from_order_items(app, make_user, make_articles, make_order):
+    first, second = make_articles(2)
+    user_id = make_user()
+    make_order(user_id, [(first, 2), (second, 5)])
+    make_order(user_id, [(first, 1)])
+    assert counters(app) == {first: (0, 0), second: (0, 0)}  # make_order não mexe nos contadores
+
+    result = app.test_cli_runner().invoke(args=['rebuild-article-counters'])
+
+    assert result.exit_code == 0, result.output
+    assert counters(app) == {first: (3, 2), second: (5, 1)}
+
+
+def test_articles_with_sales_cannot_be_deleted(client, admin_headers, user_headers, make_articles, place_order):
+    sold, unsold = make_articles(2)
+    place_order(user_headers, [(sold, 1)])
+
+    assert client.delete(f'/api/admin/articles/{sold}', headers=admin_headers).status_code == 400
+    assert client.delete(f'/api/admin/articles/{unsold}', headers=admin_headers).status_code == 200
@@ -0,0 +1,122 @@
+"""Modo ASGI (asgi.py) comparado com as rotas WSGI da mesma app"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('asgiref')
+pytest.importorskip('aiosqlite')
+
+import asgi  # noqa: E402
+import app as application  # noqa: E402
+
+# Headers que dependem do pedido (tempo, queries) e não do conteúdo
+VOLATILE_HEADERS = {'server-timing', 'date', 'content-length'}
+
+
+async def asgi_request(path, headers=None, method='GET', body=b''):
+    """Pedido HTTP feito diretamente a asgi.application: (status, headers, corpo)"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(), 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.application(scope, receive, send)
+    start = messages[0]
+    return (
+        start['status'],
+        {name.decode(): value.decode() for name, value in start['headers']},
+        b''.join(message.get('body', b'') for message in messages[1:]),
+    )
+
+
+def asgi_responses(requests):
+    """Fazer os pedidos num único event loop e libertar o pool assíncrono no fim"""
+    async def run():
+        try:
+            return [await asgi_request(path, headers) for path, headers in requests]
+        finally:
+            await asgi.async_engine.dispose()
+    return asyncio.run(run())
+
+
+def clear_caches():
+    application.catalog_cache._entry = None
+    application.order_history_cache._entries.clear()
+
+
+def assert_same_responses(client, requests):
+    """Cada pedido dá o mesmo status, headers e JSON em ASGI e em WSGI (com as caches vazias)"""
+    clear_caches()
+    async_responses = asgi_responses(requests)
+    clear_caches()
+    for (path, headers), (status, async_headers, body) in zip(requests, async_responses):
+        response = client.get(path, headers=headers)
+        assert status == response.status_code, path
+        assert json.loads(body) == response.get_json(), path
+        sync_headers = {name.lower(): value for name, value in response.headers.items()}
+        for name in (set(sync_headers) | set(async_headers)) - VOLATILE_HEADERS:
+            assert async_headers.get(name) == sync_headers.get(name), (path, name)
+
+
+@pytest.fixture
+def customer(make_user, headers_for, make_articles, make_order):
+    user_id = make_user('carla')
+    article_ids = make_articles(4, names=['Caneca azul', 'Caneca verde', 'Postal', 'Íman'])
+    base = datetime(2024, 3, 1, 12)
+    for i in range(3):
+        make_order(user_id, [(article_ids[i], 1), (article_ids[3], 2)], order_date=base + timedelta(days=i))
+    return headers_for(user_id)
+
+
+def test_async_views_match_the_wsgi_routes(client, customer):
+    assert_same_responses(client, [
+        ('/articles', {}),
+        ('/articles?limit=2&sort=-price&fields=id,name', {}),
+        ('/articles?limit=1&cursor=bad', {}),
+        ('/articles/search?name=caneca', {}),
+        ('/articles/search?name=caneca&limit=1&offset=1', {}),
+        ('/api/orders', customer),
+        ('/api/orders?limit=2', customer),
+        ('/api/orders?cursor=not-a-cursor', customer),
+        ('/api/orders', {}),
+    ])
+
+
+def test_async_order_history_uses_the_shared_cache(client, customer):
+    clear_caches()
+    (status, _, body), = asgi_responses([('/api/orders', customer)])
+
+    assert status == 200
+    assert [len(order['items']) for order in json.loads(body)['orders']] == [2, 2, 2]
+    assert len(application.order_history_cache._entries) == 1
+    assert client.get('/api/orders', headers=customer).get_json() == json.loads(body)
+
+
+def test_other_routes_are_served_by_the_wsgi_app(client, make_articles):
+    make_articles(2, names=['Caneca', 'Postal'])
+
+    (status, headers, body), = asgi_responses([('/articles/autocomplete?q=can', {})])
+
+    assert status == 200
+    assert json.loads(body) == client.get('/articles/autocomplete?q=can').get_json() == [{'id': 1, 'name': 'Caneca'}]
+    assert 'server-timing' in headers
+
+
+def test_async_database_url_uses_the_async_driver():
+    assert str(asgi.async_database_url('sqlite:///app.db')) == 'sqlite+aiosqlite:///app.db'
+    assert str(asgi.async_database_url('postgresql://u:p@db/loja')).startswith('postgresql+asyncpg://u:')
+    with pytest.raises(RuntimeError):
+        asgi.async_database_url('mysql://u:p@db/loja')
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+
+import app as application
+
+
+def promote(app, user_id, role='admin'):
+    """Alterar o role diretamente na base de dados, sem invalidar tokens"""
+    with app.app_context():
+        application.db.session.get(application.User, user_id).role = role
+        application.db.session.commit()
+
+
+def test_role_claim_is_trusted_without_reading_the_user(app, client, make_user, headers_for):
+    admin_id = make_user('admin', role='admin')
+    headers = headers_for(admin_id)
+    promote(app, admin_id, 'user')  # sem invalidação: o token continua a valer
+
+    assert client.get('/api/admin/stats', headers=headers).status_code == 200
+
+
+def test_demoting_an_admin_rejects_their_current_token(client, make_user, headers_for, admin_headers):
+    other_id = make_user('outro', role='admin')
+    other_headers = headers_for(other_id)
+    assert client.get('/api/admin/stats', headers=other_headers).status_code == 200
+
+    response = client.put(f'/api/admin/users/{other_id}', headers=admin_headers, json={'role': 'user'})
+
+    assert response.status_code == 200
+    assert client.get('/api/admin/stats', headers=other_headers).status_code == 403
+
+
+def test_deactivating_an_admin_rejects_their_current_token(client, make_user, headers_for, admin_headers):
+    other_id = make_user('outro', role='admin')
+    other_headers = headers_for(other_id)
+
+    client.put(f'/api/admin/users/{other_id}', headers=admin_headers, json={'is_active': False})
+
+    assert client.get('/api/admin/stats', headers=other_headers).status_code == 403
+
+
+def test_change_made_by_another_worker_is_seen_after_the_ttl(app, client, make_user, headers_for):
+    admin_id = make_user('admin', role='admin')
+    headers = headers_for(admin_id)
+    client.get('/api/admin/stats', headers=headers)
+    time.sleep(0.01)
+
+    with app.app_context():
+        application.db.session.merge(application.AuthzInvalidation(user_id=admin_id, changed_at=time.time()))
+        application.db.session.get(application.User, admin_id).role = 'user'
+        application.db.session.commit()
+    application.authz_cache._loaded_at = 0.0  # o TTL expirou
+
+    assert client.get('/api/admin/stats', headers=headers).status_code == 403
+
+
+def test_token_issued_right_after_a_change_is_trusted(app, make_user, headers_for):
+    user_id = make_user('admin', role='admin')
+    with app.app_context():
+        application.authz_cache.invalidate(user_id)
+        application.db.session.commit()
+        token = headers_for(user_id)['Authorization'].split()[1]
+        issued_at = decode_token(token)['iat']
+
+        assert isinstance(issued_at, float)
+        assert not application.authz_cache.is_stale(user_id, issued_at)
+        # Um token com iat inteiro do mesmo segundo pode ser anterior à alteração
+        assert application.authz_cache.is_stale(user_id, int(application.authz_cache._changed[user_id]))
+
+
+def test_tokens_without_role_claim_read_the_user(app, client, make_user):
+    admin_id, user_id = make_user('admin', role='admin'), make_user('cliente')
+    with app.app_context():
+        admin_token = create_access_token(identity=str(admin_id))
+        user_token = create_access_token(identity=str(user_id))
+
+    assert client.get('/api/admin/stats', headers={'Authorization': f'Bearer {admin_token}'}).status_code == 200
+    assert client.get('/api/admin/stats', headers={'Authorization': f'Bearer {user_token}'}).status_code == 403
+
+
+@pytest.mark.parametrize('value', ['false', 0, 1, None, 'true'])
+def test_is_active_must_be_a_json_boolean(app, client, make_user, admin_headers, value):
+    user_id = make_user('cliente')
+
+    response = client.put(f'/api/admin/users/{user_id}', headers=admin_headers, json={'is_active': value, 'name': 'X'})
+
+    assert response.status_code == 400
+    with app.app_context():
+        user = application.db.session.get(application.User, user_id)
+        assert user.is_active is True
+        assert user.name == 'Cliente'
+
+
+def test_is_active_false_deactivates_the_user(app, client, make_user, admin_headers):
+    user_id = make_user('cliente')
+
+    assert client.put(f'/api/admin/users/{user_id}', headers=admin_headers, json={'is_active': False}).status_code == 200
+    with app.app_context():
+        assert application.db.session.get(application.User, user_id).is_active is False
@@ -0,0 +1,44 @@
+import app as application
+
+
+def suggestions(client, query):
+    return [item['name'] for item in client.get(f'/articles/autocomplete?{query}').get_json()]
+
+
+def test_matches_the_start_of_any_word_without_accents(client, make_articles):
+    make_articles(names=['Denim Jacket', 'Light Blue Denim Dress', 'Calças Justas'])
+
+    assert suggestions(client, 'q=den') == ['Light Blue Denim Dress', 'Denim Jacket']
+    assert suggestions(client, 'q=calcas j') == ['Calças Justas']
+    assert suggestions(client, 'q=den&limit=1') == ['Light Blue Denim Dress']
+    assert suggestions(client, 'q=') == []
+
+
+def test_index_follows_changes_made_through_the_api(client, admin_headers, make_articles):
+    jacket, dress = make_articles(names=['Denim Jacket', 'Denim Dress'])
+    assert suggestions(client, 'q=denim') == ['Denim Dress', 'Denim Jacket']
+
+    client.put(f'/api/admin/articles/{jacket}', headers=admin_headers, json={'name': 'Leather Jacket'})
+    client.delete(f'/api/admin/articles/{dress}', headers=admin_headers)
+    client.post('/articles', json={'name': 'Denim Shorts', 'content': 'Calções', 'price': 15})
+
+    assert suggestions(client, 'q=denim') == ['Denim Shorts']
+    assert suggestions(client, 'q=leat') == ['Leather Jacket']
+
+
+def test_index_is_rebuilt_when_another_worker_changes_the_catalog(app, client, make_articles):
+    article_id, = make_articles(names=['Denim Jacket'])
+    assert suggestions(client, 'q=denim') == ['Denim Jacket']
+
+    # Outro worker: altera a base de dados e a versão do catálogo, não este índice
+    with app.app_context():
+        application.db.session.get(application.Article, article_id).name = 'Wool Coat'
+        application.bump_catalog_version()
+        application.db.session.commit()
+
+    assert suggestions(client, 'q=denim') == []
+    assert suggestions(client, 'q=wool') == ['Wool Coat']
+
+
+def test_invalid_limit_returns_400(client):
+    assert client.get('/articles/autocomplete?q=a&limit=x').status_code == 400
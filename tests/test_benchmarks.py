@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+
+import pytest
+
+from conftest import ROOT, application
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import bench_api  # noqa: E402
+
+SCALE = {'users': 4, 'articles': 12, 'orders': 30, 'items': 2}
+
+
+@pytest.fixture
+def bench(app, monkeypatch):
+    monkeypatch.setattr(bench_api, 'application', application)
+    return bench_api
+
+
+def test_scenarios_cover_every_route(bench):
+    ctx = bench.Context(SCALE, random.Random(1))
+    adapter = application.app.url_map.bind('localhost')
+    covered = {
+        adapter.match(path(ctx, 1).split('?', 1)[0], method=method)[0]
+        for _, method, path, *_ in bench.scenarios()
+    }
+
+    # Rotas da API (sem os ficheiros estáticos nem a documentação Swagger)
+    routes = {rule.endpoint for rule in application.app.url_map.iter_rules()
+              if rule.endpoint != 'static' and '.' not in rule.endpoint}
+    assert routes - covered == set()
+
+
+def test_new_scenarios_run_against_seeded_data(bench):
+    rng = random.Random(7)
+    bench.seed(SCALE, 4, rng)
+    ctx = bench.Context(SCALE, rng)
+    selected = [
+        scenario for scenario in bench.scenarios()
+        if scenario[0] in ('admin_articles_import', 'articles_recommendations')
+        or scenario[0].startswith('admin_analytics_')
+    ]
+
+    results = bench.run_client(ctx, selected, iterations=2, warmup=0)
+
+    assert len(selected) == 6
+    assert {row['scenario']: row['status_codes'] for row in results} == {
+        name: {'200': 2} for name, *_ in selected
+    }
+    with application.app.app_context():
+        assert application.db.session.query(application.SalesRollup).count() > 0
+        assert application.db.session.query(application.ArticleRecommendation).count() > 0
@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.fixture
+def articles(make_articles):
+    """Sete artigos com preços 10..16 e nomes por ordem inversa do preço"""
+    return make_articles(names=[f'Artigo {letter}' for letter in 'GFEDCBA'])
+
+
+def ids(response):
+    return [article['id'] for article in response.get_json()]
+
+
+def test_limit_and_offset_with_total_header(client, articles):
+    response = client.get('/articles?limit=3&offset=2')
+
+    assert ids(response) == articles[2:5]
+    assert response.headers['X-Total-Count'] == '7'
+    assert 'X-Next-Cursor' in response.headers
+
+
+def test_cursor_pages_follow_the_sort_order(client, articles):
+    seen, url = [], '/articles?sort=-price&limit=3'
+    while url:
+        response = client.get(url)
+        seen += ids(response)
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/articles?sort=-price&limit=3&cursor={cursor}' if cursor else None
+
+    assert seen == list(reversed(articles))
+
+
+def test_filters_without_pagination_return_every_match(client, articles):
+    response = client.get('/articles?min_price=11&max_price=15&sort=name')
+
+    assert ids(response) == list(reversed(articles[1:6]))
+    assert response.headers['X-Total-Count'] == '5'
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_fields_selects_the_serialized_columns(client, articles):
+    response = client.get('/articles?fields=id,price&limit=1')
+
+    assert response.get_json() == [{'id': articles[0], 'price': 10.0}]
+
+
+@pytest.mark.parametrize('params', ['sort=stock', 'fields=id,secret', 'limit=x', 'cursor=nope', 'min_price=barato'])
+def test_invalid_params_return_400(client, articles, params):
+    assert client.get(f'/articles?{params}').status_code == 400
+
+
+def test_search_without_pagination_returns_every_result(client, make_articles):
+    make_articles(60, names=[f'Caneca {i}' for i in range(60)])
+
+    everything = client.get('/articles/search?name=caneca')
+    assert len(everything.get_json()) == 60
+    assert everything.headers['X-Total-Count'] == '60'
+
+    page = client.get('/articles/search?name=caneca&limit=10&offset=55')
+    assert len(page.get_json()) == 5
+    assert page.headers['X-Total-Count'] == '60'
+
+
+def test_search_without_terms_lists_the_catalog(client, articles):
+    assert ids(client.get('/articles/search')) == articles
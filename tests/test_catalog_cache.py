@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import pytest
+
+import app as application
+
+
+def test_full_catalog_has_a_strong_etag_and_answers_304(client, make_articles):
+    make_articles(2)
+
+    first = client.get('/articles')
+    assert first.status_code == 200
+    assert [article['name'] for article in first.get_json()] == ['Artigo 0', 'Artigo 1']
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert 'Accept-Encoding' in first.headers['Vary']
+
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+    cached = client.get('/articles', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+
+def test_gzip_representation_has_its_own_etag(client, make_articles):
+    make_articles(2)
+    plain = client.get('/articles')
+
+    response = client.get('/articles', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    assert response.headers['ETag'] != plain.headers['ETag']
+    assert client.get('/articles', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']}) \
+        .status_code == 304
+
+
+def test_brotli_is_preferred_when_available(client, make_articles):
+    brotli = pytest.importorskip('brotli')
+    make_articles(1)
+
+    response = client.get('/articles', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data))[0]['name'] == 'Artigo 0'
+
+
+def test_catalog_changes_change_the_etag(client, admin_headers, make_articles):
+    article_id, = make_articles(1)
+    etag = client.get('/articles').headers['ETag']
+
+    client.put(f'/api/admin/articles/{article_id}', headers=admin_headers, json={'price': 99.5})
+
+    response = client.get('/articles', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()[0]['price'] == 99.5
+    assert response.headers['ETag'] != etag
+
+
+def test_cache_is_rebuilt_when_another_worker_bumps_the_version(app, client, make_articles):
+    make_articles(1)
+    client.get('/articles')
+
+    with app.app_context():
+        application.db.session.add(application.Article(name='Novo', content='Artigo novo', price=1.0))
+        application.bump_catalog_version()
+        application.db.session.commit()
+
+    assert [article['name'] for article in client.get('/articles').get_json()] == ['Artigo 0', 'Novo']
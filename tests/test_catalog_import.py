@@ -0,0 +1,157 @@
+import io
+import json
+
+import pytest
+
+import app as application
+
+
+def articles(app):
+    with app.app_context():
+        return {
+            article.name: (article.content, article.price, article.stock)
+            for article in application.Article.query.order_by(application.Article.id)
+        }
+
+
+def records(text, chunk_size=64 * 1024):
+    return list(application.iter_json_records(io.StringIO(text), chunk_size))
+
+
+def test_array_items_split_across_chunks_are_read_whole():
+    text = '\ufeff [ {"name": "A", "price": 12.5} ,\n{"name": "B, \\"com\\" ]"}, 1234567 ]'
+
+    assert records(text, chunk_size=3) == [
+        (1, {'name': 'A', 'price': 12.5}, None),
+        (2, {'name': 'B, "com" ]'}, None),
+        (3, 1234567, None),
+    ]
+
+
+def test_invalid_ndjson_line_is_reported_and_reading_continues():
+    rows = records('{"name": "A"}\n\n{"name": \n{"name": "C"}\n')
+
+    assert [(position, record) for position, record, _ in rows] == [(1, {'name': 'A'}), (3, None), (4, {'name': 'C'})]
+    assert rows[1][2].startswith('Invalid JSON')
+
+
+@pytest.mark.parametrize('text', ['[{"name": "A"} {"name": "B"}]', '[{"name": "A"},', '[{"name": '])
+def test_malformed_array_raises(text):
+    with pytest.raises(ValueError):
+        records(text, chunk_size=4)
+
+
+@pytest.mark.parametrize('record, error', [
+    ([], 'Item must be a JSON object'),
+    ({'name': '  '}, 'name is required'),
+    ({'name': 'A', 'price': '10'}, 'price must be a number'),
+    ({'name': 'A', 'price': -1}, 'price must be a non-negative number'),
+    ({'name': 'A', 'price': True}, 'price must be a number'),
+    ({'name': 'A', 'stock': 1.5}, 'stock must be a non-negative integer'),
+    ({'name': 'A', 'content': 3}, 'content must be a string'),
+])
+def test_invalid_records_are_rejected(record, error):
+    with pytest.raises(ValueError, match=error):
+        application.validate_catalog_record(record)
+
+
+def test_import_upserts_by_name_in_batches(app, make_articles):
+    make_articles(1, price=10.0, stock=5, names=['Camisola'])
+    stream = io.StringIO('\n'.join(json.dumps(record) for record in [
+        {'name': 'Camisola', 'price': 15.0},
+        {'name': 'Calças', 'content': 'Calças de ganga', 'price': 30.0, 'stock': 2},
+        {'name': 'Casaco'},
+        {'name': 'Meias', 'content': 'Meias', 'price': 'barato'},
+        {'name': 'Calças', 'stock': 7},
+    ]))
+    progress = []
+
+    with app.app_context():
+        report = application.import_catalog(stream, batch_size=2, progress=lambda r: progress.append(r['batches']))
+
+    assert {key: report[key] for key in ('processed', 'inserted', 'updated', 'rejected', 'batches')} == {
+        'processed': 5, 'inserted': 1, 'updated': 2, 'rejected': 2, 'batches': 2,
+    }
+    assert progress == [1, 2]
+    assert report['rejected_rows'] == [
+        {'position': 4, 'error': 'price must be a number'},
+        {'position': 3, 'error': 'content is required for new articles'},
+    ]
+    # Campos ausentes mantêm o valor; Calças é inserida no 1.º lote e atualizada no 2.º
+    assert articles(app) == {
+        'Camisola': ('Descrição do camisola', 15.0, 5),
+        'Calças': ('Calças de ganga', 30.0, 7),
+    }
+
+
+def test_repeated_name_in_a_batch_merges_fields(app):
+    stream = io.StringIO('[{"name": "Saia", "content": "Saia", "price": 9.0}, {"name": "Saia", "stock": 4}]')
+
+    with app.app_context():
+        report = application.import_catalog(stream)
+
+    assert (report['inserted'], report['updated']) == (1, 0)
+    assert articles(app) == {'Saia': ('Saia', 9.0, 4)}
+
+
+def test_cli_imports_a_json_file(app, tmp_path):
+    path = tmp_path / 'artigos.json'
+    path.write_text(json.dumps([
+        {'name': 'Camisola', 'content': 'Camisola de lã', 'price': 25.0},
+        {'name': ''},
+    ]), encoding='utf-8')
+
+    result = app.test_cli_runner().invoke(args=['catalog', 'import', str(path)])
+
+    assert result.exit_code == 0
+    assert 'Rejeitado #2: name is required' in result.output
+    assert '1 inseridos, 0 atualizados, 1 rejeitados.' in result.output
+    assert articles(app) == {'Camisola': ('Camisola de lã', 25.0, None)}
+
+
+def test_cli_fails_on_a_malformed_array(app, tmp_path):
+    path = tmp_path / 'artigos.json'
+    path.write_text('[{"name": "A", "content": "x"} {', encoding='utf-8')
+
+    result = app.test_cli_runner().invoke(args=['catalog', 'import', str(path)])
+
+    assert result.exit_code != 0
+    assert 'Expected "," after item 1' in result.output
+
+
+def test_endpoint_accepts_json_ndjson_and_file_upload(client, admin_headers):
+    response = client.post('/api/admin/articles/import', headers=admin_headers,
+                           json=[{'name': 'Camisola', 'content': 'Camisola', 'price': 20.0}])
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == 1
+
+    response = client.post('/api/admin/articles/import', headers=admin_headers,
+                           data='{"name": "Camisola", "price": 18.0}\n{"name": "Saia", "content": "Saia"}\n')
+    assert (response.get_json()['inserted'], response.get_json()['updated']) == (1, 1)
+
+    upload = (io.BytesIO('[{"name": "Saia", "stock": 3}]'.encode('utf-8')), 'artigos.json')
+    response = client.post('/api/admin/articles/import', headers=admin_headers, data={'file': upload})
+    assert response.get_json()['updated'] == 1
+
+    assert articles(client.application) == {'Camisola': ('Camisola', 18.0, None), 'Saia': ('Saia', 0.0, 3)}
+
+
+def test_endpoint_rejects_malformed_body_and_non_admins(client, admin_headers, user_headers):
+    response = client.post('/api/admin/articles/import', headers=admin_headers, data='[{"name": "A"')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+    assert client.post('/api/admin/articles/import', headers=user_headers, json=[]).status_code == 403
+
+
+def test_import_invalidates_catalog_caches_and_counts_articles(client, admin_headers, make_articles):
+    make_articles(1, names=['Camisola'])
+    assert len(client.get('/articles').get_json()) == 1
+    assert client.get('/articles/autocomplete?q=cas').get_json() == []
+
+    client.post('/api/admin/articles/import', headers=admin_headers,
+                json=[{'name': 'Casaco', 'content': 'Casaco', 'price': 50.0}])
+
+    assert [article['name'] for article in client.get('/articles').get_json()] == ['Camisola', 'Casaco']
+    assert [row['name'] for row in client.get('/articles/autocomplete?q=cas').get_json()] == ['Casaco']
+    assert client.get('/api/admin/stats', headers=admin_headers).get_json()['stats']['total_articles'] == 2
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import app as application
+
+
+@pytest.fixture
+def orders(make_user, make_articles, make_order):
+    user_id = make_user('alice')
+    first, second = make_articles(2)
+    return [
+        make_order(user_id, [(first, 1), (second, 2)], order_date=datetime(2024, 3, 1, 12)),
+        make_order(user_id, [(second, 1)], order_date=datetime(2024, 3, 2, 12), status='entregue'),
+    ]
+
+
+def test_csv_has_one_row_per_item(client, admin_headers, orders):
+    response = client.get('/api/admin/orders/export', headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=orders-')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(int(row['order_id']), row['article_name'], row['quantity']) for row in rows] == [
+        (orders[0], 'Artigo 0', '1'), (orders[0], 'Artigo 1', '2'), (orders[1], 'Artigo 1', '1'),
+    ]
+    assert rows[0]['user_name'] == 'Alice'
+    assert rows[0]['order_date'] == '2024-03-01T12:00:00'
+
+
+def test_ndjson_has_one_order_per_line_with_nested_items(client, admin_headers, orders):
+    response = client.get('/api/admin/orders/export?format=ndjson', headers=admin_headers)
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [order['order_id'] for order in lines] == orders
+    assert [item['quantity'] for item in lines[0]['items']] == [1, 2]
+    assert lines[1]['status'] == 'entregue'
+
+
+def test_filters_and_invalid_params(client, admin_headers, orders):
+    response = client.get('/api/admin/orders/export?format=ndjson&status=entregue', headers=admin_headers)
+    assert [json.loads(line)['order_id'] for line in response.get_data(as_text=True).splitlines()] == [orders[1]]
+
+    response = client.get('/api/admin/orders/export?format=ndjson&date_to=2024-03-01', headers=admin_headers)
+    assert [json.loads(line)['order_id'] for line in response.get_data(as_text=True).splitlines()] == [orders[0]]
+
+    assert client.get('/api/admin/orders/export?format=xml', headers=admin_headers).status_code == 400
+    assert client.get('/api/admin/orders/export?date_from=ontem', headers=admin_headers).status_code == 400
+
+
+def test_export_is_streamed_in_batches(app, client, admin_headers, orders, monkeypatch):
+    monkeypatch.setattr(application, 'EXPORT_BATCH_SIZE', 1)
+
+    response = client.get('/api/admin/orders/export?format=ndjson', headers=admin_headers, buffered=False)
+
+    assert response.is_streamed
+    chunks = [chunk for chunk in response.response if chunk]
+    assert len(chunks) == 2
+    response.close()
+
+
+def test_requires_admin(client, user_headers):
+    assert client.get('/api/admin/orders/export', headers=user_headers).status_code == 403
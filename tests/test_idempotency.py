@@ -0,0 +1,136 @@
+import pytest
+
+import app as application
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make_store(ttl=3600, lock_timeout=60):
+        if request.param == 'memory':
+            return application.MemoryIdempotencyStore(ttl, lock_timeout)
+        return application.SQLiteIdempotencyStore(str(tmp_path / 'idempotency.db'), ttl, lock_timeout)
+    return make_store
+
+
+def response_of(record):
+    return record['fingerprint'], record['status'], record['body']
+
+
+def test_store_reserves_completes_and_replays(make_store):
+    store = make_store()
+
+    assert store.reserve('k', 'f1') is None
+    assert response_of(store.reserve('k', 'f1')) == ('f1', None, None)
+    store.complete('k', 201, b'{"ok":true}')
+    assert response_of(store.reserve('k', 'f1')) == ('f1', 201, b'{"ok":true}')
+
+
+def test_released_keys_can_be_reserved_again(make_store):
+    store = make_store()
+    store.reserve('k', 'f1')
+
+    store.release('k')
+
+    assert store.reserve('k', 'f2') is None
+
+
+def test_unfinished_reservation_can_be_reclaimed_after_the_lock_timeout(make_store):
+    store = make_store(lock_timeout=0)
+    assert store.reserve('k', 'f1') is None  # o worker morre sem complete() nem release()
+
+    assert store.reserve('k', 'f1') is None
+
+
+def test_completed_response_lives_for_the_ttl_not_the_lock_timeout(make_store):
+    store = make_store(lock_timeout=0)
+    store.reserve('k', 'f1')
+    store.complete('k', 201, b'{}')
+
+    assert store.reserve('k', 'f1')['status'] == 201
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'idempotency.db')
+    first = application.SQLiteIdempotencyStore(path, 3600, 60)
+    second = application.SQLiteIdempotencyStore(path, 3600, 60)
+
+    first.reserve('k', 'f1')
+    first.complete('k', 201, b'{}')
+
+    assert second.reserve('k', 'f1')['status'] == 201
+
+
+def test_repeated_order_is_replayed_without_creating_another(app, user_headers, make_articles, place_order):
+    article_id, = make_articles(1)
+    headers = dict(user_headers, **{'Idempotency-Key': 'checkout-1'})
+
+    first = place_order(headers, [(article_id, 1)])
+    again = place_order(headers, [(article_id, 1)])
+
+    assert first.status_code == again.status_code == 201
+    assert again.get_json()['order_id'] == first.get_json()['order_id']
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert application.Order.query.count() == 1
+
+
+def test_same_key_with_a_different_body_returns_422(user_headers, make_articles, place_order):
+    article_id, = make_articles(1)
+    headers = dict(user_headers, **{'Idempotency-Key': 'checkout-1'})
+    place_order(headers, [(article_id, 1)])
+
+    assert place_order(headers, [(article_id, 2)]).status_code == 422
+
+
+def test_request_in_progress_returns_409(user_headers, make_articles, place_order, monkeypatch):
+    article_id, = make_articles(1)
+    headers = dict(user_headers, **{'Idempotency-Key': 'checkout-1'})
+    monkeypatch.setattr(application.idempotency_store, 'complete', lambda key, status, body: None)
+    place_order(headers, [(article_id, 1)])  # reserva a chave e "morre" antes de complete()
+
+    response = place_order(headers, [(article_id, 1)])
+
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_stuck_key_is_reclaimed_after_the_lock_timeout(make_user, headers_for, make_articles, place_order,
+                                                       monkeypatch):
+    article_id, = make_articles(1)
+    user_id = make_user()
+    headers = dict(headers_for(user_id), **{'Idempotency-Key': 'checkout-1'})
+    store = application.MemoryIdempotencyStore(ttl=3600, lock_timeout=0)
+    monkeypatch.setattr(application, 'idempotency_store', store)
+    store.reserve(f'{user_id}:/api/orders:checkout-1', 'pedido que não terminou')
+
+    response = place_order(headers, [(article_id, 1)])
+
+    assert response.status_code == 201
+
+
+def test_server_errors_are_not_cached(app, user_headers, make_articles, place_order, monkeypatch):
+    article_id, = make_articles(1)
+    headers = dict(user_headers, **{'Idempotency-Key': 'checkout-1'})
+
+    def fail(lines, sign=1):
+        raise RuntimeError('base de dados indisponível')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(application, 'apply_article_sales', fail)
+        assert place_order(headers, [(article_id, 1)]).status_code == 500
+
+    retry = place_order(headers, [(article_id, 1)])
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+
+
+def test_keys_are_scoped_per_user(app, make_user, headers_for, make_articles, place_order):
+    article_id, = make_articles(1)
+    ana = dict(headers_for(make_user('ana')), **{'Idempotency-Key': 'checkout-1'})
+    rui = dict(headers_for(make_user('rui')), **{'Idempotency-Key': 'checkout-1'})
+
+    first = place_order(ana, [(article_id, 1)])
+    second = place_order(rui, [(article_id, 1)])
+
+    assert second.status_code == 201
+    assert second.get_json()['order_id'] != first.get_json()['order_id']
@@ -0,0 +1,64 @@
+import logging
+
+import pytest
+
+import app as application
+from conftest import query_count
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(application, 'request_metrics', application.RequestMetrics())
+
+
+def metric_lines(client, name):
+    text = client.get('/metrics').get_data(as_text=True)
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_requests_are_counted_by_route_template_method_and_status(client, make_articles):
+    first, second = make_articles(2)
+    client.get(f'/articles/{first}/recommendations')
+    client.get(f'/articles/{second}/recommendations')
+    client.get('/articles?limit=x')
+    client.get('/nao-existe')
+
+    lines = metric_lines(client, 'http_requests_total{')
+
+    assert 'http_requests_total{route="/articles/<int:article_id>/recommendations",method="GET",status="200"} 2' in lines
+    assert 'http_requests_total{route="/articles",method="GET",status="400"} 1' in lines
+    assert 'http_requests_total{route="unmatched",method="GET",status="404"} 1' in lines
+
+
+def test_latency_histogram_and_query_counters(client, make_articles):
+    make_articles(2)
+    response = client.get('/articles?limit=10')
+
+    buckets = metric_lines(client, 'http_request_duration_seconds_bucket{route="/articles",method="GET"')
+    assert buckets[-1] == 'http_request_duration_seconds_bucket{route="/articles",method="GET",le="+Inf"} 1'
+    assert [line.split()[-1] for line in buckets] == sorted((line.split()[-1] for line in buckets), key=int)
+    assert metric_lines(client, 'db_queries_total{route="/articles",method="GET"}') == [
+        f'db_queries_total{{route="/articles",method="GET"}} {query_count(response)}'
+    ]
+
+
+def test_server_timing_header_reports_queries_and_durations(client, make_articles):
+    make_articles(1)
+
+    timing = client.get('/articles?limit=10').headers['Server-Timing']
+
+    assert timing.startswith('db;desc="2 queries";dur=')
+    assert ', app;dur=' in timing
+
+
+def test_requests_over_the_query_threshold_are_logged_and_counted(app, client, make_articles, monkeypatch, caplog):
+    make_articles(1)
+    monkeypatch.setitem(app.config, 'QUERY_COUNT_WARN_THRESHOLD', 1)
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/articles?limit=10')
+
+    assert any('GET /articles executou 2 queries SQL (limite 1' in message for message in caplog.messages)
+    assert metric_lines(client, 'http_requests_over_query_threshold_total{route="/articles"') == [
+        'http_requests_over_query_threshold_total{route="/articles",method="GET"} 1'
+    ]
@@ -0,0 +1,263 @@
+"""Cadeia de migrações Alembic aplicada a uma base de dados existente
+
+Cada teste cria um ficheiro SQLite com o esquema original (o que
+db.create_all() criava antes das migrações, sem índices), corre
+`flask db upgrade` num processo à parte (o env.py do Alembic reconfigura o
+logging do processo) e verifica a base de dados resultante.
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+from conftest import ROOT, application
+
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, username VARCHAR(80) NOT NULL UNIQUE,
+    email VARCHAR(120) NOT NULL UNIQUE, phone VARCHAR(20) NOT NULL, password_hash VARCHAR(128) NOT NULL,
+    role VARCHAR(20) NOT NULL, is_active BOOLEAN NOT NULL
+);
+CREATE TABLE article (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(120) NOT NULL, content TEXT NOT NULL,
+    image_url VARCHAR(255), price FLOAT NOT NULL
+);
+CREATE TABLE "order" (
+    id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id), order_date DATETIME NOT NULL,
+    status VARCHAR(50) NOT NULL, first_name VARCHAR(100) NOT NULL, last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(120) NOT NULL, phone VARCHAR(20) NOT NULL, address VARCHAR(255) NOT NULL,
+    city VARCHAR(100) NOT NULL, postal_code VARCHAR(10) NOT NULL, country VARCHAR(100) NOT NULL,
+    subtotal FLOAT NOT NULL, shipping FLOAT NOT NULL, tax FLOAT NOT NULL, total FLOAT NOT NULL
+);
+CREATE TABLE order_item (
+    id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER NOT NULL REFERENCES "order" (id),
+    article_id INTEGER NOT NULL REFERENCES article (id), quantity INTEGER NOT NULL, price FLOAT NOT NULL
+);
+INSERT INTO user VALUES (1, 'Ana', 'ana', 'ana@test.local', '912345678', 'x', 'user', 1);
+INSERT INTO article VALUES (1, 'Caneca', 'Caneca de cerâmica', NULL, 5.0);
+INSERT INTO article VALUES (2, 'Postal', 'Postal ilustrado', NULL, 1.5);
+INSERT INTO article VALUES (3, 'Íman', 'Íman de frigorífico', NULL, 2.0);
+INSERT INTO "order" VALUES (1, 1, '2024-03-01 12:00:00', 'processando', 'Ana', 'Silva', 'ana@test.local',
+    '912345678', 'Rua do Teste 1', 'Lisboa', '1000-001', 'Portugal', 8.0, 4.99, 1.84, 14.83);
+INSERT INTO "order" VALUES (2, 1, '2024-03-02 12:00:00', 'entregue', 'Ana', 'Silva', 'ana@test.local',
+    '912345678', 'Rua do Teste 1', 'Lisboa', '1000-001', 'Portugal', 13.0, 4.99, 2.99, 20.98);
+INSERT INTO order_item VALUES (1, 1, 1, 1, 5.0);
+INSERT INTO order_item VALUES (2, 1, 2, 2, 1.5);
+INSERT INTO order_item VALUES (3, 2, 1, 2, 5.0);
+INSERT INTO order_item VALUES (4, 2, 2, 2, 1.5);
+"""
+
+
+def run(database_path, command):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}')
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def flask_db(database_path, *args):
+    """Correr `flask db ...` sobre o ficheiro SQLite indicado"""
+    return run(database_path, [sys.executable, '-m', 'flask', '--app', 'app', 'db', *args])
+
+
+# Pedidos feitos pela app (num processo com DATABASE_URL a apontar para a
+# base de dados migrada) como o utilizador 1, promovido a admin
+REQUESTS_SCRIPT = """
+import json, sys
+import app as application
+
+app, db = application.app, application.db
+with app.app_context():
+    user = db.session.get(application.User, 1)
+    user.role = 'admin'
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {application.create_user_token(user)}'}
+client = app.test_client()
+statuses = {}
+for method, url, body in json.loads(sys.argv[1]):
+    statuses[f'{method} {url}'] = client.open(url, method=method, json=body, headers=headers).status_code
+print(json.dumps(statuses))
+"""
+
+
+def request_statuses(database_path, requests):
+    """Status HTTP de cada pedido (método, url, corpo JSON) feito à base de dados migrada"""
+    result = run(database_path, [sys.executable, '-c', REQUESTS_SCRIPT, json.dumps(requests)])
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = tmp_path / 'baseline.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    return path
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def test_upgrade_adds_and_backfills_article_sales_counters(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert {'total_sold', 'order_item_count'} <= columns(conn, 'article')
+        counters = conn.execute('SELECT id, total_sold, order_item_count FROM article ORDER BY id').fetchall()
+    assert counters == [(1, 3, 2), (2, 4, 2), (3, 0, 0)]
+
+
+def test_upgrade_from_empty_database_creates_the_baseline_tables(tmp_path):
+    path = tmp_path / 'empty.db'
+    flask_db(path, 'upgrade')
+
+    with sqlite3.connect(path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'user', 'article', 'order', 'order_item', 'alembic_version'} <= tables
+
+
+def test_upgrade_creates_an_empty_stats_snapshot(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert columns(conn, 'stat_counter') == {'key', 'value'}
+        assert conn.execute('SELECT count(*) FROM stat_counter').fetchone() == (0,)
+
+
+def test_upgrade_indexes_existing_articles_for_full_text_search(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        match = conn.execute("SELECT rowid FROM article_fts WHERE article_fts MATCH 'ceramica'").fetchall()
+        conn.execute("INSERT INTO article (id, name, content, price) VALUES (4, 'Pano', 'Pano de cozinha', 3.0)")
+        triggered = conn.execute("SELECT rowid FROM article_fts WHERE article_fts MATCH 'cozinha'").fetchall()
+    assert match == [(1,)]
+    assert triggered == [(4,)]
+
+
+def test_upgrade_creates_the_catalog_sort_indexes(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('article')")}
+    assert {'ix_article_name', 'ix_article_price'} <= indexes
+
+
+def test_upgrade_creates_the_authorization_invalidations_table(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert columns(conn, 'authz_invalidation') == {'user_id', 'changed_at'}
+
+
+def test_upgrade_adds_untracked_stock_and_the_reservations_table(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert conn.execute('SELECT DISTINCT stock FROM article').fetchall() == [(None,)]
+        assert {'token', 'user_id', 'article_id', 'quantity', 'expires_at'} <= columns(conn, 'stock_reservation')
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('stock_reservation')")}
+    assert {'ix_stock_reservation_token', 'ix_stock_reservation_expires_at'} <= indexes
+
+
+def test_upgrade_creates_the_order_history_versions_table(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert columns(conn, 'order_history_version') == {'user_id', 'version'}
+        assert conn.execute('SELECT count(*) FROM order_history_version').fetchone() == (0,)
+
+
+def test_upgrade_backfills_the_sales_rollups(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        rows = conn.execute(
+            'SELECT dimension, day, key, orders, units, round(revenue, 2) FROM sales_rollup '
+            'ORDER BY dimension, day, key'
+        ).fetchall()
+    assert rows == [
+        ('all', '2024-03-01', '', 1, 3, 14.83),
+        ('all', '2024-03-02', '', 1, 4, 20.98),
+        ('article', '2024-03-01', '1', 1, 1, 5.0),
+        ('article', '2024-03-01', '2', 1, 2, 3.0),
+        ('article', '2024-03-02', '1', 1, 2, 10.0),
+        ('article', '2024-03-02', '2', 1, 2, 3.0),
+        ('country', '2024-03-01', 'Portugal', 1, 3, 14.83),
+        ('country', '2024-03-02', 'Portugal', 1, 4, 20.98),
+        ('status', '2024-03-01', 'processando', 1, 3, 14.83),
+        ('status', '2024-03-02', 'entregue', 1, 4, 20.98),
+    ]
+
+
+def test_upgrade_creates_the_recommendation_tables(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    with sqlite3.connect(baseline_db) as conn:
+        assert columns(conn, 'article_cooccurrence') == {'article_id', 'other_id', 'count'}
+        assert columns(conn, 'article_recommendation') == {'article_id', 'neighbors'}
+        assert columns(conn, 'recommendation_index_state') == {'id', 'last_order_id', 'built_at'}
+
+
+def schema(path):
+    """Tabelas dos modelos com as colunas, índices e restrições únicas, lidas pelo inspector"""
+    engine = sa.create_engine(f'sqlite:///{path}')
+    try:
+        inspector = sa.inspect(engine)
+        return {
+            table: (
+                sorted((c['name'], str(c['type']), c['nullable']) for c in inspector.get_columns(table)),
+                inspector.get_pk_constraint(table)['constrained_columns'],
+                sorted((i['name'], tuple(i['column_names']), bool(i['unique'])) for i in inspector.get_indexes(table)),
+                sorted(tuple(u['column_names']) for u in inspector.get_unique_constraints(table)),
+            )
+            for table in application.db.metadata.tables
+        }
+    finally:
+        engine.dispose()
+
+
+def test_upgrade_from_empty_database_matches_the_models(tmp_path):
+    migrated, created = tmp_path / 'migrated.db', tmp_path / 'created.db'
+    flask_db(migrated, 'upgrade')
+    engine = sa.create_engine(f'sqlite:///{created}')
+    application.db.metadata.create_all(engine)
+    engine.dispose()
+
+    assert schema(migrated) == schema(created)
+
+
+def test_app_serves_a_migrated_baseline_database(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+
+    statuses = request_statuses(baseline_db, [
+        ('GET', '/articles', None),
+        ('GET', '/articles/search?name=caneca', None),
+        ('GET', '/articles/autocomplete?q=ca', None),
+        ('POST', '/articles', {'name': 'Pano', 'content': 'Pano de cozinha', 'price': 3.0}),
+        ('GET', '/api/admin/articles', None),
+        ('GET', '/api/admin/stats', None),
+        ('GET', '/api/admin/orders', None),
+        ('GET', '/api/admin/users', None),
+        ('GET', '/api/orders', None),
+        ('GET', '/api/orders?limit=1', None),
+        ('GET', '/api/admin/analytics/sales?interval=week', None),
+        ('GET', '/api/admin/analytics/top-articles', None),
+        ('GET', '/api/admin/analytics/breakdown?by=status', None),
+        ('GET', '/articles/1/recommendations', None),
+    ])
+
+    assert statuses == {request: 201 if request.startswith('POST') else 200 for request in statuses}
+
+
+def test_upgrade_is_reversible(baseline_db):
+    flask_db(baseline_db, 'upgrade')
+    flask_db(baseline_db, 'downgrade', 'base')
+
+    with sqlite3.connect(baseline_db) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'alembic_version'}
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as application
+from conftest import query_count
+
+
+@pytest.fixture
+def customer(make_user, headers_for):
+    user_id = make_user('carla')
+    return user_id, headers_for(user_id)
+
+
+@pytest.fixture
+def history(customer, make_user, make_articles, make_order):
+    """Cinco encomendas da Carla, uma por dia, e uma de outro cliente"""
+    user_id, _ = customer
+    article_ids = make_articles(2)
+    base = datetime(2024, 3, 1, 12, 0)
+    order_ids = [
+        make_order(user_id, [(article_ids[0], 1), (article_ids[1], i + 1)], order_date=base + timedelta(days=i))
+        for i in range(5)
+    ]
+    make_order(make_user('bruno'), [(article_ids[0], 1)], order_date=base)
+    return order_ids
+
+
+def ids(response):
+    return [order['id'] for order in response.get_json()['orders']]
+
+
+def test_without_pagination_params_returns_the_whole_history(client, customer, history):
+    response = client.get('/api/orders', headers=customer[1])
+
+    assert ids(response) == list(reversed(history))
+    assert response.get_json()['pagination'] == {'limit': None, 'has_more': False, 'next_cursor': None}
+    order = response.get_json()['orders'][0]
+    assert order['items'] == [
+        {'product_id': 1, 'name': 'Artigo 0', 'quantity': 1, 'price': 10.0},
+        {'product_id': 2, 'name': 'Artigo 1', 'quantity': 5, 'price': 11.0},
+    ]
+    assert order['shipping_info']['first_name'] == 'Ana'
+
+
+def test_cursor_pages_cover_the_history_once(client, customer, history):
+    seen, url = [], '/api/orders?limit=2'
+    while url:
+        data = client.get(url, headers=customer[1]).get_json()
+        seen += [order['id'] for order in data['orders']]
+        cursor = data['pagination']['next_cursor']
+        assert data['pagination']['has_more'] is (cursor is not None)
+        url = f'/api/orders?limit=2&cursor={cursor}' if cursor else None
+
+    assert seen == list(reversed(history))
+
+
+def test_query_count_does_not_grow_with_orders(client, customer, history, make_order):
+    cursor = client.get('/api/orders?limit=1', headers=customer[1]).get_json()['pagination']['next_cursor']
+    url = f'/api/orders?limit=200&cursor={cursor}'
+    before = client.get(url, headers=customer[1])
+    for i in range(5):
+        make_order(customer[0], [(1, 1), (2, 1)], order_date=datetime(2024, 1, 1 + i))
+
+    after = client.get(url, headers=customer[1])
+    assert len(ids(after)) == len(ids(before)) + 5
+    assert query_count(after) == query_count(before)
+
+
+def test_first_page_is_cached_until_a_new_order(client, customer, history, place_order):
+    first = client.get('/api/orders', headers=customer[1])
+    cached = client.get('/api/orders', headers=customer[1])
+    assert cached.get_data() == first.get_data()
+    assert query_count(cached) < query_count(first)
+
+    place_order(customer[1], [(1, 1)])
+
+    assert len(ids(client.get('/api/orders', headers=customer[1]))) == 6
+
+
+def test_status_change_and_article_rename_invalidate_the_cache(client, customer, history, admin_headers):
+    client.get('/api/orders', headers=customer[1])
+
+    client.put(f'/api/admin/orders/{history[-1]}/status', headers=admin_headers, json={'status': 'entregue'})
+    assert client.get('/api/orders', headers=customer[1]).get_json()['orders'][0]['status'] == 'entregue'
+
+    client.put('/api/admin/articles/1', headers=admin_headers, json={'name': 'Caneca'})
+    items = client.get('/api/orders', headers=customer[1]).get_json()['orders'][0]['items']
+    assert items[0]['name'] == 'Caneca'
+
+
+def test_bump_order_history_increments_each_user_once(app):
+    with app.app_context():
+        application.bump_order_history([3, 3, 4])
+        application.bump_order_history([3])
+        application.db.session.commit()
+
+        assert application.order_history_version(3)[0] == 2
+        assert application.order_history_version(4)[0] == 1
+        assert application.order_history_version(5)[0] == 0
+
+
+def test_cache_keeps_the_most_recent_users():
+    cache = application.OrderHistoryCache(max_users=2)
+    for user_id in (1, 2):
+        cache.store(user_id, (1, 1), None, {'user': user_id})
+    cache.lookup(1, (1, 1), None)
+    cache.store(3, (1, 1), None, {'user': 3})
+
+    assert cache.lookup(1, (1, 1), None) == {'user': 1}
+    assert cache.lookup(2, (1, 1), None) is None
+    assert cache.lookup(3, (2, 1), None) is None
+
+
+@pytest.mark.parametrize('params', ['limit=abc', 'cursor=not-a-cursor', 'limit=2&cursor=e30'])
+def test_invalid_params_return_400(client, customer, params):
+    response = client.get(f'/api/orders?{params}', headers=customer[1])
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,80 @@
+import pytest
+
+import app as application
+from conftest import SHIPPING_INFO, query_count
+
+
+def order_rows(app, order_id):
+    with app.app_context():
+        order = application.db.session.get(application.Order, order_id)
+        items = application.OrderItem.query.filter_by(order_id=order_id).order_by(application.OrderItem.id).all()
+        return order, [(item.article_id, item.quantity, item.price) for item in items]
+
+
+def test_prices_and_totals_come_from_the_catalog(app, user_headers, make_articles, place_order):
+    cheap, dear = make_articles(2, price=10.0)  # 10.0 e 11.0
+
+    response = place_order(
+        user_headers, [(cheap, 2), (dear, 1)],
+        totals={'subtotal': 0.01, 'shipping': 0, 'tax': 0, 'total': 0.01}
+    )
+
+    assert response.status_code == 201
+    assert response.get_json()['totals'] == {'subtotal': 31.0, 'shipping': 5.99, 'tax': 7.13, 'total': 44.12}
+    order, items = order_rows(app, response.get_json()['order_id'])
+    assert order.total == 44.12
+    assert items == [(cheap, 2, 10.0), (dear, 1, 11.0)]
+
+
+def test_free_shipping_from_the_threshold():
+    assert application.compute_order_totals(49.99)['shipping'] == application.SHIPPING_FEE
+    assert application.compute_order_totals(50.0) == {'subtotal': 50.0, 'shipping': 0.0, 'tax': 11.5, 'total': 61.5}
+
+
+def test_many_items_are_inserted_in_a_single_statement(app, user_headers, make_articles, place_order):
+    article_ids = make_articles(40)
+    place_order(user_headers, [(article_ids[0], 1)])  # primeira limpeza das reservas expiradas
+    small = place_order(user_headers, [(article_ids[0], 1)])
+
+    response = place_order(user_headers, [(article_id, 1) for article_id in article_ids])
+
+    assert response.status_code == 201
+    _, items = order_rows(app, response.get_json()['order_id'])
+    assert [article_id for article_id, _, _ in items] == article_ids
+    assert query_count(response) == query_count(small)
+
+
+def test_unknown_products_are_rejected_without_creating_the_order(app, user_headers, make_articles, place_order):
+    article_id, = make_articles(1)
+
+    response = place_order(user_headers, [(article_id, 1), (9999, 1)])
+
+    assert response.status_code == 400
+    assert '9999' in response.get_json()['message']
+    with app.app_context():
+        assert application.Order.query.count() == 0
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    [{'product_id': 1}],
+    [{'product_id': 'um', 'quantity': 1}],
+    [{'product_id': 1, 'quantity': 0}],
+])
+def test_invalid_items_return_400(client, user_headers, make_articles, items):
+    make_articles(1)
+
+    response = client.post('/api/orders', headers=user_headers, json={'shipping_info': SHIPPING_INFO, 'items': items})
+
+    assert response.status_code == 400
+
+
+def test_missing_shipping_fields_return_400(client, user_headers, make_articles):
+    article_id, = make_articles(1)
+
+    response = client.post('/api/orders', headers=user_headers, json={
+        'shipping_info': {'first_name': 'Ana'}, 'items': [{'product_id': article_id, 'quantity': 1}],
+    })
+
+    assert response.status_code == 400
+    assert 'postal_code' in response.get_json()['message']
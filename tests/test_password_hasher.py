@@ -0,0 +1,65 @@
+import hashlib
+
+import pytest
+
+import app as application
+
+
+def test_inline_hasher_hashes_and_checks():
+    hasher = application.PasswordHasher(workers=0, queue_depth=1, rounds=4)
+
+    password_hash = hasher.hash('segredo123')
+
+    assert password_hash.startswith('$2b$04$')
+    assert hasher.check(password_hash, 'segredo123')
+    assert not hasher.check(password_hash, 'outra')
+
+
+def test_process_pool_gives_the_same_results():
+    hasher = application.PasswordHasher(workers=1, queue_depth=2, rounds=4)
+    try:
+        password_hash = hasher.hash('segredo123')
+        assert hasher.check(password_hash, 'segredo123')
+        assert application._bcrypt_check(password_hash, 'segredo123')
+    finally:
+        hasher.shutdown()
+
+
+def test_full_queue_is_rejected_without_waiting():
+    hasher = application.PasswordHasher(workers=1, queue_depth=1, rounds=4)
+    hasher._slots.acquire()  # a única vaga está ocupada por outro pedido
+
+    with pytest.raises(application.PasswordQueueFull):
+        hasher.hash('segredo123')
+
+
+def test_login_returns_503_with_retry_after_when_the_queue_is_full(client, make_user, monkeypatch):
+    make_user('ana', password='segredo123')
+    busy = application.PasswordHasher(workers=1, queue_depth=1, rounds=4)
+    busy._slots.acquire()
+    monkeypatch.setattr(application, 'password_hasher', busy)
+
+    response = client.post('/api/login', json={'username': 'ana', 'password': 'segredo123'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_login_checks_the_password(client, make_user):
+    make_user('ana', password='segredo123')
+
+    assert client.post('/api/login', json={'username': 'ana', 'password': 'segredo123'}).status_code == 200
+    assert client.post('/api/login', json={'username': 'ana', 'password': 'errada'}).status_code == 401
+
+
+def test_login_upgrades_legacy_sha256_hashes_to_bcrypt(app, client, make_user):
+    user_id = make_user('ana')
+    with app.app_context():
+        user = application.db.session.get(application.User, user_id)
+        user.password_hash = hashlib.sha256(b'segredo123').hexdigest()
+        application.db.session.commit()
+
+    assert client.post('/api/login', json={'username': 'ana', 'password': 'segredo123'}).status_code == 200
+
+    with app.app_context():
+        assert application.db.session.get(application.User, user_id).password_hash.startswith('$2b$')
@@ -0,0 +1,102 @@
+"""Planos de execução das queries das rotas de encomendas numa base de dados com dados
+
+Regista o SQL executado por cada rota e verifica com EXPLAIN QUERY PLAN que
+usa o índice esperado e que nenhuma query percorre order/order_item por
+inteiro (a mesma regra de `flask check-query-plans`).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import app as application
+
+
+@pytest.fixture
+def seeded(app, make_user, make_articles, make_order):
+    """Duas centenas de encomendas de vários clientes, estados e dias"""
+    users = [make_user(f'cliente{i}') for i in range(5)]
+    article_ids = make_articles(10)
+    base = datetime(2024, 1, 1)
+    with app.app_context():
+        for i in range(200):
+            make_order(
+                users[i % 5], [(article_ids[i % 10], 1), (article_ids[(i + 3) % 10], 2)],
+                order_date=base + timedelta(hours=i * 7), status=('processando', 'enviado', 'entregue')[i % 3]
+            )
+    return users
+
+
+def selects_of(app, client, url, headers):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = application.db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get(url, headers=headers)
+        response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return statements
+
+
+def plans_of(app, statements):
+    with app.app_context():
+        connection = application.db.engine.raw_connection()
+        try:
+            return [
+                (statement, [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)])
+                for statement, parameters in statements
+            ]
+        finally:
+            connection.invalidate()
+
+
+@pytest.mark.parametrize('url, index', [
+    ('/api/admin/orders?limit=20', 'ix_order_order_date_id'),
+    ('/api/admin/orders?status=entregue&limit=20', 'ix_order_status_order_date_id'),
+    ('/api/admin/orders?status=entregue', 'ix_order_status_order_date_id'),
+    ('/api/admin/orders?date_from=2024-02-01&date_to=2024-02-10', 'ix_order_order_date_id'),
+    ('/api/admin/orders/export?status=enviado', 'ix_order_status_order_date_id'),
+])
+def test_admin_order_queries_use_the_order_indexes(app, client, admin_headers, seeded, url, index):
+    plans = plans_of(app, selects_of(app, client, url, admin_headers))
+    details = [detail for _, plan in plans for detail in plan]
+
+    assert any(index in detail for detail in details), details
+    assert any('ix_order_item_order_id' in detail for detail in details), details
+    for statement, plan in plans:
+        assert application._plan_full_scans(statement, plan) == [], (statement, plan)
+
+
+def test_order_history_uses_the_user_index(app, client, headers_for, seeded):
+    plans = plans_of(app, selects_of(app, client, '/api/orders?limit=10', headers_for(seeded[0])))
+    details = [detail for _, plan in plans for detail in plan]
+
+    assert any('ix_order_user_id_order_date' in detail for detail in details), details
+    for statement, plan in plans:
+        assert application._plan_full_scans(statement, plan) == [], (statement, plan)
+
+
+def test_article_sales_sum_uses_the_covering_index(app, seeded):
+    with app.app_context():
+        query = application.db.select(
+            application.db.func.sum(application.OrderItem.quantity)
+        ).where(application.OrderItem.article_id == 1)
+        compiled = query.compile(application.db.engine)
+        (statement, plan), = plans_of(app, [(str(compiled), tuple(compiled.params.values()))])
+
+    assert any('COVERING INDEX ix_order_item_article_id_quantity' in detail for detail in plan), plan
+
+
+def test_check_query_plans_command_passes(app, seeded):
+    result = app.test_cli_runner().invoke(args=['check-query-plans'])
+
+    assert result.exit_code == 0, result.output
+    assert 'nenhuma faz full scan' in result.output
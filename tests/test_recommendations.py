@@ -0,0 +1,108 @@
+import pytest
+
+import app as application
+from conftest import query_count
+
+
+def neighbors(client, article_id, query=''):
+    response = client.get(f'/articles/{article_id}/recommendations{query}')
+    assert response.status_code == 200
+    return [(row['id'], row['bought_together']) for row in response.get_json()]
+
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=['recommendations', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+@pytest.fixture
+def articles(make_articles):
+    return make_articles(5)
+
+
+@pytest.fixture
+def baskets(make_user, make_order, articles):
+    """Cestos: (0, 1, 2), (0, 1), (0, 2), (1, 3) e um artigo sozinho (4)"""
+    user_id = make_user('carla')
+    for basket in ((0, 1, 2), (0, 1), (0, 2), (1, 3), (4,)):
+        make_order(user_id, [(articles[i], 1) for i in basket])
+    return articles
+
+
+@pytest.mark.parametrize('backend', [
+    'python',
+    pytest.param('sparse', marks=pytest.mark.skipif(application.sparse is None, reason='NumPy/SciPy não instalados')),
+])
+def test_cooccurrence_counts_both_directions_and_ignores_single_items(monkeypatch, backend):
+    if backend == 'python':
+        monkeypatch.setattr(application, 'sparse', None)
+
+    pairs = application.build_cooccurrence([{1, 2, 3}, {1, 2}, {5}, {3, 1}])
+
+    assert sorted(pairs) == [(1, 2, 2), (1, 3, 2), (2, 1, 2), (2, 3, 1), (3, 1, 2), (3, 2, 1)]
+
+
+def test_top_k_breaks_ties_by_article_id():
+    pairs = [(1, 4, 2), (1, 3, 2), (1, 2, 5), (1, 5, 1), (2, 1, 5)]
+
+    assert application.select_top_k(pairs, k=3) == {1: [[2, 5], [3, 2], [4, 2]], 2: [[1, 5]]}
+
+
+def test_build_and_endpoint(app, client, baskets):
+    assert run(app, 'build').startswith('8 pares, 4 artigos com recomendações')
+
+    first, second, third, fourth, fifth = baskets
+    assert neighbors(client, first) == [(second, 2), (third, 2)]
+    assert neighbors(client, second) == [(first, 2), (third, 1), (fourth, 1)]
+    assert neighbors(client, second, '?limit=1') == [(first, 2)]
+    assert neighbors(client, fifth) == []
+    with app.app_context():
+        assert application.db.session.get(application.RecommendationIndexState, 1).last_order_id == 5
+
+
+def test_response_has_article_fields_and_skips_missing_articles(app, client, baskets):
+    run(app, 'build')
+    with app.app_context():
+        # Vizinho que já não existe no catálogo (o índice só muda na reconstrução)
+        application.db.session.execute(application.db.update(application.ArticleRecommendation).values(
+            neighbors=f'[[{baskets[1]},2],[999,2]]'
+        ).where(application.ArticleRecommendation.article_id == baskets[0]))
+        application.db.session.commit()
+
+    response = client.get(f'/articles/{baskets[0]}/recommendations')
+
+    assert response.get_json() == [
+        {'id': baskets[1], 'name': 'Artigo 1', 'price': 11.0, 'image_url': None, 'bought_together': 2},
+    ]
+
+
+def test_query_count_does_not_grow_with_neighbors(app, client, baskets):
+    run(app, 'build')
+
+    assert query_count(client.get(f'/articles/{baskets[4]}/recommendations')) == 1
+    assert query_count(client.get(f'/articles/{baskets[1]}/recommendations')) == 2
+    assert query_count(client.get(f'/articles/{baskets[0]}/recommendations')) == 2
+
+
+def test_update_adds_new_orders_like_a_rebuild(app, client, make_user, make_order, baskets):
+    run(app, 'build')
+    user_id = make_user('bruno')
+    make_order(user_id, [(baskets[3], 1), (baskets[4], 1), (baskets[0], 1)])
+    make_order(user_id, [(baskets[3], 1), (baskets[4], 1)])
+
+    assert run(app, 'update') == '2 encomendas novas, 3 artigos atualizados.\n'
+    updated = {article_id: neighbors(client, article_id) for article_id in baskets}
+    assert updated[baskets[4]] == [(baskets[3], 2), (baskets[0], 1)]
+
+    run(app, 'build')
+    assert {article_id: neighbors(client, article_id) for article_id in baskets} == updated
+
+
+def test_update_without_an_index_reads_every_order(app, client, baskets):
+    assert run(app, 'update') == '5 encomendas novas, 4 artigos atualizados.\n'
+    assert neighbors(client, baskets[0]) == [(baskets[1], 2), (baskets[2], 2)]
+
+
+def test_invalid_limit_returns_400(client):
+    assert client.get('/articles/1/recommendations?limit=muitos').status_code == 400
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import app as application
+
+
+@pytest.fixture
+def make_replica(app, tmp_path, monkeypatch):
+    """Réplica de leitura com uma cópia do primário no momento da chamada"""
+    engines = application.db._app_engines[app]
+    created = []
+
+    def make_replica(path=None):
+        if path is None:
+            path = tmp_path / 'replica.db'
+            with app.app_context():
+                primary = sqlite3.connect(application.db.engine.url.database)
+            with sqlite3.connect(path) as copy:
+                primary.backup(copy)
+            primary.close()
+        engine = create_engine(f'sqlite:///{path}')
+        engines['replica_test'] = engine
+        created.append(engine)
+        monkeypatch.setattr(application, 'replica_router', application.ReplicaRouter(['replica_test'], 60))
+        return application.replica_router
+
+    yield make_replica
+    engines.pop('replica_test', None)
+    for engine in created:
+        engine.dispose()
+
+
+def names(response):
+    return [article['name'] for article in response.get_json()]
+
+
+def test_read_only_routes_read_from_the_replica(client, make_articles, make_replica):
+    make_articles(1)
+    make_replica()
+    make_articles(names=['Só no primário'])
+
+    assert names(client.get('/articles?limit=10')) == ['Artigo 0']
+
+
+def test_writes_and_other_routes_use_the_primary(app, client, make_articles, make_replica):
+    make_articles(1)
+    make_replica()
+
+    response = client.post('/articles', json={'name': 'Novo', 'content': 'Artigo novo', 'price': 1.0})
+
+    assert response.status_code == 201
+    with app.app_context():
+        assert application.db.session.get(application.Article, response.get_json()['id']).name == 'Novo'
+
+
+def test_unhealthy_replica_falls_back_to_the_primary(client, make_articles, make_replica, tmp_path):
+    broken = tmp_path / 'broken.db'
+    broken.write_bytes(b'isto nao e uma base de dados SQLite' * 100)
+    router = make_replica(broken)
+    make_articles(1)
+
+    assert names(client.get('/articles?limit=10')) == ['Artigo 0']
+    assert router.status()[0]['healthy'] is False
+
+
+def test_stats_snapshot_is_rebuilt_from_the_primary(client, admin_headers, make_user, make_articles, make_order,
+                                                    make_replica):
+    make_replica()  # cópia sem encomendas e sem snapshot
+    article_id, = make_articles(1)
+    make_order(make_user('ana'), [(article_id, 1)])
+
+    stats = client.get('/api/admin/stats', headers=admin_headers).get_json()['stats']
+
+    assert stats['total_orders'] == 1
+    assert stats['total_users'] == 2
+    assert stats['total_articles'] == 1
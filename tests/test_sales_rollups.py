@@ -0,0 +1,138 @@
+from datetime import date, datetime
+
+import pytest
+
+import app as application
+from conftest import SHIPPING_INFO
+
+
+def rollups(app):
+    """{(dimensão, dia, chave): (encomendas, unidades, receita)} sem as linhas a zero"""
+    with app.app_context():
+        return {
+            (row.dimension, row.day, row.key): (row.orders, row.units, round(row.revenue, 2))
+            for row in application.SalesRollup.query.all()
+            if row.orders
+        }
+
+
+def backfill(app, start_day=None, end_day=None):
+    with app.app_context():
+        return application.backfill_sales_rollups(start_day, end_day)
+
+
+@pytest.fixture
+def sales(make_user, make_articles, make_order, app):
+    """Quatro encomendas em três dias de março (duas semanas ISO) e uma em abril, com agregados recalculados"""
+    ana, bruno = make_user('ana'), make_user('bruno')
+    caneca, postal = make_articles(2, price=10.0)
+    make_order(ana, [(caneca, 1), (postal, 2)], order_date=datetime(2024, 3, 1, 9))
+    make_order(bruno, [(caneca, 3)], order_date=datetime(2024, 3, 1, 18), country='Espanha')
+    make_order(ana, [(postal, 1)], order_date=datetime(2024, 3, 4, 12), status='entregue')
+    make_order(bruno, [(caneca, 1), (postal, 1)], order_date=datetime(2024, 4, 2, 12), status='entregue')
+    backfill(app)
+    return {'ana': ana, 'bruno': bruno, 'caneca': caneca, 'postal': postal}
+
+
+def test_orders_update_the_rollups_like_a_backfill(app, client, user_headers, admin_headers, make_articles,
+                                                   place_order):
+    caneca, postal = make_articles(2, price=10.0)
+    order_ids = [
+        place_order(user_headers, [(caneca, 1), (postal, 2)]).get_json()['order_id'],
+        place_order(user_headers, [(caneca, 3)],
+                    shipping_info=dict(SHIPPING_INFO, country='Espanha')).get_json()['order_id'],
+        place_order(user_headers, [(postal, 1)]).get_json()['order_id'],
+    ]
+    client.put(f'/api/admin/orders/{order_ids[1]}/status', headers=admin_headers, json={'status': 'cancelado'})
+    incremental = rollups(app)
+
+    with app.app_context():
+        application.db.session.execute(application.db.delete(application.SalesRollup))
+        application.db.session.commit()
+    backfill(app)
+
+    assert rollups(app) == incremental
+    today = datetime.utcnow().date()
+    assert incremental[('all', today, '')][:2] == (3, 7)
+    assert incremental[('status', today, 'cancelado')][:2] == (1, 3)
+    assert incremental[('article', today, str(caneca))] == (2, 4, 40.0)
+
+
+def test_deleting_a_user_subtracts_their_orders(app, client, admin_headers, sales):
+    client.delete(f'/api/admin/users/{sales["bruno"]}', headers=admin_headers)
+
+    assert rollups(app)[('all', date(2024, 3, 1), '')][:2] == (1, 3)
+    assert ('country', date(2024, 3, 1), 'Espanha') not in rollups(app)
+    assert ('all', date(2024, 4, 2), '') not in rollups(app)
+
+
+def test_backfill_of_a_range_keeps_the_other_days(app, sales):
+    with app.app_context():
+        application.db.session.execute(application.db.delete(application.SalesRollup))
+        application.db.session.commit()
+
+    written = backfill(app, date(2024, 3, 2), date(2024, 3, 5))
+
+    assert {day for _, day, _ in rollups(app)} == {date(2024, 3, 4)}
+    assert written == len(rollups(app)) == 4
+
+
+def test_sales_series_by_day_week_and_month(client, admin_headers, sales):
+    daily = client.get('/api/admin/analytics/sales', headers=admin_headers).get_json()
+    assert [(point['period'], point['orders'], point['units']) for point in daily['series']] == [
+        ('2024-03-01', 2, 6), ('2024-03-04', 1, 1), ('2024-04-02', 1, 2),
+    ]
+    assert daily['totals']['orders'] == 4
+
+    weekly = client.get('/api/admin/analytics/sales?interval=week', headers=admin_headers).get_json()
+    assert [point['period'] for point in weekly['series']] == ['2024-02-26', '2024-03-04', '2024-04-01']
+
+    url = '/api/admin/analytics/sales?interval=month&date_from=2024-03-02&date_to=2024-04-02'
+    monthly = client.get(url, headers=admin_headers).get_json()
+    assert [(point['period'], point['orders']) for point in monthly['series']] == [('2024-03-01', 1), ('2024-04-01', 1)]
+
+
+def test_top_articles_by_revenue_and_units(client, admin_headers, sales):
+    url = '/api/admin/analytics/top-articles?date_to=2024-03-31'
+    by_revenue = client.get(url, headers=admin_headers).get_json()['articles']
+    assert [(row['name'], row['orders'], row['units'], row['revenue']) for row in by_revenue] == [
+        ('Artigo 0', 2, 4, 40.0), ('Artigo 1', 2, 3, 33.0),
+    ]
+
+    by_units = client.get(url + '&by=units&limit=1', headers=admin_headers).get_json()['articles']
+    assert [row['article_id'] for row in by_units] == [sales['caneca']]
+
+
+def test_breakdown_by_country_and_status(client, admin_headers, sales):
+    by_country = client.get('/api/admin/analytics/breakdown', headers=admin_headers).get_json()['breakdown']
+    assert {row['country']: row['orders'] for row in by_country} == {'Portugal': 3, 'Espanha': 1}
+
+    url = '/api/admin/analytics/breakdown?by=status&date_from=2024-03-02'
+    by_status = client.get(url, headers=admin_headers).get_json()['breakdown']
+    assert [(row['status'], row['orders']) for row in by_status] == [('entregue', 2)]
+
+
+@pytest.mark.parametrize('url', [
+    '/api/admin/analytics/sales?interval=year',
+    '/api/admin/analytics/sales?date_from=ontem',
+    '/api/admin/analytics/top-articles?by=orders',
+    '/api/admin/analytics/breakdown?by=city',
+])
+def test_invalid_params_return_400(client, admin_headers, url):
+    response = client.get(url, headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_analytics_require_admin(client, user_headers):
+    assert client.get('/api/admin/analytics/sales', headers=user_headers).status_code == 403
+
+
+def test_cli_backfills_a_date_range(app):
+    result = app.test_cli_runner().invoke(args=['backfill-sales-rollups', '--date-from', '2024-03-01'])
+    assert result.exit_code == 0
+    assert result.output == '0 linhas de agregados diários escritas.\n'
+
+    result = app.test_cli_runner().invoke(args=['backfill-sales-rollups', '--date-to', 'amanhã'])
+    assert result.exit_code != 0
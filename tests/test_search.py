@@ -0,0 +1,63 @@
+import pytest
+
+import app as application
+
+
+@pytest.fixture
+def articles(make_articles):
+    return make_articles(names=['Calças de ganga', 'Camisola de lã', 'Meias de algodão'], price=20.0)
+
+
+def names(response):
+    return [article['name'] for article in response.get_json()]
+
+
+def search(client, query):
+    return client.get(f'/articles/search?{query}')
+
+
+def test_search_ignores_accents_and_matches_prefixes(client, articles):
+    assert names(search(client, 'name=calcas')) == ['Calças de ganga']
+    assert names(search(client, 'name=CAMIS')) == ['Camisola de lã']
+    assert names(search(client, 'name=algodao')) == ['Meias de algodão']
+
+
+def test_name_matches_rank_above_description_matches(client, make_articles):
+    make_articles(names=['Caneca', 'Chávena'])  # conteúdo "Descrição do caneca", ...
+    make_articles(names=['Pires'])
+
+    response = search(client, 'name=caneca')
+    assert names(response) == ['Caneca']
+    assert response.headers['X-Total-Count'] == '1'
+
+
+def test_sort_by_price_and_total_header(client, articles):
+    response = search(client, 'name=de&sort=price_desc')
+
+    assert names(response) == ['Meias de algodão', 'Camisola de lã', 'Calças de ganga']
+    assert response.headers['X-Total-Count'] == '3'
+
+
+def test_triggers_keep_the_index_in_sync(client, admin_headers, articles):
+    calcas, camisola, _ = articles
+    assert names(search(client, 'name=ganga')) == ['Calças de ganga']  # cria o índice
+
+    client.put(f'/api/admin/articles/{calcas}', headers=admin_headers, json={'name': 'Calções de linho', 'content': 'Calções leves'})
+    client.delete(f'/api/admin/articles/{camisola}', headers=admin_headers)
+    client.post('/articles', json={'name': 'Gorro de lã', 'content': 'Gorro quente', 'price': 9.9})
+
+    assert names(search(client, 'name=ganga')) == []
+    assert names(search(client, 'name=linho')) == ['Calções de linho']
+    assert names(search(client, 'name=la')) == ['Gorro de lã']
+
+
+def test_without_fts_the_search_falls_back_to_ilike(app, articles):
+    with app.app_context():
+        query, count_query = application.search_query({'name': 'meias'}, lambda: False)
+        rows = application.db.session.execute(query).all()
+
+    assert [row.name for row in rows] == ['Meias de algodão']
+
+
+def test_invalid_sort_returns_400(client, articles):
+    assert search(client, 'name=meias&sort=name').status_code == 400
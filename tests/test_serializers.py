@@ -0,0 +1,134 @@
+import json
+from datetime import date, datetime
+
+import pytest
+from flask import jsonify
+
+import app as application
+
+BACKENDS = [
+    'json',
+    pytest.param('orjson', marks=pytest.mark.skipif(application.orjson is None, reason='orjson não instalado')),
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(application, 'orjson', None)
+    return request.param
+
+
+@pytest.fixture
+def order_id(make_user, make_articles, make_order):
+    article_ids = make_articles(2)
+    return make_order(make_user('carla'), [(article_ids[0], 1), (article_ids[1], 2)],
+                      order_date=datetime(2024, 3, 1, 12, 30))
+
+
+def core_row(serializer, query):
+    return application.db.session.execute(query.with_only_columns(*serializer.columns())).one()
+
+
+def test_orm_objects_and_core_rows_serialize_the_same(app, order_id):
+    Order, User = application.Order, application.User
+    with app.app_context():
+        order = application.db.session.get(Order, order_id)
+        query = application.db.select(Order).where(Order.id == order_id)
+        admin_query = query.outerjoin(User, User.id == Order.user_id)
+
+        assert application.order_serializer.dump(order) == \
+            application.order_serializer.dump(core_row(application.order_serializer, query))
+        assert application.admin_order_serializer.dump(order) == \
+            application.admin_order_serializer.dump(core_row(application.admin_order_serializer, admin_query))
+
+        data = application.order_serializer.dump(order)
+    assert data['order_date'] == '2024-03-01T12:30:00'
+    assert data['shipping_info']['country'] == 'Portugal'
+    assert set(data['totals']) == {'subtotal', 'shipping', 'tax', 'total'}
+
+
+def test_order_without_user_is_unknown_in_both_paths(app, order_id):
+    Order, User = application.Order, application.User
+    with app.app_context():
+        application.db.session.execute(application.db.delete(User))
+        application.db.session.commit()
+        order = application.db.session.get(Order, order_id)
+        query = application.db.select(Order).outerjoin(User, User.id == Order.user_id)
+        row = core_row(application.admin_order_serializer, query)
+
+        for value in (order, row):
+            data = application.admin_order_serializer.dump(value)
+            assert (data['user_name'], data['user_email']) == ('Unknown', 'Unknown')
+            assert data['shipping_info']['name'] == 'Ana Silva'
+
+
+def test_order_items_are_grouped_with_the_article_name(app, order_id):
+    with app.app_context():
+        items = application.load_order_items([order_id, 999], application.order_item_serializer)
+
+    assert items == {
+        order_id: [
+            {'product_id': 1, 'name': 'Artigo 0', 'quantity': 1, 'price': 10.0},
+            {'product_id': 2, 'name': 'Artigo 1', 'quantity': 2, 'price': 11.0},
+        ],
+        999: [],
+    }
+
+
+def test_only_keeps_the_requested_fields_in_order(app, make_articles):
+    make_articles(1)
+    serializer = application.article_serializer.only('price', 'id')
+    with app.app_context():
+        rows = application.db.session.execute(application.db.select(*serializer.columns())).all()
+        single = application.article_serializer.only('name')
+        names = application.db.session.execute(application.db.select(*single.columns())).all()
+
+    assert [list(item.items()) for item in serializer.dump_many(rows)] == [[('price', 10.0), ('id', 1)]]
+    assert single.dump_many(names) == [{'name': 'Artigo 0'}]
+
+
+def test_convert_skips_nulls_and_extra_adds_fields():
+    serializer = application.Serializer({
+        'id': application.Order.id,
+        'order_date': application.Field(application.Order.order_date, convert=datetime.isoformat),
+    })
+    orders = [application.Order(id=1, order_date=datetime(2024, 3, 1)), application.Order(id=2)]
+
+    assert serializer.dump_many(orders, extra=lambda order: {'even': order.id % 2 == 0}) == [
+        {'id': 1, 'order_date': '2024-03-01T00:00:00', 'even': False},
+        {'id': 2, 'order_date': None, 'even': True},
+    ]
+    assert serializer.dump(orders[0], total=5) == {'id': 1, 'order_date': '2024-03-01T00:00:00', 'total': 5}
+    assert serializer.dump_many([]) == []
+
+
+def test_dumps_json_is_compact_utf8_with_iso_dates(backend):
+    payload = {'name': 'Calças', 'day': date(2024, 3, 1), 'at': datetime(2024, 3, 1, 12, 30), 7: [1.5, None]}
+
+    body = application.dumps_json(payload)
+
+    assert json.loads(body) == {'name': 'Calças', 'day': '2024-03-01', 'at': '2024-03-01T12:30:00', '7': [1.5, None]}
+    assert 'Calças'.encode('utf-8') in body
+    assert b', ' not in body and b': ' not in body
+
+
+def test_jsonify_keeps_the_default_provider_output(app, backend):
+    payload = {'b': 1, 'a': datetime(2024, 3, 1, 12, 30), 'c': 'Calças'}
+    with app.test_request_context():
+        body = jsonify(payload).get_data()
+
+    assert json.loads(body) == {'a': 'Fri, 01 Mar 2024 12:30:00 GMT', 'b': 1, 'c': 'Calças'}
+    assert list(json.loads(body)) == ['a', 'b', 'c']
+    assert body.endswith(b'\n')
+
+
+def test_routes_return_the_same_body_with_either_backend(client, make_articles, monkeypatch):
+    make_articles(3)
+    urls = ['/articles', '/articles?limit=2&sort=-price']
+    with_default = [client.get(url).get_json() for url in urls]
+    monkeypatch.setattr(application, 'orjson', None)
+    application.catalog_cache._entry = None
+
+    assert [client.get(url).get_json() for url in urls] == with_default
+    assert [article['price'] for article in with_default[1]] == [12.0, 11.0]
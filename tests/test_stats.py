@@ -0,0 +1,54 @@
+import app as application
+
+
+def snapshot(app):
+    with app.app_context():
+        return {row.key: row.value for row in application.StatCounter.query.all()}
+
+
+def test_upsert_increment_creates_missing_rows_and_adds_to_existing_ones(app):
+    with app.app_context():
+        application.upsert_increment(application.StatCounter, [{'key': 'a'}, {'key': 'b'}], [{'value': 1}, {'value': 2.5}])
+        application.upsert_increment(application.StatCounter, [{'key': 'a'}], [{'value': 4}])
+        application.db.session.commit()
+
+    assert snapshot(app) == {'a': 5, 'b': 2.5}
+
+
+def test_bump_stats_ignores_zero_deltas(app):
+    with app.app_context():
+        application.bump_stats({'orders': 1, 'revenue': 0})
+        application.db.session.commit()
+
+    assert snapshot(app) == {'orders': 1}
+
+
+def test_stats_are_built_on_first_read_and_kept_by_writes(client, admin_headers, user_headers,
+                                                           make_articles, place_order):
+    article_id, = make_articles(1, price=10.0)
+    first = place_order(user_headers, [(article_id, 2)]).get_json()['totals']['total']
+
+    stats = client.get('/api/admin/stats', headers=admin_headers).get_json()['stats']
+    assert stats['total_orders'] == 1
+    assert stats['total_users'] == 2
+    assert stats['total_articles'] == 1
+    assert stats['order_status_counts'] == {'processando': 1}
+
+    second = place_order(user_headers, [(article_id, 1)]).get_json()['totals']['total']
+    stats = client.get('/api/admin/stats', headers=admin_headers).get_json()['stats']
+    assert stats['total_orders'] == 2
+    assert stats['order_status_counts'] == {'processando': 2}
+    assert abs(stats['total_revenue'] - (first + second)) < 1e-6
+
+
+def test_rebuild_stats_reports_and_fixes_drift(app, client, admin_headers, make_user, make_articles, make_order):
+    client.get('/api/admin/stats', headers=admin_headers)  # constrói o snapshot
+    article_id, = make_articles(1)
+    make_order(make_user(), [(article_id, 1)])  # escrita direta: o snapshot não é atualizado
+
+    result = app.test_cli_runner().invoke(args=['rebuild-stats'])
+
+    assert result.exit_code == 0, result.output
+    assert 'orders: 0 -> 1' in result.output
+    assert snapshot(app)['orders'] == 1
+    assert app.test_cli_runner().invoke(args=['rebuild-stats']).output == 'Snapshot de estatísticas consistente.\n'
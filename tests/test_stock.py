@@ -0,0 +1,198 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as application
+
+
+def stock_of(app, article_id):
+    with app.app_context():
+        return application.db.session.get(application.Article, article_id).stock
+
+
+def reserve(client, headers, lines):
+    return client.post('/api/stock/reservations', headers=headers, json={
+        'items': [{'product_id': article_id, 'quantity': quantity} for article_id, quantity in lines],
+    })
+
+
+def expire_reservations(app):
+    with app.app_context():
+        application.StockReservation.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        application.db.session.commit()
+
+
+def test_conditional_update_never_goes_below_zero(app, make_articles):
+    limited, unlimited = make_articles(2, stock=3)
+    with app.app_context():
+        application.db.session.get(application.Article, unlimited).stock = None
+        application.db.session.commit()
+
+        application.decrement_stock([(limited, 2), (unlimited, 100)])
+        application.db.session.commit()
+        with pytest.raises(application.OutOfStock):
+            application.decrement_stock([(limited, 1), (limited, 1)])  # as linhas do mesmo artigo somam
+        application.db.session.rollback()
+
+    assert stock_of(app, limited) == 1
+    assert stock_of(app, unlimited) is None
+
+
+def test_order_without_enough_stock_returns_409_and_changes_nothing(app, user_headers, make_articles, place_order):
+    first, second = make_articles(2, stock=2)
+
+    response = place_order(user_headers, [(first, 1), (second, 3)])
+
+    assert response.status_code == 409
+    assert response.get_json()['items'] == [{'product_id': second, 'requested': 3, 'available': 2}]
+    assert (stock_of(app, first), stock_of(app, second)) == (2, 2)
+
+
+def test_concurrent_reservations_never_oversell(app, make_user, headers_for, make_articles):
+    article_id, = make_articles(1, stock=5)
+    headers = [headers_for(make_user(f'cliente{i}')) for i in range(12)]
+    statuses = []
+    barrier = threading.Barrier(len(headers))
+
+    def checkout(user_headers):
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(reserve(client, user_headers, [(article_id, 1)]).status_code)
+
+    threads = [threading.Thread(target=checkout, args=(h,)) for h in headers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 5 + [409] * 7
+    assert stock_of(app, article_id) == 0
+
+
+def test_order_consumes_the_reservation_without_taking_stock_twice(app, client, user_headers, make_articles,
+                                                                   place_order):
+    article_id, = make_articles(1, stock=5)
+    reservation_id = reserve(client, user_headers, [(article_id, 2)]).get_json()['reservation_id']
+    assert stock_of(app, article_id) == 3
+
+    response = place_order(user_headers, [(article_id, 2)], reservation_id=reservation_id)
+
+    assert response.status_code == 201
+    assert stock_of(app, article_id) == 3
+    assert place_order(user_headers, [(article_id, 2)], reservation_id=reservation_id).status_code == 409
+
+
+def test_order_must_match_the_reservation(app, client, user_headers, make_articles, place_order):
+    article_id, = make_articles(1, stock=5)
+    reservation_id = reserve(client, user_headers, [(article_id, 2)]).get_json()['reservation_id']
+
+    assert place_order(user_headers, [(article_id, 1)], reservation_id=reservation_id).status_code == 409
+    assert stock_of(app, article_id) == 3
+
+
+def test_release_returns_the_units_once(app, client, make_user, headers_for, make_articles):
+    article_id, = make_articles(1, stock=5)
+    owner, other = headers_for(make_user('dono')), headers_for(make_user('outro'))
+    reservation_id = reserve(client, owner, [(article_id, 2)]).get_json()['reservation_id']
+
+    assert client.delete(f'/api/stock/reservations/{reservation_id}', headers=other).status_code == 404
+    assert client.delete(f'/api/stock/reservations/{reservation_id}', headers=owner).status_code == 200
+    assert client.delete(f'/api/stock/reservations/{reservation_id}', headers=owner).status_code == 404
+    assert stock_of(app, article_id) == 5
+
+
+def test_expired_reservations_are_returned_to_stock(app, client, user_headers, make_articles):
+    article_id, = make_articles(1, stock=5)
+    reserve(client, user_headers, [(article_id, 2)])
+    reserve(client, user_headers, [(article_id, 1)])
+    expire_reservations(app)
+
+    result = app.test_cli_runner().invoke(args=['release-expired-reservations'])
+
+    assert result.exit_code == 0, result.output
+    assert stock_of(app, article_id) == 5
+    with app.app_context():
+        assert application.StockReservation.query.count() == 0
+
+
+def test_expired_reservation_is_taken_again_from_stock_on_order(app, client, user_headers, make_articles,
+                                                                place_order):
+    article_id, = make_articles(1, stock=5)
+    reservation_id = reserve(client, user_headers, [(article_id, 2)]).get_json()['reservation_id']
+    expire_reservations(app)
+    application._last_stock_sweep = float('inf')  # a limpeza automática ainda não correu
+
+    assert place_order(user_headers, [(article_id, 2)], reservation_id=reservation_id).status_code == 201
+    assert stock_of(app, article_id) == 3
+
+
+def test_admin_stock_adjustment_is_atomic_and_never_negative(app, client, admin_headers, make_articles):
+    article_id, = make_articles(1, stock=2)
+
+    assert client.post(f'/api/admin/articles/{article_id}/stock', headers=admin_headers, json={'delta': 3}).status_code == 200
+    assert client.post(f'/api/admin/articles/{article_id}/stock', headers=admin_headers, json={'delta': -6}).status_code == 400
+    assert stock_of(app, article_id) == 5
+
+
+def set_status(client, headers, order_id, status):
+    return client.put(f'/api/admin/orders/{order_id}/status', headers=headers, json={'status': status})
+
+
+def test_cancelling_an_order_returns_its_units_to_stock(app, client, admin_headers, user_headers, make_articles,
+                                                         place_order):
+    first, second = make_articles(2, stock=5)
+    order_id = place_order(user_headers, [(first, 2), (second, 1), (first, 1)]).get_json()['order_id']
+
+    assert set_status(client, admin_headers, order_id, 'cancelado').status_code == 200
+    assert (stock_of(app, first), stock_of(app, second)) == (5, 5)
+
+    # Repetir o cancelamento não devolve as unidades outra vez
+    assert set_status(client, admin_headers, order_id, 'cancelado').status_code == 200
+    assert (stock_of(app, first), stock_of(app, second)) == (5, 5)
+
+
+def test_reactivating_a_cancelled_order_takes_the_units_again(app, client, admin_headers, user_headers,
+                                                               make_articles, place_order):
+    first, second = make_articles(2, stock=5)
+    order_id = place_order(user_headers, [(first, 2), (second, 1)]).get_json()['order_id']
+    set_status(client, admin_headers, order_id, 'cancelado')
+
+    assert set_status(client, admin_headers, order_id, 'em trânsito').status_code == 200
+    assert (stock_of(app, first), stock_of(app, second)) == (3, 4)
+    set_status(client, admin_headers, order_id, 'entregue')
+    assert (stock_of(app, first), stock_of(app, second)) == (3, 4)
+
+
+def test_reactivating_without_enough_stock_returns_409_and_keeps_the_order_cancelled(
+        app, client, admin_headers, user_headers, make_articles, place_order):
+    first, second = make_articles(2, stock=5)
+    order_id = place_order(user_headers, [(first, 2), (second, 4)]).get_json()['order_id']
+    set_status(client, admin_headers, order_id, 'cancelado')
+    place_order(user_headers, [(second, 3)])
+
+    response = set_status(client, admin_headers, order_id, 'processando')
+
+    assert response.status_code == 409
+    assert response.get_json()['items'] == [{'product_id': second, 'requested': 4, 'available': 2}]
+    assert (stock_of(app, first), stock_of(app, second)) == (5, 2)
+    with app.app_context():
+        assert application.db.session.get(application.Order, order_id).status == 'cancelado'
+
+
+def test_deleting_a_user_releases_their_reservations(app, client, admin_headers, make_user, headers_for,
+                                                     make_articles):
+    article_id, = make_articles(1, stock=5)
+    user_id = make_user('dono')
+    reserve(client, headers_for(user_id), [(article_id, 2)])
+    reserve(client, headers_for(user_id), [(article_id, 1)])
+    expire_reservations(app)
+    application._last_stock_sweep = float('inf')  # a expirada ainda não foi devolvida pela limpeza
+    reserve(client, headers_for(user_id), [(article_id, 1)])
+    assert stock_of(app, article_id) == 1
+
+    assert client.delete(f'/api/admin/users/{user_id}', headers=admin_headers).status_code == 200
+
+    assert stock_of(app, article_id) == 5
+    with app.app_context():
+        assert application.StockReservation.query.count() == 0